@@ -0,0 +1,274 @@
+import asyncio
+import logging
+import time
+
+import aiohttp
+import telegram
+
+import breaker
+import cache
+import commands
+import config
+import homework
+import logs
+import metrics
+import outbox
+import scheduler
+import shutdown
+import storage
+import streaming
+import tracing
+import tenants
+import warmup
+
+TELEGRAM_API = 'https://api.telegram.org/bot{token}/sendMessage'
+DISPATCH_TICK = 1.0
+
+
+def create_session(pool_size=None):
+    """Создаёт сессию с пулом keep-alive соединений и таймаутами."""
+    settings = config.get_config()
+    return aiohttp.ClientSession(
+        connector=aiohttp.TCPConnector(
+            limit=pool_size or settings.max_in_flight,
+            keepalive_timeout=settings.keepalive_timeout
+        ),
+        timeout=aiohttp.ClientTimeout(
+            sock_connect=settings.connect_timeout,
+            sock_read=settings.read_timeout
+        )
+    )
+
+
+async def fetch_homework_statuses(session, url, current_timestamp, token):
+    """Асинхронно запрашивает статусы домашек ученика."""
+    params = dict(url=url, headers={'Authorization': f'OAuth {token}'},
+                  params={'from_date': current_timestamp})
+    try:
+        with metrics.API_LATENCY.time():
+            with tracing.span('get_api_answer'):
+                async with session.get(**params) as response:
+                    with tracing.span('response_json'):
+                        response_json = await read_status_answer(response,
+                                                                 params)
+                    status = response.status
+    except (aiohttp.ClientError, asyncio.TimeoutError) as error:
+        metrics.API_NETWORK_FAILURES.inc()
+        raise ConnectionError(
+            homework.NETWORK_FAILURE.format(error=error, **params)
+        )
+    metrics.API_RESPONSES.inc(status)
+    return homework.validate_api_answer(response_json, status, params)
+
+
+async def read_status_answer(response, params):
+    """Разбирает ответ API с учётом его HTTP-статуса."""
+    try:
+        return await read_answer(response)
+    except ValueError as error:
+        raise homework.unreadable_answer(error, response.status, params)
+
+
+async def read_answer(response):
+    """Разбирает тело ответа API по мере прихода данных.
+    Ответ без потокового чтения разбирается обычным json().
+    """
+    if not hasattr(response, 'content'):
+        return await response.json(content_type=None)
+    return await streaming.parse_answer_async(
+        response.content.iter_chunked(streaming.CHUNK_SIZE),
+        homework.compact_homework
+    )
+
+
+def telegram_error(answer):
+    """Превращает ответ Bot API с ошибкой в исключение python-telegram-bot."""
+    description = answer.get('description', '')
+    code = answer.get('error_code')
+    if code == 429:
+        return telegram.error.RetryAfter(
+            answer.get('parameters', {}).get('retry_after', 1)
+        )
+    if code == 400:
+        return telegram.error.BadRequest(description)
+    if code in (401, 403):
+        return telegram.error.Unauthorized(description)
+    return telegram.error.NetworkError(description)
+
+
+async def send_message(session, chat_id, message, parse_mode=None):
+    """Асинхронно отправляет сообщение в чат через Bot API."""
+    data = {'chat_id': chat_id, 'text': message}
+    if parse_mode:
+        data['parse_mode'] = parse_mode
+    try:
+        async with session.post(
+            TELEGRAM_API.format(token=config.get_config().telegram_token),
+            json=data
+        ) as response:
+            answer = await response.json(content_type=None)
+    except (aiohttp.ClientError, asyncio.TimeoutError) as error:
+        raise telegram.error.NetworkError(str(error))
+    if not answer.get('ok'):
+        raise telegram_error(answer)
+    logging.info(homework.MESSAGE_SENT_SUCCESSFULLY.format(message))
+
+
+class AsyncPoller:
+    """Асинхронный опрос учеников и разбор очереди сообщений.
+    Семафор ограничивает число одновременных HTTP-запросов.
+    """
+
+    def __init__(self, session, store, outgoing, responses=None,
+                 max_in_flight=None):
+        """Связывает сессию, хранилище, очередь сообщений и кэш."""
+        self.session = session
+        self.store = store
+        self.outgoing = outgoing
+        self.responses = responses
+        self.semaphore = asyncio.Semaphore(
+            config.setting('max_in_flight', max_in_flight)
+        )
+        self.running = set()
+
+    def spawn(self, coroutine):
+        """Запускает задачу и держит ссылку на неё до завершения."""
+        task = asyncio.create_task(coroutine)
+        self.running.add(task)
+        task.add_done_callback(self.running.discard)
+
+    async def fetch(self, tenant):
+        """Запрашивает статусы ученика, через кэш, если он задан."""
+        async def request():
+            async with self.semaphore:
+                return await fetch_homework_statuses(
+                    self.session, homework.ENDPOINT, tenant.from_date,
+                    tenant.token
+                )
+
+        if self.responses is None:
+            return await request()
+        return await self.responses.get_or_fetch_async(
+            cache.response_key(tenant.token, tenant.from_date), request
+        )
+
+    async def poll_tenant(self, tenant):
+        """Опрашивает API для ученика и ставит новые статусы в очередь."""
+        if self.store.is_paused(tenant.key):
+            return
+        try:
+            with tracing.iteration('poll_tenant', profiler=''):
+                response = await self.fetch(tenant)
+                tenants.apply_response(self.outgoing, tenant, self.store,
+                                       response)
+        except Exception as error:
+            scheduler.record_result(tenant, error)
+            tenants.report_failure(self.outgoing, tenant, self.store, error)
+
+    async def poll_and_reschedule(self, tenant, queue):
+        """Опрашивает ученика и ставит его в очередь на следующий опрос."""
+        try:
+            await self.poll_tenant(tenant)
+        finally:
+            queue.reschedule(tenant)
+
+    async def dispatch_polls(self, tenants_list, retry_time, warmed=()):
+        """Запускает опросы учеников в порядке очереди планировщика.
+        Очередь проверяется не реже DISPATCH_TICK секунд, чтобы
+        не пропустить учеников, вернувшихся в неё после опроса.
+        Опрошенные при прогреве ученики ждут обычного интервала.
+        """
+        queue = scheduler.Scheduler(tenants_list, retry_time,
+                                    polled=warmed)
+        while not shutdown.stopping():
+            delay = queue.delay()
+            await asyncio.sleep(DISPATCH_TICK if delay is None
+                                else min(delay, DISPATCH_TICK))
+            for tenant in queue.pop_allowed():
+                self.spawn(self.poll_and_reschedule(tenant, queue))
+            self.store.checkpoint()
+
+    async def deliver(self, batch):
+        """Отправляет пачку сообщений и сообщает очереди о результате."""
+        try:
+            async with self.semaphore:
+                with tracing.span('send_message'), \
+                        metrics.SEND_LATENCY.time():
+                    await send_message(self.session, batch.chat_id,
+                                       batch.text, batch.parse_mode)
+        except telegram.error.TelegramError as error:
+            metrics.SEND_FAILURES.inc(type(error).__name__)
+            self.outgoing.fail(batch, error)
+        else:
+            self.outgoing.complete(batch)
+
+    async def drain_outbox(self):
+        """Разбирает очередь сообщений, пока работает бот."""
+        while not shutdown.stopping():
+            await asyncio.sleep(outbox.DISPATCH_TICK)
+            for batch in self.outgoing.claim():
+                self.spawn(self.deliver(batch))
+
+    async def drain(self, until):
+        """Дожидается начатых опросов и досылает готовые сообщения.
+        К моменту until незавершённые задачи отменяются; их сообщения
+        остаются в очереди и уйдут после перезапуска.
+        """
+        while ((self.running or self.outgoing.due())
+               and time.monotonic() < until):
+            for batch in self.outgoing.claim():
+                self.spawn(self.deliver(batch))
+            await asyncio.sleep(outbox.DISPATCH_TICK)
+        for task in list(self.running):
+            task.cancel()
+        left = self.outgoing.due()
+        logging.info(shutdown.SHUTDOWN_FINISHED.format(left))
+        return left
+
+
+async def poll_forever(tenants_list, store, outgoing, responses=None,
+                       retry_time=homework.RETRY_TIME,
+                       max_in_flight=None, warmed=()):
+    """Опрашивает учеников и разбирает очередь сообщений конкурентно.
+    После запроса остановки дорабатывает до shutdown_deadline секунд.
+    """
+    async with create_session(max_in_flight) as session:
+        poller = AsyncPoller(session, store, outgoing, responses,
+                             max_in_flight)
+        await asyncio.gather(
+            poller.dispatch_polls(tenants_list, retry_time, warmed),
+            poller.drain_outbox()
+        )
+        await poller.drain(shutdown.deadline())
+
+
+def main():
+    """Асинхронно обслуживает всех учеников из реестра."""
+    if config.get_config().telegram_token is None:
+        logging.critical(homework.MISSING_ENV_VAR.format('TELEGRAM_TOKEN'))
+        raise NameError(homework.MISSING_ENV_VAR.format('TELEGRAM_TOKEN'))
+    shutdown.install()
+    metrics.start_metrics_server()
+    store = storage.StatusStore()
+    tenants_list = tenants.load_tenants()
+    tenants.restore_cursors(tenants_list, store)
+    outgoing = outbox.Outbox()
+    breaker.BREAKER.listen(breaker.operator_alert(outgoing, store))
+    responses = cache.ResponseCache()
+    known, fresh = warmup.partition(tenants_list, store)
+    warmed = warmup.warm_up(fresh, store, outgoing, homework.create_bot(),
+                            responses)
+    updater = commands.start_commands(
+        tenants.chats_of(tenants_list),
+        locales=tenants.locales_of(tenants_list)
+    )
+    try:
+        asyncio.run(poll_forever(known, store, outgoing, responses,
+                                 warmed=warmed))
+    finally:
+        shutdown.finish(store, updater=updater)
+
+
+if __name__ == '__main__':
+    logs.setup_logging()
+    main()
@@ -0,0 +1 @@
+"""Нагрузочные замеры бота на локальном мок-сервере."""
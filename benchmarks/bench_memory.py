@@ -0,0 +1,69 @@
+"""Замер памяти на одного ученика.
+
+Строки токенов и чатов создаются заранее: они приходят из реестра
+и не зависят от модели. Замеряется прирост памяти от объектов Tenant,
+очереди планировщика и результатов опроса на count учеников.
+"""
+import argparse
+import os
+import sys
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import homework  # noqa: E402
+import scheduler  # noqa: E402
+import tenants  # noqa: E402
+
+TENANT_BUDGET = 256
+ROW = '{name:>12} {per_tenant:>10.1f}'
+HEADER = '{:>12} {:>10}'.format('stage', 'bytes')
+OVER_BUDGET = 'Ученик занимает {:.0f} байт, бюджет {} байт'
+
+
+def allocated(build):
+    """Возвращает результат build и прирост памяти при его вызове."""
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        result = build()
+        return result, tracemalloc.get_traced_memory()[0] - before
+    finally:
+        tracemalloc.stop()
+
+
+def main():
+    """Печатает память на ученика по этапам и проверяет бюджет."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--tenants', type=int, default=100000)
+    parser.add_argument('--budget', type=int, default=TENANT_BUDGET)
+    args = parser.parse_args()
+    count = args.tenants
+    records = [(f'y0_AgAAAAA{index:048d}', str(10 ** 9 + index))
+               for index in range(count)]
+    items, tenant_bytes = allocated(lambda: [
+        tenants.Tenant(token=token, chat_id=chat_id, from_date=10 ** 9,
+                       last_status=homework.Status.REVIEWING)
+        for token, chat_id in records
+    ])
+    _, queue_bytes = allocated(lambda: scheduler.Scheduler(items))
+    work = homework.Homework(homework_name='hw', id=1,
+                             status=homework.Status.APPROVED)
+    _, result_bytes = allocated(lambda: [
+        tenants.PollResult(changed=(work,), current_date=10 ** 9,
+                           last_status=work.status)
+        for _ in range(count)
+    ])
+    print(HEADER)
+    for name, size in (('tenant', tenant_bytes), ('scheduler', queue_bytes),
+                       ('poll result', result_bytes)):
+        print(ROW.format(name=name, per_tenant=size / count))
+    if tenant_bytes / count > args.budget:
+        print(OVER_BUDGET.format(tenant_bytes / count, args.budget),
+              file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,142 @@
+"""Нагрузочный замер асинхронного воркера на локальном мок-сервере.
+
+Для каждого числа учеников воркер работает duration секунд,
+после чего печатаются опросы в секунду, перцентили сквозной задержки
+уведомления (от смены статуса до получения сообщения в Telegram),
+число отправок, ответов 429 и RSS процесса воркера.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+from urllib.request import urlopen
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import async_bot  # noqa: E402
+import config  # noqa: E402
+import homework  # noqa: E402
+import outbox  # noqa: E402
+import scheduler  # noqa: E402
+import storage  # noqa: E402
+import tenants  # noqa: E402
+from benchmarks import mock_server  # noqa: E402
+
+ROW = ('{tenants:>8} {polls_per_second:>9.1f} {sends:>7} {rate_limited:>6}'
+       ' {p50:>8} {p99:>8} {rss:>8.1f}')
+HEADER = ('{:>8} {:>9} {:>7} {:>6} {:>8} {:>8} {:>8}'
+          .format('tenants', 'polls/s', 'sends', '429', 'p50, s', 'p99, s',
+                  'RSS, MB'))
+
+
+def rss_megabytes():
+    """Возвращает текущий RSS процесса, а без /proc - пиковый."""
+    try:
+        with open('/proc/self/status') as status:
+            for line in status:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def request_json(url):
+    """Выполняет GET-запрос к мок-серверу и разбирает JSON."""
+    with urlopen(url) as response:
+        return json.loads(response.read())
+
+
+def configure(base_url, interval):
+    """Направляет воркер на мок-сервер и задаёт интервал опроса."""
+    homework.ENDPOINT = base_url + mock_server.API_PATH
+    config.override(telegram_token='bench')
+    async_bot.TELEGRAM_API = base_url + '/bot{token}/sendMessage'
+    scheduler.STATUS_INTERVALS = dict.fromkeys(scheduler.STATUS_INTERVALS,
+                                               interval)
+    scheduler.RECENT_CHANGE_INTERVAL = interval
+
+
+async def run_for(duration, coroutine):
+    """Выполняет корутину не дольше duration секунд."""
+    try:
+        await asyncio.wait_for(coroutine, duration)
+    except asyncio.TimeoutError:
+        pass
+
+
+def run(base_url, count, duration, interval, max_in_flight):
+    """Гоняет воркер с count учениками и возвращает строку отчёта."""
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'bench.db')
+        store = storage.StatusStore(path)
+        outgoing = outbox.Outbox(path)
+        now = int(time.time())
+        tenants_list = [tenants.Tenant(token=f'tenant-{index}',
+                                       chat_id=str(index), from_date=now)
+                        for index in range(count)]
+        request_json(base_url + '/reset')
+        asyncio.run(run_for(duration, async_bot.poll_forever(
+            tenants_list, store, outgoing, retry_time=interval,
+            max_in_flight=max_in_flight
+        )))
+        stats = request_json(base_url + '/stats')
+        store.close()
+    return ROW.format(
+        tenants=count, rss=rss_megabytes(),
+        p50=format_seconds(stats['notify_p50']),
+        p99=format_seconds(stats['notify_p99']), **stats
+    )
+
+
+def format_seconds(value):
+    """Форматирует задержку или прочерк, если замеров нет."""
+    return '-' if value is None else f'{value:.2f}'
+
+
+def main():
+    """Запускает мок-сервер в отдельном процессе и серию замеров."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--tenants', type=int, nargs='+',
+                        default=[100, 1000, 5000])
+    parser.add_argument('--duration', type=float, default=30.0)
+    parser.add_argument('--interval', type=float, default=5.0)
+    parser.add_argument('--max-in-flight', type=int,
+                        default=config.get_config().max_in_flight)
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.02)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--http-error-rate', type=float, default=0.0)
+    parser.add_argument('--telegram-rate', type=float, default=30.0)
+    parser.add_argument('--change-interval', type=float, default=20.0)
+    args = parser.parse_args()
+    server = multiprocessing.Process(
+        target=mock_server.serve, args=(args.port,), daemon=True,
+        kwargs=dict(latency=args.latency, error_rate=args.error_rate,
+                    http_error_rate=args.http_error_rate,
+                    telegram_rate=args.telegram_rate,
+                    change_interval=args.change_interval)
+    )
+    server.start()
+    base_url = f'http://127.0.0.1:{args.port}'
+    time.sleep(0.5)
+    configure(base_url, args.interval)
+    logging.disable(logging.CRITICAL)
+    print(HEADER)
+    try:
+        for count in args.tenants:
+            print(run(base_url, count, args.duration, args.interval,
+                      args.max_in_flight), flush=True)
+    finally:
+        server.terminate()
+
+
+if __name__ == '__main__':
+    main()
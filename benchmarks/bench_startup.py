@@ -0,0 +1,98 @@
+"""Замер времени запуска воркеров.
+
+Каждый модуль импортируется в чистом интерпретаторе с -X importtime
+repeat раз; печатается медианное время импорта модуля, полное время
+запуска процесса и самые тяжёлые зависимости. Если запуск дольше
+бюджета, скрипт завершается с ненулевым кодом.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODULES = ('homework', 'tenants', 'sharding', 'async_bot')
+STARTUP_BUDGET = 1.0
+ROW = '{module:>10} {imported:>10.1f} {total:>10.1f}  {heaviest}'
+HEADER = '{:>10} {:>10} {:>10}  {}'.format('module', 'import, ms',
+                                           'start, ms', 'heaviest imports')
+OVER_BUDGET = ('Запуск {module} дольше бюджета: '
+               '{total:.0f} мс > {budget:.0f} мс')
+
+
+def parse_importtime(output, module):
+    """Разбирает вывод -X importtime для импорта модуля.
+    Возвращает накопленное время импорта модуля и его прямых
+    зависимостей в микросекундах.
+    """
+    subtree = []
+    for line in output.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip()) + 1) // 2
+        if depth == 1 and name.strip() == module:
+            return int(cumulative), {
+                child: micros for child_depth, micros, child in subtree
+                if child_depth == 2
+            }
+        subtree = [] if depth == 1 else subtree + [
+            (depth, int(cumulative), name.strip())
+        ]
+    raise ValueError(module)
+
+
+def measure(module):
+    """Импортирует модуль в отдельном процессе.
+    Возвращает время процесса, время импорта модуля и его зависимостей.
+    """
+    started = time.perf_counter()
+    process = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=ROOT, capture_output=True, text=True, check=True
+    )
+    imported, children = parse_importtime(process.stderr, module)
+    return time.perf_counter() - started, imported, children
+
+
+def report(module, repeat, top):
+    """Замеряет модуль repeat раз.
+    Возвращает строку отчёта и медианное время запуска.
+    """
+    runs = [measure(module) for _ in range(repeat)]
+    total = statistics.median(run[0] for run in runs) * 1000
+    imported = statistics.median(run[1] for run in runs) / 1000
+    children = runs[-1][2]
+    heaviest = sorted(children, key=children.get, reverse=True)[:top]
+    return ROW.format(module=module, imported=imported, total=total,
+                      heaviest=', '.join(
+                          f'{name} {children[name] / 1000:.0f}'
+                          for name in heaviest
+                      )), total
+
+
+def main():
+    """Печатает время запуска модулей и проверяет бюджет."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('modules', nargs='*', default=MODULES)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--top', type=int, default=3)
+    parser.add_argument('--budget', type=float, default=STARTUP_BUDGET)
+    args = parser.parse_args()
+    print(HEADER)
+    exceeded = []
+    for module in args.modules:
+        row, total = report(module, args.repeat, args.top)
+        print(row, flush=True)
+        if total > args.budget * 1000:
+            exceeded.append(OVER_BUDGET.format(module=module, total=total,
+                                               budget=args.budget * 1000))
+    for message in exceeded:
+        print(message, file=sys.stderr)
+    sys.exit(1 if exceeded else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,218 @@
+"""Локальная замена API Практикума и Bot API Telegram для нагрузочных тестов.
+
+Статус единственной работы каждого токена меняется по кругу
+раз в change_interval секунд; имя работы совпадает с токеном.
+По времени смены статуса и получению сообщения в Telegram
+сервер считает сквозную задержку уведомления.
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+API_PATH = '/api/user_api/homework_statuses/'
+STATUSES = ('reviewing', 'rejected', 'approved')
+HOMEWORK_NAME = re.compile(r'работы "([^"]+)"')
+DENIAL = {'code': 'UnknownError', 'error': {'error': 'Mock denial'}}
+MAX_LATENCIES = 100000
+
+
+class MockState:
+    """Настройки и счётчики мок-сервера."""
+
+    def __init__(self, latency=0.0, error_rate=0.0, http_error_rate=0.0,
+                 telegram_rate=30.0, change_interval=60.0):
+        """Запоминает настройки и обнуляет счётчики."""
+        self.latency = latency
+        self.error_rate = error_rate
+        self.http_error_rate = http_error_rate
+        self.telegram_rate = telegram_rate
+        self.change_interval = change_interval
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Обнуляет счётчики и время начала замера."""
+        with self.lock:
+            self.started = time.time()
+            self.api_requests = 0
+            self.sends = 0
+            self.rate_limited = 0
+            self.latencies = []
+            self.tokens = self.telegram_rate
+            self.updated = time.monotonic()
+
+    def homework(self, token, now):
+        """Возвращает работу токена и время последней смены её статуса."""
+        offset = zlib.crc32(token.encode()) % 1000 / 1000
+        offset *= self.change_interval
+        period = int((now - offset) // self.change_interval)
+        changed_at = offset + period * self.change_interval
+        return {
+            'id': 1,
+            'homework_name': token,
+            'status': STATUSES[period % len(STATUSES)],
+            'date_updated': time.strftime('%Y-%m-%dT%H:%M:%SZ',
+                                          time.gmtime(changed_at)),
+        }, changed_at
+
+    def allow_send(self):
+        """Проверяет общий лимит отправки сообщений."""
+        now = time.monotonic()
+        with self.lock:
+            self.tokens = min(self.telegram_rate, self.tokens
+                              + (now - self.updated) * self.telegram_rate)
+            self.updated = now
+            if self.tokens < 1:
+                self.rate_limited += 1
+                return False
+            self.tokens -= 1
+            self.sends += 1
+            return True
+
+    def record_delivery(self, text, now):
+        """Учитывает задержку уведомления для всех работ в сообщении."""
+        with self.lock:
+            for name in HOMEWORK_NAME.findall(text):
+                _, changed_at = self.homework(name, now)
+                if len(self.latencies) < MAX_LATENCIES:
+                    self.latencies.append(now - changed_at)
+
+    def stats(self):
+        """Возвращает счётчики и перцентили задержки уведомлений."""
+        with self.lock:
+            latencies = sorted(self.latencies)
+            elapsed = time.time() - self.started
+            return {
+                'elapsed': elapsed,
+                'api_requests': self.api_requests,
+                'polls_per_second': self.api_requests / elapsed,
+                'sends': self.sends,
+                'rate_limited': self.rate_limited,
+                'notify_p50': percentile(latencies, 0.5),
+                'notify_p99': percentile(latencies, 0.99),
+            }
+
+
+def percentile(values, fraction):
+    """Возвращает перцентиль отсортированного списка или None."""
+    if not values:
+        return None
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    """Обработчик запросов к мок-серверу."""
+
+    state = None
+    protocol_version = 'HTTP/1.1'
+
+    def reply(self, status, data):
+        """Отправляет JSON-ответ."""
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        """Отвечает на запросы статусов, счётчиков и сброса."""
+        url = urlparse(self.path)
+        if url.path == '/stats':
+            self.reply(200, self.state.stats())
+        elif url.path == '/reset':
+            self.state.reset()
+            self.reply(200, {})
+        elif url.path == API_PATH:
+            self.homework_statuses(parse_qs(url.query))
+        else:
+            self.reply(404, {})
+
+    def homework_statuses(self, query):
+        """Имитирует эндпоинт статусов домашних работ."""
+        state = self.state
+        with state.lock:
+            state.api_requests += 1
+        if state.latency:
+            time.sleep(state.latency)
+        roll = random.random()
+        if roll < state.error_rate:
+            self.reply(200, DENIAL)
+            return
+        if roll < state.error_rate + state.http_error_rate:
+            self.reply(500, {})
+            return
+        now = time.time()
+        token = self.headers.get('Authorization', '').replace('OAuth ', '')
+        from_date = int(query.get('from_date', ['0'])[0])
+        homework, changed_at = state.homework(token, now)
+        self.reply(200, {
+            'homeworks': [homework] if changed_at >= from_date else [],
+            'current_date': int(now),
+        })
+
+    def do_POST(self):
+        """Имитирует метод sendMessage Bot API с лимитом частоты."""
+        length = int(self.headers.get('Content-Length', 0))
+        data = json.loads(self.rfile.read(length) or b'{}')
+        if not self.path.endswith('/sendMessage'):
+            self.reply(404, {'ok': False, 'error_code': 404})
+            return
+        if not self.state.allow_send():
+            self.reply(429, {'ok': False, 'error_code': 429,
+                             'description': 'Too Many Requests',
+                             'parameters': {'retry_after': 1}})
+            return
+        self.state.record_delivery(data.get('text', ''), time.time())
+        self.reply(200, {'ok': True, 'result': {}})
+
+    def log_message(self, format, *args):
+        """Не пишет в лог каждый запрос."""
+        pass
+
+
+class MockServer(ThreadingHTTPServer):
+    """Многопоточный сервер, не засоряющий вывод обрывами соединений."""
+
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        """Молча пропускает ошибки оборванных клиентом соединений."""
+        pass
+
+
+def create_server(state, host='127.0.0.1', port=0):
+    """Создаёт мок-сервер с заданными настройками."""
+    handler = type('Handler', (MockHandler,), {'state': state})
+    return MockServer((host, port), handler)
+
+
+def serve(port, **settings):
+    """Запускает мок-сервер и обслуживает запросы до остановки."""
+    create_server(MockState(**settings), port=port).serve_forever()
+
+
+def main():
+    """Запускает мок-сервер из командной строки."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--latency', type=float, default=0.0)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--http-error-rate', type=float, default=0.0)
+    parser.add_argument('--telegram-rate', type=float, default=30.0)
+    parser.add_argument('--change-interval', type=float, default=60.0)
+    args = parser.parse_args()
+    serve(args.port, latency=args.latency, error_rate=args.error_rate,
+          http_error_rate=args.http_error_rate,
+          telegram_rate=args.telegram_rate,
+          change_interval=args.change_interval)
+
+
+if __name__ == '__main__':
+    main()
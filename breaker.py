@@ -0,0 +1,238 @@
+import logging
+import sqlite3
+import threading
+import time
+
+import config
+import homework
+import metrics
+
+CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+THRESHOLDS = {
+    homework.DenialOfServiceError: 3,
+    homework.EndpointUnexpectedStatusError: 5,
+    ConnectionError: 10,
+}
+OPEN_TIME = 60
+PROBE_WAIT = 5
+MAX_OPEN_TIME = 1800
+OPERATOR_KEY = 'operator'
+SCHEMA = ('CREATE TABLE IF NOT EXISTS breaker ('
+          ' name TEXT PRIMARY KEY, version INTEGER, state TEXT,'
+          ' open_time REAL, opened_at REAL, probe_started REAL)')
+BREAKER_OPENED = ('API Практикума отвечает ошибками ({error}), '
+                  'опрос всех учеников приостановлен')
+BREAKER_CLOSED = 'API Практикума снова отвечает, опрос учеников возобновлён'
+BREAKER_REOPENED = 'Пробный запрос к API не прошёл, следующий через {} с'
+
+
+class SharedState:
+    """Состояние предохранителя в SQLite, общее для процессов-воркеров.
+    Запись проходит, только если с прочитанной версии никто не успел
+    изменить состояние.
+    """
+
+    def __init__(self, path=None, name='api'):
+        """Открывает базу и создаёт таблицу."""
+        self.name = name
+        self.connection = sqlite3.connect(config.setting('store_path', path),
+                                          timeout=30,
+                                          check_same_thread=False)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        with self.connection:
+            self.connection.execute(SCHEMA)
+            self.connection.execute(
+                'INSERT OR IGNORE INTO breaker VALUES (?, 0, ?, 0, 0, NULL)',
+                (name, CLOSED)
+            )
+
+    def load(self):
+        """Возвращает версию, состояние, паузу, начало паузы и пробы."""
+        return self.connection.execute(
+            'SELECT version, state, open_time, opened_at, probe_started'
+            ' FROM breaker WHERE name = ?', (self.name,)
+        ).fetchone()
+
+    def save(self, version, state, open_time, opened_at, probe_started):
+        """Записывает состояние поверх версии version.
+        Возвращает False, если состояние уже изменил другой процесс.
+        """
+        with self.connection:
+            cursor = self.connection.execute(
+                'UPDATE breaker SET version = version + 1, state = ?,'
+                ' open_time = ?, opened_at = ?, probe_started = ?'
+                ' WHERE name = ? AND version = ?',
+                (state, open_time, opened_at, probe_started, self.name,
+                 version)
+            )
+        return cursor.rowcount == 1
+
+
+class CircuitBreaker:
+    """Общий предохранитель запросов к API Практикума.
+    После THRESHOLDS подряд ошибок одного класса размыкается,
+    и опросы всех учеников откладываются на open_time секунд.
+    Затем один пробный опрос решает, замкнуться или ждать вдвое дольше.
+    После share состояние общее для всех процессов с той же базой.
+    """
+
+    def __init__(self, thresholds=THRESHOLDS, open_time=OPEN_TIME,
+                 max_open_time=MAX_OPEN_TIME, clock=time.monotonic):
+        """Создаёт замкнутый предохранитель."""
+        self.thresholds = thresholds
+        self.base_open_time = open_time
+        self.max_open_time = max_open_time
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.listeners = []
+        self.state = CLOSED
+        self.failures = {}
+        self.open_time = open_time
+        self.opened_at = 0
+        self.probe_started = None
+        self.shared = None
+        self.version = 0
+
+    def share(self, shared, clock=time.time):
+        """Делит состояние с другими процессами через SharedState.
+        Время в общем состоянии идёт по настенным часам: монотонные
+        часы разных запусков несравнимы.
+        """
+        with self.lock:
+            self.shared = shared
+            self.clock = clock
+            self.version = -1
+            self.pull()
+
+    def pull(self):
+        """Перенимает состояние, изменённое другим процессом."""
+        if self.shared is None:
+            return
+        version, state, open_time, opened_at, probe_started = (
+            self.shared.load()
+        )
+        if version == self.version:
+            return
+        if state != self.state:
+            self.failures = {}
+        self.version, self.state = version, state
+        self.open_time = open_time or self.base_open_time
+        self.opened_at, self.probe_started = opened_at, probe_started
+
+    def push(self):
+        """Публикует своё состояние для других процессов.
+        Если другой процесс успел раньше, берётся его состояние
+        и возвращается False.
+        """
+        if self.shared is None:
+            return True
+        if self.shared.save(self.version, self.state, self.open_time,
+                            self.opened_at, self.probe_started):
+            self.version += 1
+            return True
+        self.pull()
+        return False
+
+    def listen(self, listener):
+        """Подписывает listener(state, error) на смену состояния."""
+        self.listeners.append(listener)
+
+    def retry_after(self):
+        """Возвращает, сколько секунд ещё отложены опросы.
+        Пока идёт пробный опрос, остальные ждут PROBE_WAIT секунд.
+        """
+        if self.state == CLOSED:
+            return 0
+        if self.state == HALF_OPEN:
+            return PROBE_WAIT
+        return max(PROBE_WAIT,
+                   self.opened_at + self.open_time - self.clock())
+
+    def allow(self):
+        """Решает, можно ли сейчас опрашивать API.
+        В разомкнутом состоянии по истечении паузы пропускает
+        ровно один пробный опрос; зависший пробный опрос повторяется.
+        """
+        with self.lock:
+            self.pull()
+            if self.state == CLOSED:
+                return True
+            now = self.clock()
+            if self.state == OPEN and now >= self.opened_at + self.open_time:
+                self.state = HALF_OPEN
+            elif self.state == HALF_OPEN and (
+                now - self.probe_started < self.open_time
+            ):
+                return False
+            elif self.state == OPEN:
+                return False
+            self.probe_started = now
+            return self.push()
+
+    def record(self, error=None):
+        """Учитывает итог опроса.
+        Ошибки не из THRESHOLDS означают, что API ответило.
+        """
+        kind = self.classify(error)
+        with self.lock:
+            self.pull()
+            if kind is None:
+                changed = self.state != CLOSED
+                self.state, self.failures = CLOSED, {}
+                self.open_time = self.base_open_time
+                changed = changed and self.push()
+            elif self.state == HALF_OPEN:
+                changed = False
+                self.trip(min(self.max_open_time, self.open_time * 2))
+                if self.push():
+                    logging.warning(BREAKER_REOPENED.format(self.open_time))
+            else:
+                self.failures[kind] = self.failures.get(kind, 0) + 1
+                changed = (self.state == CLOSED
+                           and self.failures[kind] >= self.thresholds[kind])
+                if changed:
+                    self.trip(self.base_open_time)
+                    changed = self.push()
+        if changed:
+            metrics.API_BREAKER_TRANSITIONS.inc(self.state)
+            for listener in self.listeners:
+                listener(self.state, error)
+
+    def classify(self, error):
+        """Возвращает класс ошибки из THRESHOLDS или None."""
+        for kind in self.thresholds:
+            if isinstance(error, kind):
+                return kind
+        return None
+
+    def trip(self, open_time):
+        """Размыкает предохранитель на open_time секунд."""
+        self.state = OPEN
+        self.open_time = open_time
+        self.opened_at = self.clock()
+        self.failures = {}
+
+
+def operator_alert(outgoing, store, chat_id=None):
+    """Возвращает подписчика, сообщающего оператору о смене состояния.
+    Сообщение уходит одно на все процессы: повтор гасит хранилище.
+    """
+    def alert(state, error):
+        if state == OPEN:
+            message = BREAKER_OPENED.format(error=type(error).__name__)
+            logging.error(message)
+        else:
+            message = BREAKER_CLOSED
+            logging.info(message)
+        operator = chat_id or config.get_config().operator_chat_id
+        if operator and store.should_report_error(OPERATOR_KEY, message):
+            outgoing.put(operator, message)
+
+    return alert
+
+
+BREAKER = CircuitBreaker()
+metrics.API_BREAKER_STATE.set_function(
+    lambda: STATE_VALUES[BREAKER.state]
+)
@@ -0,0 +1,170 @@
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+import config
+import homework
+import storage
+
+DISK_SCHEMA = ('CREATE TABLE IF NOT EXISTS responses ('
+               ' key TEXT PRIMARY KEY, value TEXT, expires_at REAL)')
+
+
+def response_key(token, current_timestamp):
+    """Возвращает ключ ответа API, не содержащий токен."""
+    return f'{storage.tenant_key(token)}:{current_timestamp}'
+
+
+class DiskTier:
+    """Дисковый уровень кэша в SQLite, переживающий перезапуск."""
+
+    def __init__(self, path):
+        """Открывает базу кэша и создаёт таблицу."""
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        with self.connection:
+            self.connection.execute(DISK_SCHEMA)
+
+    def get(self, key):
+        """Возвращает непросроченное значение или None."""
+        row = self.connection.execute(
+            'SELECT value FROM responses WHERE key = ? AND expires_at > ?',
+            (key, time.time())
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put(self, key, value, ttl):
+        """Сохраняет значение на ttl секунд и удаляет просроченные."""
+        now = time.time()
+        with self.connection:
+            self.connection.execute(
+                'INSERT OR REPLACE INTO responses VALUES (?, ?, ?)',
+                (key, json.dumps(value), now + ttl)
+            )
+            self.connection.execute(
+                'DELETE FROM responses WHERE expires_at <= ?', (now,)
+            )
+
+
+class ResponseCache:
+    """Кэш ответов API с TTL и вытеснением давно не используемых.
+    Одинаковые одновременные запросы объединяются в один.
+    Ответы из кэша общие для всех, изменять их нельзя.
+    """
+
+    def __init__(self, ttl=None, max_size=None, disk_path=None,
+                 clock=time.monotonic):
+        """Создаёт пустой кэш; при disk_path - с дисковым уровнем.
+        Незаданные параметры берутся из настроек.
+        """
+        self.ttl = config.setting('cache_ttl', ttl)
+        self.max_size = config.setting('cache_size', max_size)
+        disk_path = config.setting('cache_path', disk_path)
+        self.clock = clock
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.pending = {}
+        self.pending_async = {}
+        self.disk = DiskTier(disk_path) if disk_path else None
+
+    def __len__(self):
+        """Возвращает число записей в памяти."""
+        return len(self.entries)
+
+    def get(self, key):
+        """Возвращает значение из памяти или с диска, либо None."""
+        with self.lock:
+            return self._lookup(key)
+
+    def _lookup(self, key):
+        """Ищет значение в памяти и на диске; вызывается под lock."""
+        entry = self.entries.get(key)
+        if entry is not None:
+            expires_at, value = entry
+            if expires_at > self.clock():
+                self.entries.move_to_end(key)
+                return value
+            del self.entries[key]
+        if self.disk is None:
+            return None
+        value = self.disk.get(key)
+        if value is not None:
+            self._remember(key, value)
+        return value
+
+    def put(self, key, value):
+        """Кладёт значение в кэш."""
+        with self.lock:
+            self._remember(key, value)
+            if self.disk is not None:
+                self.disk.put(key, value, self.ttl)
+
+    def _remember(self, key, value):
+        """Кладёт значение в память, вытесняя самые старые записи."""
+        self.entries[key] = (self.clock() + self.ttl, value)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+    def get_or_fetch(self, key, fetch):
+        """Возвращает значение из кэша или получает его через fetch.
+        Потоки с одинаковым ключом ждут один общий запрос.
+        Кэш проверяется под той же блокировкой, что и ожидающие запросы:
+        иначе поток, промахнувшийся до put лидера, стал бы новым лидером.
+        """
+        with self.lock:
+            value = self._lookup(key)
+            if value is not None:
+                return value
+            future = self.pending.get(key)
+            leader = future is None
+            if leader:
+                future = self.pending[key] = Future()
+        if not leader:
+            return future.result()
+        try:
+            value = fetch()
+            self.put(key, value)
+            future.set_result(value)
+            return value
+        except Exception as error:
+            future.set_exception(error)
+            raise
+        finally:
+            with self.lock:
+                del self.pending[key]
+
+    async def get_or_fetch_async(self, key, fetch):
+        """Асинхронный вариант get_or_fetch для корутины fetch."""
+        import asyncio
+
+        value = self.get(key)
+        if value is not None:
+            return value
+        future = self.pending_async.get(key)
+        if future is not None:
+            return await asyncio.shield(future)
+        future = asyncio.get_running_loop().create_future()
+        self.pending_async[key] = future
+        try:
+            value = await fetch()
+            self.put(key, value)
+            future.set_result(value)
+            return value
+        except Exception as error:
+            future.set_exception(error)
+            future.exception()
+            raise
+        finally:
+            del self.pending_async[key]
+
+
+def fetch_homework_statuses(cache, url, current_timestamp, token):
+    """Запрашивает статусы домашек через кэш ответов."""
+    return cache.get_or_fetch(
+        response_key(token, current_timestamp),
+        lambda: homework.fetch_homework_statuses(url, current_timestamp,
+                                                 token)
+    )
@@ -0,0 +1,128 @@
+import logging
+import time
+
+import config
+import storage
+import templates
+
+HISTORY_LIMIT = 10
+DATE_FORMAT = '%d.%m.%Y %H:%M'
+COMMAND_RECEIVED = 'Команда /{command} из чата {chat_id}'
+OWNER_COMMANDS = frozenset({'pause', 'resume'})
+
+
+def status_text(store, tenant, locale=templates.DEFAULT_LOCALE):
+    """Возвращает текущие статусы всех известных работ ученика."""
+    messages = templates.catalog(locale)
+    lines = [messages.render('status_line', homework_name=name,
+                             verdict=messages.verdict(status))
+             for name, status in store.latest_statuses(tenant)]
+    return '\n'.join(lines) or messages.render('no_data')
+
+
+def history_text(store, tenant, locale=templates.DEFAULT_LOCALE,
+                 limit=HISTORY_LIMIT):
+    """Возвращает последние изменения статусов работ ученика."""
+    messages = templates.catalog(locale)
+    lines = [messages.render(
+        'history_line',
+        date=time.strftime(DATE_FORMAT, time.localtime(changed_at)),
+        homework_name=name, verdict=messages.verdict(status)
+    ) for name, status, changed_at in store.history(tenant, limit)]
+    return '\n'.join(lines) or messages.render('no_data')
+
+
+def pause_text(store, tenant, locale=templates.DEFAULT_LOCALE):
+    """Приостанавливает опрос ученика."""
+    store.set_paused(tenant, True)
+    return templates.render(locale, 'paused')
+
+
+def resume_text(store, tenant, locale=templates.DEFAULT_LOCALE):
+    """Возобновляет опрос ученика."""
+    store.set_paused(tenant, False)
+    return templates.render(locale, 'resumed')
+
+
+def reply_text(render, store, keys, locale=templates.DEFAULT_LOCALE):
+    """Выполняет команду для всех учеников чата.
+    В общем чате ответы по ученикам разделяются пустой строкой.
+    """
+    return '\n\n'.join(render(store, key, locale) for key in keys)
+
+
+def allowed_keys(command, chat_id, owners):
+    """Возвращает ключи учеников, для которых чат может выполнить команду.
+    Опрос приостанавливает и возобновляет только собственный чат ученика,
+    чатам подписчиков доступны лишь команды чтения.
+    """
+    return tuple(key for key, owner_chat in owners
+                 if command not in OWNER_COMMANDS or owner_chat == chat_id)
+
+
+COMMANDS = {
+    'status': status_text,
+    'history': history_text,
+    'pause': pause_text,
+    'resume': resume_text,
+}
+
+
+def make_handler(command, chats, store_path, locales=None):
+    """Создаёт обработчик команды, отвечающий из локального хранилища.
+    К API Практикума обработчики не обращаются.
+    chats сопоставляет id чата с парами из ключа ученика и его чата,
+    locales - с языком ответов. Команды из OWNER_COMMANDS выполняются
+    только в собственном чате ученика.
+    """
+    render = COMMANDS[command]
+
+    def handle(update, context):
+        chat_id = str(update.effective_chat.id)
+        logging.info(COMMAND_RECEIVED.format(command=command,
+                                             chat_id=chat_id),
+                     extra={'chat_id': chat_id})
+        locale = (locales or {}).get(chat_id, templates.DEFAULT_LOCALE)
+        owners = chats.get(chat_id)
+        if not owners:
+            update.message.reply_text(templates.render(locale,
+                                                       'unknown_chat'))
+            return
+        keys = allowed_keys(command, chat_id, owners)
+        if not keys:
+            update.message.reply_text(templates.render(locale,
+                                                       'owner_only'))
+            return
+        store = storage.StatusStore(store_path)
+        try:
+            update.message.reply_text(reply_text(render, store, keys,
+                                                 locale))
+        finally:
+            store.close()
+
+    return handle
+
+
+def start_commands(chats, token=None, store_path=None, locales=None):
+    """Запускает приём команд через вебхук или long polling.
+    chats сопоставляет id чата с парами из ключа ученика и его чата
+    (см. tenants.chats_of), locales - с языком ответов.
+    """
+    from telegram.ext import CommandHandler, Updater
+
+    settings = config.get_config()
+    token = token or settings.telegram_token
+    store_path = store_path or settings.store_path
+    updater = Updater(token=token, use_context=True)
+    for command in COMMANDS:
+        updater.dispatcher.add_handler(CommandHandler(
+            command, make_handler(command, chats, store_path, locales)
+        ))
+    if settings.webhook_url:
+        updater.start_webhook(listen='0.0.0.0', port=settings.port,
+                              url_path=token,
+                              webhook_url=settings.webhook_url.rstrip('/')
+                              + '/' + token)
+    else:
+        updater.start_polling()
+    return updater
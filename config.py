@@ -0,0 +1,106 @@
+import os
+import socket
+from dataclasses import dataclass, fields, replace
+from typing import Optional
+
+ENV_NAMES = {'worker_prefix': 'DYNO'}
+
+_config = None
+
+
+@dataclass(frozen=True)
+class Config:
+    """Настройки бота из переменных окружения.
+    Переменная окружения называется как поле, но в верхнем регистре
+    (исключения - в ENV_NAMES).
+    """
+
+    practicum_token: Optional[str] = None
+    telegram_token: Optional[str] = None
+    chat_id: Optional[str] = None
+    operator_chat_id: Optional[str] = None
+    http_pool_size: int = 10
+    connect_timeout: float = 5.0
+    read_timeout: float = 30.0
+    max_in_flight: int = 100
+    keepalive_timeout: float = 60.0
+    cache_ttl: int = 60
+    cache_size: int = 10000
+    cache_path: Optional[str] = None
+    webhook_url: Optional[str] = None
+    port: int = 8443
+    log_path: str = 'homework_bot.log'
+    log_level: str = 'INFO'
+    log_max_bytes: int = 10 * 1024 * 1024
+    log_backups: int = 5
+    metrics_port: Optional[str] = None
+    outbox_workers: int = 4
+    shard_workers: int = os.cpu_count() or 1
+    worker_prefix: str = socket.gethostname()
+    shutdown_deadline: float = 20.0
+    store_path: str = 'homework_bot.db'
+    error_cooldown: int = 3600
+    checkpoint_every: int = 100
+    checkpoint_interval: float = 1.0
+    backfill_notify_limit: int = 10
+    resync_overlap: int = 300
+    homework_url: str = 'https://practicum.yandex.ru/learn/'
+    tenants_path: str = 'tenants.json'
+    latency_budget: float = 30.0
+    profiler: str = ''
+    profile_dir: str = 'profiles'
+    trace_file: Optional[str] = None
+    warmup_workers: int = 8
+
+    @classmethod
+    def from_env(cls, environ=os.environ):
+        """Собирает настройки из словаря переменных окружения.
+        Значение приводится к типу значения поля по умолчанию;
+        без OPERATOR_CHAT_ID оператором считается CHAT_ID.
+        """
+        values = {}
+        for field in fields(cls):
+            value = environ.get(ENV_NAMES.get(field.name,
+                                              field.name.upper()))
+            if value is None:
+                continue
+            if field.default is not None:
+                value = type(field.default)(value)
+            values[field.name] = value
+        values.setdefault('operator_chat_id', values.get('chat_id'))
+        return cls(**values)
+
+
+def load_config():
+    """Читает .env и окружение и запоминает настройки.
+    Вызывается при первом обращении, а не при импорте модулей.
+    """
+    global _config
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    _config = Config.from_env()
+    return _config
+
+
+def get_config():
+    """Возвращает настройки, загружая их при первом обращении."""
+    return _config or load_config()
+
+
+def setting(name, value=None):
+    """Возвращает value, а если оно не задано - настройку name."""
+    return getattr(get_config(), name) if value is None else value
+
+
+def override(**changes):
+    """Подменяет отдельные настройки, например в тестах и замерах."""
+    global _config
+    _config = replace(get_config(), **changes)
+    return _config
+
+
+def reset():
+    """Сбрасывает настройки, чтобы следующее обращение перечитало их."""
+    global _config
+    _config = None
@@ -1,13 +1,17 @@
 import logging
-import os
-import sys
-import time
+from dataclasses import dataclass
+from enum import Enum
+from typing import Optional
 
-import requests
-import telegram
-from dotenv import load_dotenv
-
-load_dotenv()
+import config
+import logs
+import metrics
+import shutdown
+import storage
+import streaming
+import sync
+import templates
+import tracing
 
 
 class DenialOfServiceError(Exception):
@@ -28,34 +32,32 @@ class SendMessageError(Exception):
     pass
 
 
-PRACTICUM_TOKEN = os.getenv('PRACTICUM_TOKEN')
-TELEGRAM_TOKEN = os.getenv('TELEGRAM_TOKEN')
-CHAT_ID = os.getenv('CHAT_ID')
-HEADERS = {'Authorization': f'OAuth { PRACTICUM_TOKEN }'}
+class InvalidHomeworkError(Exception):
+    """Кастомная ошибка при работе, не подходящей под схему ответа API."""
+
+    pass
+
+
+class InvalidTokenError(Exception):
+    """Кастомная ошибка при токене, отклонённом API Практикума."""
+
+    pass
+
+
 MISSING_ENV_VAR = 'Отсутствует переменная окружения - {}'
-UNEXPECTED_STATUS_OF_ENDPOINT = ('Неожидаемый статус эндпоинта:\n'
-                                 'status={status}\n'
-                                 'url={url}\n'
-                                 'headers={headers}\n'
+UNEXPECTED_STATUS_OF_ENDPOINT = ('Неожидаемый статус эндпоинта: '
+                                 'status={status}, url={url}, '
                                  'params={params}')
-STATUS_IS_CHANGED = (
-    'Изменился статус проверки работы "{homework_name}". {verdict}'
-)
 UNKNOWN_STATUS = 'У домашней работы неизвестный статус: {}'
-STATUS_IS_NOT_CHANGED = 'Статус работы не изменился'
-FAILURE_IN_PROGRAM = 'Сбой в работе программы: {}'
+INVALID_HOMEWORK = 'Работа не подходит под схему ответа API: {field}={value!r}'
 MESSAGE_SENT_SUCCESSFULLY = 'Сообщение "{}" отправлено успешно'
 ERROR_SENDING_MESSAGE = 'Ошибка при отправке сообщения: {}'
-NETWORK_FAILURE = ('Произошёл сбой сети: {error}\n'
-                   'url={url}\n'
-                   'headers={headers}\n'
+NETWORK_FAILURE = ('Произошёл сбой сети: {error}, url={url}, '
                    'params={params}')
-DENIAL_OF_SERVICE = ('Отказ в обслуживании:\n'
-                     'code={code}\n'
-                     'error={error}\n'
-                     'url={url}\n'
-                     'headers={headers}\n'
-                     'params={params}')
+DENIAL_OF_SERVICE = ('Отказ в обслуживании: code={code}, error={error}, '
+                     'url={url}, params={params}')
+INVALID_TOKEN = 'API отклонило токен ученика: code={code}, url={url}'
+UNAUTHORIZED_CODE = 'not_authenticated'
 RETRY_TIME = 600
 ENDPOINT = 'https://practicum.yandex.ru/api/user_api/homework_statuses/'
 VERDICTS = {
@@ -63,16 +65,134 @@ VERDICTS = {
     'reviewing': 'Работа взята на проверку ревьюером.',
     'rejected': 'Работа проверена, в ней нашлись ошибки.'
 }
+HOMEWORK_SCHEMA = {
+    'homework_name': str,
+    'status': str,
+    'id': int,
+    'date_updated': str,
+}
+REQUIRED_FIELDS = ('homework_name', 'status')
+
+
+class Status(str, Enum):
+    """Статус проверки работы - ключ VERDICTS.
+    Члены перечисления единственны, поэтому статусы тысяч учеников
+    ссылаются на одни и те же объекты. Сравниваются и хешируются
+    как строки, так что годятся ключами наравне с ответом API.
+    """
+
+    APPROVED = 'approved'
+    REVIEWING = 'reviewing'
+    REJECTED = 'rejected'
+
+    __hash__ = str.__hash__
+
+    def __str__(self):
+        """Возвращает статус в виде из ответа API."""
+        return self.value
+
+    @property
+    def verdict(self):
+        """Вердикт ревьюера для статуса."""
+        return VERDICTS[self]
+
+
+@dataclass(frozen=True, slots=True)
+class Homework:
+    """Домашняя работа с полями из схемы ответа API.
+    Доступ по ключу оставлен для кода, работающего со словарями из ответа.
+    """
+
+    homework_name: str
+    status: Status
+    id: Optional[int] = None
+    date_updated: Optional[str] = None
+
+    @classmethod
+    def from_dict(cls, homework):
+        """Проверяет работу из ответа API по схеме и создаёт запись."""
+        compact = compact_homework(homework)
+        try:
+            compact['status'] = Status(compact['status'])
+        except ValueError:
+            raise ValueError(UNKNOWN_STATUS.format(compact['status']))
+        return cls(**compact)
+
+    def __getitem__(self, field):
+        """Возвращает поле работы, как у словаря из ответа API."""
+        if field not in HOMEWORK_SCHEMA:
+            raise KeyError(field)
+        return getattr(self, field)
+
+    def get(self, field, default=None):
+        """Возвращает поле работы или default, если оно не задано."""
+        if field not in HOMEWORK_SCHEMA or getattr(self, field) is None:
+            return default
+        return getattr(self, field)
+
+
+http = None
+
+
+def timeouts():
+    """Возвращает таймауты соединения и чтения из настроек."""
+    settings = config.get_config()
+    return settings.connect_timeout, settings.read_timeout
+
+
+def create_session(pool_size=None):
+    """Создаёт сессию с пулом постоянных соединений к API."""
+    import requests
+
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(
+        pool_connections=1,
+        pool_maxsize=pool_size or config.get_config().http_pool_size
+    )
+    session.mount('https://', adapter)
+    session.headers['Connection'] = 'keep-alive'
+    return session
+
+
+def configure_session(pool_size=None):
+    """Переключает запросы к API на общую сессию с пулом соединений."""
+    global http
+    http = create_session(pool_size)
+    return http
+
+
+def create_bot(token=None):
+    """Создаёт бота с пулом соединений и таймаутами запросов."""
+    import telegram
+    from telegram.utils.request import Request
+
+    settings = config.get_config()
+    request = Request(
+        con_pool_size=settings.http_pool_size,
+        connect_timeout=settings.connect_timeout,
+        read_timeout=settings.read_timeout
+    )
+    return telegram.Bot(token=token or settings.telegram_token,
+                        request=request)
 
 
 def send_message(bot, message):
     """Отправляет в Telegram сообщение."""
+    send_message_to(bot, config.get_config().chat_id, message)
+
+
+def send_message_to(bot, chat_id, message):
+    """Отправляет сообщение в указанный чат Telegram."""
+    import telegram
+
     try:
-        bot.send_message(
-            chat_id=CHAT_ID,
-            text=message
-        )
+        with tracing.span('send_message'), metrics.SEND_LATENCY.time():
+            bot.send_message(
+                chat_id=chat_id,
+                text=message
+            )
     except telegram.error.TelegramError as error:
+        metrics.SEND_FAILURES.inc(type(error).__name__)
         raise SendMessageError(ERROR_SENDING_MESSAGE.format(error))
     else:
         logging.info(MESSAGE_SENT_SUCCESSFULLY.format(message))
@@ -80,20 +200,81 @@ def send_message(bot, message):
 
 def get_api_answer(url, current_timestamp):
     """Отправляет запрос к API домашки на эндпоинт."""
-    params = dict(url=url, headers=HEADERS,
+    return fetch_homework_statuses(url, current_timestamp,
+                                   config.get_config().practicum_token)
+
+
+def fetch_homework_statuses(url, current_timestamp, token):
+    """Запрашивает статусы домашек ученика с указанным токеном."""
+    import requests
+
+    params = dict(url=url, headers={'Authorization': f'OAuth {token}'},
                   params={'from_date': current_timestamp})
     try:
-        response = requests.get(**params)
-    except requests.ConnectionError as error:
+        with metrics.API_LATENCY.time():
+            with tracing.span('get_api_answer'):
+                response = (http or requests).get(
+                    **params, timeout=timeouts(), stream=True
+                )
+            with tracing.span('response_json'):
+                response_json = read_status_answer(response, params)
+    except (requests.ConnectionError, requests.Timeout,
+            requests.exceptions.ChunkedEncodingError) as error:
+        metrics.API_NETWORK_FAILURES.inc()
         raise ConnectionError(NETWORK_FAILURE.format(error=error, **params))
-    response_json = response.json()
+    metrics.API_RESPONSES.inc(response.status_code)
+    return validate_api_answer(response_json, response.status_code, params)
+
+
+def read_answer(response):
+    """Разбирает тело ответа API по частям, не загружая его целиком.
+    Ответ без потокового чтения разбирается обычным json().
+    """
+    if not hasattr(response, 'iter_content'):
+        return response.json()
+    with response:
+        return streaming.parse_answer(
+            response.iter_content(streaming.CHUNK_SIZE), compact_homework
+        )
+
+
+def read_status_answer(response, params):
+    """Разбирает ответ API с учётом его HTTP-статуса.
+    Нечитаемое тело ответа с ошибкой (например, HTML-страница шлюза
+    при 502) - сбой эндпоинта, а не некорректный ответ.
+    """
+    try:
+        return read_answer(response)
+    except ValueError as error:
+        raise unreadable_answer(error, response.status_code, params)
+
+
+def unreadable_answer(error, status, params):
+    """Возвращает ошибку для тела ответа, которое не удалось разобрать."""
+    if status == 200:
+        return error
+    return EndpointUnexpectedStatusError(
+        UNEXPECTED_STATUS_OF_ENDPOINT.format(status=status, **params)
+    )
+
+
+def validate_api_answer(response_json, status, params):
+    """Проверяет ответ API на отказ в обслуживании и статус запроса.
+    Отклонённый токен - ошибка ученика, а не сбой API.
+    """
+    code = response_json.get('code')
+    if status == 401 or code == UNAUTHORIZED_CODE:
+        raise InvalidTokenError(INVALID_TOKEN.format(code=code, **params))
     if 'code' in response_json or 'error' in response_json:
+        metrics.API_DENIALS.inc()
         raise DenialOfServiceError(
-            DENIAL_OF_SERVICE.format(code=response_json['code'],
-                                     error=response_json['error'],
-                                     **params)
+            DENIAL_OF_SERVICE.format(
+                code=code,
+                error=response_json.get('error',
+                                        response_json.get('message')),
+                **params
+            )
         )
-    status = response.status_code
     if status != 200:
         raise EndpointUnexpectedStatusError(
             UNEXPECTED_STATUS_OF_ENDPOINT.format(status=status, **params)
@@ -101,55 +282,136 @@ def get_api_answer(url, current_timestamp):
     return response_json
 
 
+def compact_homework(homework):
+    """Проверяет работу по схеме и оставляет только поля из неё.
+    Пустые необязательные поля пропускаются.
+    """
+    if not isinstance(homework, dict):
+        raise InvalidHomeworkError(
+            INVALID_HOMEWORK.format(field='homework', value=homework)
+        )
+    compact = {}
+    for field, kind in HOMEWORK_SCHEMA.items():
+        value = homework.get(field)
+        if value is None and field not in REQUIRED_FIELDS:
+            continue
+        if not isinstance(value, kind):
+            raise InvalidHomeworkError(
+                INVALID_HOMEWORK.format(field=field, value=value)
+            )
+        compact[field] = value
+    return compact
+
+
+@tracing.traced('check_response')
 def check_response(response):
-    """Проверяет наличие домашней работы и корректность её статуса.
-    Возвращает домашнюю работу, если статус изменился.
+    """Проверяет наличие домашних работ и корректность их статусов.
+    Возвращает список всех домашних работ из ответа.
     """
-    homework = response['homeworks'][0]
-    status = homework['status']
-    if status not in VERDICTS:
-        raise ValueError(UNKNOWN_STATUS.format(status))
-    return homework
+    try:
+        homeworks = response['homeworks']
+        for homework in homeworks:
+            compact_homework(homework)
+    except (KeyError, InvalidHomeworkError):
+        metrics.CHECK_RESPONSE.inc('invalid')
+        raise
+    for homework in homeworks:
+        status = homework['status']
+        if status not in VERDICTS:
+            metrics.CHECK_RESPONSE.inc('unknown_status')
+            raise ValueError(UNKNOWN_STATUS.format(status))
+    metrics.CHECK_RESPONSE.inc('homeworks' if homeworks else 'empty')
+    return homeworks
 
 
+@tracing.traced('parse_status')
 def parse_status(homework):
     """Если статус изменился - возвращает сообщение.
     В сообщении имя и вердикт работы.
     """
-    return STATUS_IS_CHANGED.format(homework_name=homework['homework_name'],
-                                    verdict=VERDICTS[homework['status']])
+    return templates.render_status(templates.DEFAULT_LOCALE,
+                                   homework['status'],
+                                   homework['homework_name'])
+
+
+def parse_statuses(homeworks):
+    """Собирает сообщения о нескольких работах в одно."""
+    return templates.render_statuses(homeworks)
+
+
+@tracing.traced('parse_status')
+def announce(from_date, homeworks, locale=templates.DEFAULT_LOCALE,
+             markup='text'):
+    """Собирает уведомление об итоге опроса с курсора from_date.
+    После первой синхронизации показываются только последние работы.
+    """
+    homeworks, hidden = sync.visible(from_date, homeworks)
+    message = templates.render_statuses(homeworks, locale, markup)
+    if hidden:
+        message += '\n\n' + templates.render(locale, 'more_homeworks',
+                                             markup, count=hidden)
+    return message
+
+
+def error_key(error):
+    """Возвращает ключ ошибки для подавления повторных сообщений.
+    Текст сетевой ошибки содержит адрес объекта соединения и меняется
+    при каждой попытке, поэтому повторы сравниваются по классу ошибки.
+    """
+    return type(error).__name__
 
 
 def main():
-    """Бот-ассистент в бесконечном цикле выполняет ожидаемые операции."""
+    """Бот-ассистент в цикле выполняет ожидаемые операции.
+    Пауза между опросами зависит от статуса работы и растёт
+    при сбоях API, как у планировщика многопользовательского бота.
+    По SIGTERM или SIGINT дорабатывает текущий опрос и завершается.
+    """
+    import breaker
+    import commands
+    import outbox
+    import scheduler
+    import tenants
+    import warmup
+
+    settings = config.get_config()
     for name in ('PRACTICUM_TOKEN', 'TELEGRAM_TOKEN', 'CHAT_ID'):
-        if globals()[name] is None:
+        if getattr(settings, name.lower()) is None:
             logging.critical(MISSING_ENV_VAR.format(name))
             raise NameError(MISSING_ENV_VAR.format(name))
-    bot = telegram.Bot(token=TELEGRAM_TOKEN)
-    timestamp = int(time.time())
-    while True:
+    shutdown.install()
+    configure_session()
+    metrics.start_metrics_server()
+    outgoing = outbox.Outbox()
+    bot = create_bot()
+    warmup.validate_bot(bot)
+    warmup.check_chat(bot, settings.chat_id)
+    dispatcher = outbox.Dispatcher(outgoing, bot).start()
+    store = storage.StatusStore()
+    tenant = tenants.Tenant(token=settings.practicum_token,
+                            chat_id=str(settings.chat_id))
+    tenant.from_date = store.get_cursor(tenant.key, sync.BACKFILL_FROM)
+    updater = commands.start_commands(
+        {tenant.chat_id: ((tenant.key, tenant.chat_id),)}
+    )
+    breaker.BREAKER.listen(breaker.operator_alert(outgoing, store))
+    while not shutdown.stopping():
+        if store.is_paused(tenant.key) or not breaker.BREAKER.allow():
+            shutdown.wait(max(RETRY_TIME, breaker.BREAKER.retry_after()))
+            continue
         try:
-            response = get_api_answer(ENDPOINT, timestamp)
-            homework = check_response(response)
-            message = parse_status(homework)
-            send_message(bot, message)
-            timestamp = response.get('current_date', timestamp)
-        except IndexError:
-            logging.info(STATUS_IS_NOT_CHANGED)
-            send_message(bot, STATUS_IS_NOT_CHANGED)
+            with tracing.iteration('main'):
+                tenants.apply_response(
+                    outgoing, tenant, store,
+                    get_api_answer(ENDPOINT, tenant.from_date)
+                )
         except Exception as error:
-            logging.exception(FAILURE_IN_PROGRAM.format(error))
-            send_message(bot, FAILURE_IN_PROGRAM.format(error))
-        time.sleep(RETRY_TIME)
+            scheduler.record_result(tenant, error)
+            tenants.report_failure(outgoing, tenant, store, error)
+        shutdown.wait(scheduler.next_interval(tenant))
+    shutdown.finish(store, dispatcher, updater)
 
 
 if __name__ == '__main__':
-    logging.basicConfig(
-        level=logging.INFO,
-        format=('%(asctime)s [%(levelname)s] %(name)s,'
-                ' line %(lineno)d, %(message)s'),
-        handlers=[logging.StreamHandler(stream=sys.stdout),
-                  logging.FileHandler(filename=__file__ + '.log')]
-    )
+    logs.setup_logging()
     main()
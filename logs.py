@@ -0,0 +1,180 @@
+import atexit
+import copy
+import json
+import logging
+import logging.handlers
+import queue
+import re
+import sys
+import threading
+import time
+
+import config
+import metrics
+
+LOG_QUEUE_SIZE = 10000
+RATE_WINDOW = 60
+RATE_BURST = 5
+RATE_SAMPLE = 100
+CONTEXT_FIELDS = ('tenant', 'chat_id', 'suppressed')
+REDACTED = '***'
+SECRET_PATTERNS = (
+    (re.compile(r'OAuth\s+[^\s\'",}]+'), f'OAuth {REDACTED}'),
+    (re.compile(r'bot\d+:[\w-]+'), f'bot{REDACTED}'),
+    (re.compile(r'\by0_[\w-]+'), REDACTED),
+)
+
+
+def redact(text, secrets=()):
+    """Заменяет в тексте токены и заголовки авторизации на REDACTED."""
+    for secret in secrets:
+        text = text.replace(secret, REDACTED)
+    for pattern, replacement in SECRET_PATTERNS:
+        text = pattern.sub(replacement, text)
+    return text
+
+
+def tenant_fields(tenant):
+    """Возвращает поля ученика для extra записи лога."""
+    return {'tenant': tenant.key, 'chat_id': tenant.chat_id}
+
+
+class JsonFormatter(logging.Formatter):
+    """Пишет запись одной строкой JSON с полями ученика.
+    Токены из текста и трассировки вырезаются.
+    """
+
+    def __init__(self, secrets=None):
+        """Запоминает токены из настроек для вырезания."""
+        super().__init__()
+        if secrets is None:
+            settings = config.get_config()
+            secrets = (settings.practicum_token, settings.telegram_token)
+        self.secrets = tuple(secret for secret in secrets if secret)
+
+    def format(self, record):
+        """Собирает строку JSON из записи."""
+        entry = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'process': record.processName,
+            'module': record.module,
+            'line': record.lineno,
+            'message': redact(record.getMessage(), self.secrets),
+        }
+        for field in CONTEXT_FIELDS:
+            if hasattr(record, field):
+                entry[field] = getattr(record, field)
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exception'] = redact(record.exc_text, self.secrets)
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class RateLimitFilter(logging.Filter):
+    """Ограничивает поток одинаковых предупреждений и ошибок.
+    С одного места в коде за окно window проходят burst записей,
+    дальше - каждая sample-я с числом пропущенных в поле suppressed.
+    """
+
+    def __init__(self, window=RATE_WINDOW, burst=RATE_BURST,
+                 sample=RATE_SAMPLE, clock=time.monotonic):
+        """Создаёт фильтр с пустой статистикой."""
+        super().__init__()
+        self.window = window
+        self.burst = burst
+        self.sample = sample
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.counts = {}
+
+    def filter(self, record):
+        """Решает, пропустить ли запись."""
+        if record.levelno < logging.WARNING:
+            return True
+        now = self.clock()
+        with self.lock:
+            state = self.counts.setdefault((record.pathname, record.lineno),
+                                           [now, 0, 0])
+            if now - state[0] >= self.window:
+                state[0], state[1] = now, 0
+            state[1] += 1
+            if state[1] > self.burst and (state[1] - self.burst) % self.sample:
+                state[2] += 1
+                metrics.LOG_RECORDS_DROPPED.inc('rate_limited')
+                return False
+            if state[2]:
+                record.suppressed, state[2] = state[2], 0
+        return True
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """Кладёт записи в очередь, не блокируя вызывающий поток.
+    При переполненной очереди запись отбрасывается.
+    """
+
+    def prepare(self, record):
+        """Готовит запись к передаче в другой поток или процесс.
+        Форматирование в JSON остаётся слушателю очереди.
+        """
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(
+                record.exc_info
+            )
+        record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        """Кладёт запись в очередь или отбрасывает её."""
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            metrics.LOG_RECORDS_DROPPED.inc('queue_full')
+
+
+class LogListener(logging.handlers.QueueListener):
+    """Слушатель очереди логов, который можно останавливать повторно."""
+
+    def stop(self):
+        """Дописывает оставшиеся записи и останавливает поток."""
+        if self._thread is not None:
+            super().stop()
+
+
+def attach(log_queue, level=None):
+    """Направляет все записи процесса в очередь log_queue."""
+    handler = DroppingQueueHandler(log_queue)
+    handler.addFilter(RateLimitFilter())
+    root = logging.getLogger()
+    root.handlers = [handler]
+    root.setLevel(config.setting('log_level', level))
+    return handler
+
+
+def setup_logging(path=None, level=None, log_queue=None):
+    """Запускает запись логов в stdout и файл с ротацией в фоновом потоке.
+    Для воркеров-процессов передайте multiprocessing.Queue в log_queue
+    и подключите к ней воркеры через attach.
+    """
+    if log_queue is None:
+        log_queue = queue.Queue(LOG_QUEUE_SIZE)
+    settings = config.get_config()
+    formatter = JsonFormatter()
+    handlers = [
+        logging.StreamHandler(stream=sys.stdout),
+        logging.handlers.RotatingFileHandler(
+            path or settings.log_path, maxBytes=settings.log_max_bytes,
+            backupCount=settings.log_backups, encoding='utf-8'
+        ),
+    ]
+    for handler in handlers:
+        handler.setFormatter(formatter)
+    attach(log_queue, level)
+    listener = LogListener(log_queue, *handlers)
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
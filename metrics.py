@@ -0,0 +1,235 @@
+import threading
+import time
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10,
+                   30, 60)
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+REGISTRY = []
+
+
+def _labels(names, values):
+    """Форматирует метки в синтаксисе Prometheus."""
+    if not names:
+        return ''
+    pairs = ','.join(f'{name}="{value}"' for name, value in zip(names, values))
+    return '{' + pairs + '}'
+
+
+class Counter:
+    """Счётчик, который только растёт."""
+
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        """Регистрирует счётчик."""
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.values = {}
+        self.lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def inc(self, *labels, amount=1):
+        """Увеличивает счётчик для набора меток."""
+        with self.lock:
+            self.values[labels] = self.values.get(labels, 0) + amount
+
+    def samples(self):
+        """Возвращает строки с текущими значениями."""
+        with self.lock:
+            values = sorted(self.values.items())
+        return [f'{self.name}{_labels(self.labelnames, labels)} {value}'
+                for labels, value in values]
+
+
+class Gauge:
+    """Значение, вычисляемое в момент чтения метрик."""
+
+    kind = 'gauge'
+
+    def __init__(self, name, documentation):
+        """Регистрирует показатель без источника значения."""
+        self.name = name
+        self.documentation = documentation
+        self.function = None
+        REGISTRY.append(self)
+
+    def set_function(self, function):
+        """Задаёт функцию, возвращающую текущее значение."""
+        self.function = function
+
+    def samples(self):
+        """Возвращает строку с текущим значением."""
+        if self.function is None:
+            return []
+        return [f'{self.name} {self.function()}']
+
+
+class Histogram:
+    """Распределение значений по корзинам."""
+
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(),
+                 buckets=DEFAULT_BUCKETS):
+        """Регистрирует гистограмму."""
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = buckets
+        self.values = {}
+        self.lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def observe(self, value, *labels):
+        """Учитывает одно наблюдение."""
+        index = bisect_left(self.buckets, value)
+        with self.lock:
+            counts = self.values.get(labels)
+            if counts is None:
+                counts = self.values[labels] = [0] * (len(self.buckets) + 2)
+            counts[index] += 1
+            counts[-1] += value
+
+    def time(self, *labels):
+        """Возвращает контекстный менеджер, замеряющий длительность."""
+        return _Timer(self, labels)
+
+    def samples(self):
+        """Возвращает строки с корзинами, суммой и числом наблюдений."""
+        with self.lock:
+            values = [(labels, list(counts))
+                      for labels, counts in sorted(self.values.items())]
+        lines = []
+        for labels, counts in values:
+            total = 0
+            for bound, count in zip((*self.buckets, '+Inf'), counts):
+                total += count
+                lines.append('{}_bucket{} {}'.format(
+                    self.name,
+                    _labels((*self.labelnames, 'le'), (*labels, bound)),
+                    total
+                ))
+            label_text = _labels(self.labelnames, labels)
+            lines.append(f'{self.name}_sum{label_text} {counts[-1]}')
+            lines.append(f'{self.name}_count{label_text} {total}')
+        return lines
+
+
+class _Timer:
+    """Замер длительности блока кода для гистограммы."""
+
+    def __init__(self, histogram, labels):
+        """Запоминает гистограмму и метки."""
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        """Засекает начало блока."""
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        """Записывает длительность блока, в том числе при ошибке."""
+        self.histogram.observe(time.perf_counter() - self.started,
+                               *self.labels)
+        return False
+
+
+def render():
+    """Возвращает все метрики в текстовом формате Prometheus."""
+    lines = []
+    for metric in REGISTRY:
+        lines.append(f'# HELP {metric.name} {metric.documentation}')
+        lines.append(f'# TYPE {metric.name} {metric.kind}')
+        lines.extend(metric.samples())
+    return '\n'.join(lines) + '\n'
+
+
+def clear():
+    """Обнуляет счётчики и гистограммы.
+    Нужно дочернему процессу, унаследовавшему значения родителя.
+    """
+    for metric in REGISTRY:
+        if hasattr(metric, 'values'):
+            with metric.lock:
+                metric.values.clear()
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    """Отдаёт метрики по адресу /metrics."""
+
+    def do_GET(self):
+        """Отвечает на запрос метрик."""
+        if self.path != '/metrics':
+            self.send_error(404)
+            return
+        body = render().encode()
+        self.send_response(200)
+        self.send_header('Content-Type', CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        """Не пишет в лог каждый запрос метрик."""
+        pass
+
+
+def start_metrics_server(port=None, host='127.0.0.1'):
+    """Запускает HTTP-сервер метрик в фоновом потоке.
+    Без порта (ни в аргументе, ни в METRICS_PORT) сервер не запускается.
+    """
+    import config
+
+    port = config.setting('metrics_port', port)
+    if port is None:
+        return None
+    server = ThreadingHTTPServer((host, int(port)), MetricsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+API_LATENCY = Histogram('homework_api_request_seconds',
+                        'Длительность запроса к API Практикума')
+API_RESPONSES = Counter('homework_api_responses_total',
+                        'Ответы API Практикума по HTTP-статусу', ('status',))
+API_DENIALS = Counter('homework_api_denials_total',
+                      'Отказы API Практикума в обслуживании')
+API_NETWORK_FAILURES = Counter('homework_api_network_failures_total',
+                               'Сетевые сбои при запросе к API Практикума')
+CHECK_RESPONSE = Counter('homework_check_response_total',
+                         'Результаты проверки ответа API', ('outcome',))
+SEND_LATENCY = Histogram('telegram_send_seconds',
+                         'Длительность отправки сообщения в Telegram')
+SEND_FAILURES = Counter('telegram_send_failures_total',
+                        'Неудачные отправки в Telegram', ('error',))
+OUTBOX_DEPTH = Gauge('outbox_pending_messages',
+                     'Недоставленные сообщения в очереди')
+SCHEDULER_LAG = Histogram('scheduler_lag_seconds',
+                          'Опоздание опроса относительно плана')
+API_BREAKER_STATE = Gauge('homework_api_breaker_state',
+                          'Предохранитель API: 0 - замкнут, 1 - проба,'
+                          ' 2 - разомкнут')
+API_BREAKER_TRANSITIONS = Counter('homework_api_breaker_transitions_total',
+                                  'Размыкания и замыкания предохранителя API',
+                                  ('state',))
+LOG_RECORDS_DROPPED = Counter('log_records_dropped_total',
+                              'Записи лога, отброшенные ограничителем'
+                              ' или при переполненной очереди', ('reason',))
+SYNC_GAPS = Counter('homework_sync_gaps_total',
+                    'Пропуски курсора опроса, вызвавшие повторную'
+                    ' синхронизацию окна', ('reason',))
+TENANTS_QUARANTINED = Counter('tenants_quarantined_total',
+                              'Ученики, снятые с опроса при прогреве',
+                              ('error',))
+STAGE_LATENCY = Histogram('poll_stage_seconds',
+                          'Длительность этапов опроса', ('stage',))
+ITERATION_LATENCY = Histogram('poll_iteration_seconds',
+                              'Длительность итераций цикла опроса',
+                              ('iteration',))
+SLOW_ITERATIONS = Counter('poll_slow_iterations_total',
+                          'Итерации опроса дольше бюджета задержки',
+                          ('iteration',))
@@ -0,0 +1,265 @@
+import logging
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import List, Optional
+
+import config
+import metrics
+import tracing
+
+GLOBAL_RATE = 30
+CHAT_INTERVAL = 1.0
+MAX_ATTEMPTS = 5
+MAX_BACKOFF = 300
+MAX_MESSAGE_LENGTH = 4096
+CLAIM_LIMIT = 500
+DISPATCH_TICK = 0.05
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS outbox ('
+    ' id INTEGER PRIMARY KEY AUTOINCREMENT, chat_id TEXT, text TEXT,'
+    ' attempts INTEGER DEFAULT 0, not_before REAL DEFAULT 0,'
+    ' parse_mode TEXT)'
+)
+ADD_PARSE_MODE = 'ALTER TABLE outbox ADD COLUMN parse_mode TEXT'
+MESSAGE_SENT_SUCCESSFULLY = 'Сообщение "{}" отправлено успешно'
+MESSAGE_DROPPED = 'Сообщение в чат {chat_id} не будет доставлено: {error}'
+MESSAGE_POSTPONED = ('Сообщение в чат {chat_id} отложено на {delay:.0f} с:'
+                     ' {error}')
+
+
+@dataclass
+class Batch:
+    """Пачка сообщений одного чата, отправляемая одним запросом."""
+
+    chat_id: str
+    ids: List[int]
+    text: str
+    attempts: int = 0
+    parse_mode: Optional[str] = None
+
+
+class RateLimiter:
+    """Ограничитель отправки по лимитам Telegram.
+    Не больше GLOBAL_RATE сообщений в секунду всего
+    и одного сообщения в CHAT_INTERVAL секунд в каждый чат.
+    """
+
+    def __init__(self, rate=GLOBAL_RATE, chat_interval=CHAT_INTERVAL,
+                 clock=time.monotonic):
+        """Создаёт ограничитель с полным запасом токенов."""
+        self.rate = rate
+        self.chat_interval = chat_interval
+        self.clock = clock
+        self.tokens = rate
+        self.updated = clock()
+        self.chat_ready_at = {}
+
+    def block(self, chat_id, delay):
+        """Запрещает отправку в чат на delay секунд."""
+        self.chat_ready_at[chat_id] = self.clock() + delay
+
+    def acquire(self, chat_id):
+        """Резервирует отправку в чат, если лимиты это позволяют."""
+        now = self.clock()
+        self.tokens = min(self.rate,
+                          self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens < 1 or self.chat_ready_at.get(chat_id, 0) > now:
+            return False
+        self.tokens -= 1
+        self.chat_ready_at[chat_id] = now + self.chat_interval
+        if len(self.chat_ready_at) > CLAIM_LIMIT:
+            self.chat_ready_at = {chat: ready_at for chat, ready_at
+                                  in self.chat_ready_at.items()
+                                  if ready_at > now}
+        return True
+
+
+def digest_time(window, now=None):
+    """Возвращает конец текущего окна сводки длиной window секунд.
+    Все сообщения окна становятся готовы разом, и claim склеивает их
+    в одну пачку. Без окна возвращает 0 - отправить сразу.
+    """
+    if not window:
+        return 0
+    if now is None:
+        now = time.time()
+    return (now // window + 1) * window
+
+
+class Outbox:
+    """Очередь исходящих сообщений в SQLite.
+    Сообщения переживают перезапуск и удаляются только после доставки.
+    """
+
+    def __init__(self, path=None, limiter=None):
+        """Открывает очередь и создаёт таблицу."""
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(config.setting('store_path', path),
+                                          check_same_thread=False)
+        self.limiter = limiter or RateLimiter()
+        self.in_flight = set()
+        metrics.OUTBOX_DEPTH.set_function(self.__len__)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        with self.connection:
+            self.connection.execute(SCHEMA)
+            columns = {column for _, column, *_ in self.connection.execute(
+                'PRAGMA table_info(outbox)'
+            )}
+            if 'parse_mode' not in columns:
+                self.connection.execute(ADD_PARSE_MODE)
+
+    def __len__(self):
+        """Возвращает число недоставленных сообщений."""
+        with self.lock:
+            return self.connection.execute(
+                'SELECT COUNT(*) FROM outbox'
+            ).fetchone()[0]
+
+    def due(self):
+        """Возвращает число сообщений, которые пора отправить."""
+        with self.lock:
+            return self.connection.execute(
+                'SELECT COUNT(*) FROM outbox WHERE not_before <= ?',
+                (time.time(),)
+            ).fetchone()[0]
+
+    def put(self, chat_id, text, parse_mode=None, not_before=0):
+        """Ставит сообщение в очередь на отправку.
+        parse_mode - разметка Telegram: None, MarkdownV2 или HTML.
+        Раньше not_before (время Unix) сообщение не уходит.
+        """
+        with self.lock, self.connection:
+            self.connection.execute(
+                'INSERT INTO outbox (chat_id, text, parse_mode, not_before)'
+                ' VALUES (?, ?, ?, ?)',
+                (str(chat_id), text, parse_mode, not_before)
+            )
+
+    def claim(self):
+        """Забирает готовые к отправке сообщения с учётом лимитов.
+        Сообщения одного чата склеиваются в пачку до MAX_MESSAGE_LENGTH,
+        если у них одна разметка.
+        """
+        with self.lock:
+            rows = self.connection.execute(
+                'SELECT id, chat_id, text, attempts, parse_mode FROM outbox'
+                ' WHERE not_before <= ? ORDER BY id LIMIT ?',
+                (time.time(), CLAIM_LIMIT)
+            ).fetchall()
+            batches = {}
+            closed = set()
+            for message_id, chat_id, text, attempts, parse_mode in rows:
+                if message_id in self.in_flight or chat_id in closed:
+                    continue
+                batch = batches.get(chat_id)
+                if batch is None:
+                    if not self.limiter.acquire(chat_id):
+                        closed.add(chat_id)
+                        continue
+                    batches[chat_id] = Batch(chat_id, [message_id], text,
+                                             attempts, parse_mode)
+                elif (batch.parse_mode == parse_mode and len(batch.text)
+                      + len(text) + 2 <= MAX_MESSAGE_LENGTH):
+                    batch.ids.append(message_id)
+                    batch.text = f'{batch.text}\n\n{text}'
+                    batch.attempts = max(batch.attempts, attempts)
+                else:
+                    closed.add(chat_id)
+            for batch in batches.values():
+                self.in_flight.update(batch.ids)
+            return list(batches.values())
+
+    def complete(self, batch):
+        """Удаляет доставленные сообщения из очереди."""
+        with self.lock, self.connection:
+            self.connection.executemany(
+                'DELETE FROM outbox WHERE id = ?',
+                [(message_id,) for message_id in batch.ids]
+            )
+            self.in_flight.difference_update(batch.ids)
+
+    def fail(self, batch, error):
+        """Откладывает или выбрасывает пачку в зависимости от ошибки."""
+        from telegram.error import BadRequest, RetryAfter, Unauthorized
+
+        if isinstance(error, (BadRequest, Unauthorized)) or (
+            batch.attempts + 1 >= MAX_ATTEMPTS
+        ):
+            logging.error(MESSAGE_DROPPED.format(chat_id=batch.chat_id,
+                                                 error=error),
+                          extra={'chat_id': batch.chat_id})
+            self.complete(batch)
+            return
+        if isinstance(error, RetryAfter):
+            delay, attempts = error.retry_after, batch.attempts
+            self.limiter.block(batch.chat_id, delay)
+        else:
+            delay = min(MAX_BACKOFF, 2 ** batch.attempts)
+            attempts = batch.attempts + 1
+        logging.warning(MESSAGE_POSTPONED.format(chat_id=batch.chat_id,
+                                                 delay=delay, error=error),
+                        extra={'chat_id': batch.chat_id})
+        with self.lock, self.connection:
+            self.connection.executemany(
+                'UPDATE outbox SET attempts = ?, not_before = ? WHERE id = ?',
+                [(attempts, time.time() + delay, message_id)
+                 for message_id in batch.ids]
+            )
+            self.in_flight.difference_update(batch.ids)
+
+
+class Dispatcher:
+    """Пул потоков, разбирающий очередь сообщений в Telegram."""
+
+    def __init__(self, outbox, bot, workers=None):
+        """Готовит пул из workers потоков отправки."""
+        self.outbox = outbox
+        self.bot = bot
+        self.executor = ThreadPoolExecutor(config.setting('outbox_workers',
+                                                          workers))
+        self.stopped = threading.Event()
+
+    def start(self):
+        """Запускает разбор очереди в фоновом потоке."""
+        threading.Thread(target=self.run, daemon=True).start()
+        return self
+
+    def run(self):
+        """Раздаёт пачки сообщений потокам, пока не остановлен."""
+        while not self.stopped.wait(DISPATCH_TICK):
+            for batch in self.outbox.claim():
+                self.executor.submit(self.deliver, batch)
+
+    def deliver(self, batch):
+        """Отправляет пачку и сообщает очереди о результате."""
+        from telegram.error import TelegramError
+
+        try:
+            with tracing.span('send_message'), metrics.SEND_LATENCY.time():
+                self.bot.send_message(chat_id=batch.chat_id, text=batch.text,
+                                      parse_mode=batch.parse_mode)
+        except TelegramError as error:
+            metrics.SEND_FAILURES.inc(type(error).__name__)
+            self.outbox.fail(batch, error)
+        else:
+            self.outbox.complete(batch)
+            logging.info(MESSAGE_SENT_SUCCESSFULLY.format(batch.text))
+
+    def stop(self):
+        """Останавливает разбор очереди и дожидается текущих отправок."""
+        self.stopped.set()
+        self.executor.shutdown(wait=True)
+
+    def drain(self, until, clock=time.monotonic):
+        """Досылает готовые сообщения до момента until и останавливается.
+        Возвращает число сообщений, оставшихся в очереди к отправке.
+        """
+        while self.outbox.due() and clock() < until:
+            time.sleep(DISPATCH_TICK)
+        self.stopped.set()
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        return self.outbox.due()
@@ -0,0 +1,124 @@
+import heapq
+import itertools
+import random
+import time
+
+import breaker
+import homework
+import metrics
+
+STATUS_INTERVALS = {
+    homework.Status.REVIEWING: 120,
+    homework.Status.REJECTED: homework.RETRY_TIME,
+    homework.Status.APPROVED: 3600,
+    None: 1200,
+}
+RECENT_CHANGE_WINDOW = 1800
+RECENT_CHANGE_INTERVAL = 60
+MAX_BACKOFF = 3600
+JITTER = 0.1
+BACKOFF_ERRORS = (homework.DenialOfServiceError,
+                  homework.EndpointUnexpectedStatusError,
+                  ConnectionError)
+
+
+def record_result(tenant, error=None):
+    """Учитывает результат опроса для расчёта следующего интервала.
+    Результат получает и общий предохранитель API.
+    """
+    breaker.BREAKER.record(error)
+    if error is None:
+        tenant.failures = 0
+    elif isinstance(error, BACKOFF_ERRORS):
+        tenant.failures += 1
+
+
+def next_interval(tenant, now=None):
+    """Возвращает паузу до следующего опроса ученика.
+    Пауза зависит от статуса и давности его изменения,
+    при сбоях API растёт экспоненциально со случайным разбросом.
+    """
+    if now is None:
+        now = time.time()
+    if now - tenant.changed_at < RECENT_CHANGE_WINDOW:
+        interval = RECENT_CHANGE_INTERVAL
+    else:
+        interval = STATUS_INTERVALS.get(tenant.last_status,
+                                        homework.RETRY_TIME)
+    if tenant.failures:
+        backoff = min(MAX_BACKOFF, interval * 2 ** tenant.failures)
+        return random.uniform(backoff / 2, backoff)
+    return interval * random.uniform(1 - JITTER, 1 + JITTER)
+
+
+class Scheduler:
+    """Очередь учеников по времени следующего опроса на куче.
+    Первые опросы равномерно распределены по интервалу retry_time,
+    а только что опрошенные ученики из polled встают в очередь
+    через обычный интервал.
+    """
+
+    def __init__(self, tenants, retry_time=homework.RETRY_TIME,
+                 clock=time.monotonic, polled=()):
+        """Распределяет первые опросы учеников по интервалу."""
+        self.clock = clock
+        self.heap = []
+        self.counter = itertools.count()
+        self.spread(tenants, retry_time)
+        for tenant in polled:
+            self.reschedule(tenant)
+
+    def __len__(self):
+        """Возвращает число учеников в очереди."""
+        return len(self.heap)
+
+    def spread(self, tenants, window):
+        """Ставит учеников в очередь, распределяя опросы по window секунд."""
+        now = self.clock()
+        step = window / max(len(tenants), 1)
+        for index, tenant in enumerate(tenants):
+            self.push(tenant, now + index * step + random.uniform(0, step))
+
+    def push(self, tenant, due):
+        """Ставит ученика в очередь на момент due."""
+        heapq.heappush(self.heap, (due, next(self.counter), tenant))
+
+    def reschedule(self, tenant):
+        """Ставит ученика в очередь на следующий опрос."""
+        self.push(tenant, self.clock() + next_interval(tenant))
+
+    def postpone(self, tenant, delay):
+        """Откладывает опрос ученика на delay секунд с разбросом.
+        Разброс не даёт ученикам прийти к API разом после паузы.
+        """
+        self.push(tenant,
+                  self.clock() + delay * random.uniform(1, 1 + JITTER))
+
+    def delay(self):
+        """Возвращает время до ближайшего опроса или None."""
+        if not self.heap:
+            return None
+        return max(0, self.heap[0][0] - self.clock())
+
+    def pop_due(self):
+        """Забирает из очереди всех учеников, которых пора опросить."""
+        now = self.clock()
+        due = []
+        while self.heap and self.heap[0][0] <= now:
+            planned, _, tenant = heapq.heappop(self.heap)
+            metrics.SCHEDULER_LAG.observe(now - planned)
+            due.append(tenant)
+        return due
+
+    def pop_allowed(self, circuit=None):
+        """Забирает учеников, которых пора опросить и пускает предохранитель.
+        Пока предохранитель разомкнут, остальные откладываются.
+        """
+        circuit = circuit or breaker.BREAKER
+        allowed = []
+        for tenant in self.pop_due():
+            if circuit.allow():
+                allowed.append(tenant)
+            else:
+                self.postpone(tenant, circuit.retry_after())
+        return allowed
@@ -0,0 +1,324 @@
+import hashlib
+import logging
+import multiprocessing
+import sqlite3
+import time
+from bisect import bisect
+
+import breaker
+import cache
+import commands
+import config
+import homework
+import logs
+import metrics
+import outbox
+import scheduler
+import shutdown
+import storage
+import tenants
+import warmup
+
+HEARTBEAT_INTERVAL = 5
+LEASE_TTL = 15
+RING_REPLICAS = 64
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS workers ('
+    ' worker_id TEXT PRIMARY KEY, heartbeat REAL)',
+    'CREATE TABLE IF NOT EXISTS leases ('
+    ' tenant TEXT PRIMARY KEY, worker_id TEXT, expires_at REAL)',
+)
+WORKER_STARTED = 'Запущен воркер {}'
+WORKER_DIED = 'Воркер {worker_id} завершился с кодом {code}, перезапускаю'
+SHARD_REBALANCED = 'Воркер {worker_id} обслуживает учеников: {count}'
+
+
+def ring_hash(key):
+    """Возвращает позицию ключа на кольце."""
+    return int(hashlib.md5(key.encode()).hexdigest()[:16], 16)
+
+
+class HashRing:
+    """Консистентное хеширование учеников по воркерам.
+    При появлении или уходе воркера переезжает лишь его доля учеников.
+    """
+
+    def __init__(self, nodes, replicas=RING_REPLICAS):
+        """Размещает на кольце по replicas точек для каждого воркера."""
+        self.points = sorted((ring_hash(f'{node}#{replica}'), node)
+                             for node in nodes
+                             for replica in range(replicas))
+        self.hashes = [point for point, _ in self.points]
+
+    def node_for(self, key):
+        """Возвращает воркер, отвечающий за ключ, или None."""
+        if not self.points:
+            return None
+        index = bisect(self.hashes, ring_hash(key)) % len(self.points)
+        return self.points[index][1]
+
+
+class LeaseStore:
+    """Реестр живых воркеров и аренды учеников в SQLite.
+    Ученика опрашивает только воркер с действующей арендой.
+    """
+
+    def __init__(self, path=None):
+        """Открывает базу и создаёт таблицы."""
+        self.connection = sqlite3.connect(config.setting('store_path', path),
+                                          timeout=30)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        with self.connection:
+            for statement in SCHEMA:
+                self.connection.execute(statement)
+
+    def heartbeat(self, worker_id):
+        """Отмечает, что воркер жив."""
+        with self.connection:
+            self.connection.execute(
+                'INSERT OR REPLACE INTO workers VALUES (?, ?)',
+                (worker_id, time.time())
+            )
+
+    def leave(self, worker_id):
+        """Убирает воркер и сразу освобождает его аренду."""
+        with self.connection:
+            self.connection.execute(
+                'DELETE FROM workers WHERE worker_id = ?', (worker_id,)
+            )
+            self.connection.execute(
+                'DELETE FROM leases WHERE worker_id = ?', (worker_id,)
+            )
+
+    def live_workers(self, ttl=LEASE_TTL):
+        """Возвращает воркеры, присылавшие пульс за последние ttl секунд."""
+        return [worker_id for worker_id, in self.connection.execute(
+            'SELECT worker_id FROM workers WHERE heartbeat > ?',
+            (time.time() - ttl,)
+        )]
+
+    def release(self, worker_id, keys):
+        """Отдаёт аренду учеников, переехавших к другим воркерам."""
+        with self.connection:
+            self.connection.executemany(
+                'DELETE FROM leases WHERE tenant = ? AND worker_id = ?',
+                [(key, worker_id) for key in keys]
+            )
+
+    def acquire(self, worker_id, keys, ttl=LEASE_TTL):
+        """Берёт или продлевает аренду свободных и своих учеников.
+        Возвращает ключи учеников, аренда которых за воркером.
+        """
+        now = time.time()
+        with self.connection:
+            self.connection.executemany(
+                'INSERT INTO leases VALUES (?, ?, ?)'
+                ' ON CONFLICT (tenant) DO UPDATE'
+                ' SET worker_id = excluded.worker_id,'
+                ' expires_at = excluded.expires_at'
+                ' WHERE leases.worker_id = excluded.worker_id'
+                ' OR leases.expires_at < ?',
+                [(key, worker_id, now + ttl, now) for key in keys]
+            )
+        granted = {key for key, in self.connection.execute(
+            'SELECT tenant FROM leases WHERE worker_id = ? AND expires_at > ?',
+            (worker_id, now)
+        )}
+        return granted & set(keys)
+
+
+class Shard:
+    """Доля учеников одного воркера."""
+
+    def __init__(self, worker_id, leases, tenants_list,
+                 clock=time.monotonic):
+        """Связывает воркер с реестром аренды и списком учеников."""
+        self.worker_id = worker_id
+        self.leases = leases
+        self.tenants = tenants_list
+        self.clock = clock
+        self.owned = set()
+        self.valid_until = 0
+        self.refreshed_at = None
+
+    def refresh(self):
+        """Шлёт пульс, пересчитывает кольцо и продлевает аренду.
+        Возвращает ключи учеников, доставшихся воркеру заново.
+        """
+        started = self.clock()
+        self.leases.heartbeat(self.worker_id)
+        ring = HashRing(self.leases.live_workers())
+        wanted = {tenant.key for tenant in self.tenants
+                  if ring.node_for(tenant.key) == self.worker_id}
+        self.leases.release(self.worker_id, self.owned - wanted)
+        granted = self.leases.acquire(self.worker_id, wanted)
+        gained = granted - self.owned
+        if granted != self.owned:
+            logging.info(SHARD_REBALANCED.format(worker_id=self.worker_id,
+                                                 count=len(granted)))
+        self.owned = granted
+        self.valid_until = started + LEASE_TTL
+        self.refreshed_at = started
+        return gained
+
+    def due_refresh(self):
+        """Проверяет, пора ли слать пульс."""
+        return (self.refreshed_at is None
+                or self.clock() - self.refreshed_at >= HEARTBEAT_INTERVAL)
+
+    def owns(self, tenant):
+        """Проверяет, что аренда ученика за воркером и не истекла."""
+        return tenant.key in self.owned and self.clock() < self.valid_until
+
+
+def enqueue_gained(shard, queue, queued, store, window):
+    """Продлевает аренду и ставит доставшихся учеников в очередь.
+    Доставшиеся заново ученики продолжают с курсора из хранилища
+    и опрашиваются в течение window секунд.
+    """
+    store.flush_cursors()
+    keys = shard.refresh()
+    gained = [tenant for tenant in shard.tenants if tenant.key in keys]
+    tenants.restore_cursors(gained, store)
+    arrived = [tenant for tenant in gained if tenant.key not in queued]
+    queue.spread(arrived, window)
+    queued.update(tenant.key for tenant in arrived)
+
+
+def poll_shard(shard, outgoing, store, responses=None,
+               retry_time=homework.RETRY_TIME):
+    """Опрашивает только учеников из доли воркера.
+    В очереди держатся только свои ученики: первые опросы распределены
+    по retry_time, а доставшиеся позже опрашиваются за HEARTBEAT_INTERVAL.
+    Завершается по запросу остановки.
+    """
+    queue = scheduler.Scheduler([], retry_time)
+    queued = set()
+    window = retry_time
+    while not shutdown.stopping():
+        if shard.due_refresh():
+            enqueue_gained(shard, queue, queued, store, window)
+            window = HEARTBEAT_INTERVAL
+        delay = queue.delay()
+        if shutdown.wait(HEARTBEAT_INTERVAL if delay is None
+                         else min(delay, HEARTBEAT_INTERVAL)):
+            break
+        for tenant in queue.pop_allowed():
+            if shutdown.stopping():
+                break
+            if tenant.key not in shard.owned:
+                queued.discard(tenant.key)
+                continue
+            if shard.owns(tenant):
+                tenants.poll_tenant(outgoing, tenant, store, responses)
+            queue.reschedule(tenant)
+        store.checkpoint()
+
+
+def worker_metrics_port(index):
+    """Возвращает порт метрик воркера index или None.
+    Воркеры слушают порты сразу за METRICS_PORT супервизора.
+    """
+    port = config.get_config().metrics_port
+    if port is None:
+        return None
+    return int(port) + 1 + index
+
+
+def run_worker(worker_id, log_queue=None, metrics_port=None):
+    """Процесс-воркер: опрашивает свою долю учеников.
+    Записи лога уходят в log_queue супервизора, а метрики опроса
+    отдаются на собственном порту metrics_port. Предохранитель API
+    общий для всех воркеров через хранилище. При остановке курсоры
+    записываются, а аренды освобождаются сразу, не дожидаясь LEASE_TTL.
+    """
+    shutdown.install()
+    if log_queue is not None:
+        logs.attach(log_queue)
+    logging.info(WORKER_STARTED.format(worker_id))
+    metrics.clear()
+    if metrics_port is not None:
+        metrics.start_metrics_server(metrics_port)
+    breaker.BREAKER.share(breaker.SharedState())
+    homework.configure_session()
+    store = storage.StatusStore()
+    leases = LeaseStore()
+    shard = Shard(worker_id, leases,
+                  warmup.without_quarantined(tenants.load_tenants(), store))
+    outgoing = outbox.Outbox()
+    breaker.BREAKER.listen(breaker.operator_alert(outgoing, store))
+    try:
+        poll_shard(shard, outgoing, store, cache.ResponseCache())
+    finally:
+        store.flush_cursors()
+        leases.leave(worker_id)
+
+
+def start_worker(worker_id, log_queue=None, metrics_port=None):
+    """Запускает воркер в отдельном процессе."""
+    process = multiprocessing.Process(target=run_worker,
+                                      args=(worker_id, log_queue,
+                                            metrics_port),
+                                      name=worker_id, daemon=True)
+    process.start()
+    return process
+
+
+def stop_workers(processes, until):
+    """Просит воркеров завершиться и ждёт их до момента until."""
+    alive = [process for process in processes
+             if process is not None and process.is_alive()]
+    for process in alive:
+        process.terminate()
+    for process in alive:
+        process.join(max(0, until - time.monotonic()))
+
+
+def main(log_queue=None):
+    """Супервизор: держит shard_workers воркеров и перезапускает упавших.
+    Очередь сообщений, команды и запись логов обслуживаются здесь,
+    чтобы у них был ровно один потребитель; метрики опроса каждый
+    воркер отдаёт сам (см. worker_metrics_port). Прогрев учеников
+    тоже идёт здесь, до запуска воркеров, но только для новых учеников
+    и учеников на карантине.
+    """
+    if config.get_config().telegram_token is None:
+        logging.critical(homework.MISSING_ENV_VAR.format('TELEGRAM_TOKEN'))
+        raise NameError(homework.MISSING_ENV_VAR.format('TELEGRAM_TOKEN'))
+    shutdown.install()
+    metrics.start_metrics_server()
+    breaker.BREAKER.share(breaker.SharedState())
+    outgoing = outbox.Outbox()
+    homework.configure_session()
+    bot = homework.create_bot()
+    dispatcher = outbox.Dispatcher(outgoing, bot).start()
+    registry = tenants.load_tenants()
+    store = storage.StatusStore()
+    tenants.restore_cursors(registry, store)
+    warmup.warm_up(warmup.partition(registry, store)[1], store, outgoing, bot)
+    store.close()
+    updater = commands.start_commands(tenants.chats_of(registry),
+                                      locales=tenants.locales_of(registry))
+    settings = config.get_config()
+    workers = {f'{settings.worker_prefix}-{index}': None
+               for index in range(settings.shard_workers)}
+    while True:
+        for index, (worker_id, process) in enumerate(workers.items()):
+            if process is not None and process.is_alive():
+                continue
+            if process is not None:
+                logging.error(WORKER_DIED.format(worker_id=worker_id,
+                                                 code=process.exitcode))
+            workers[worker_id] = start_worker(worker_id, log_queue,
+                                              worker_metrics_port(index))
+        if shutdown.wait(HEARTBEAT_INTERVAL):
+            break
+    until = shutdown.deadline()
+    stop_workers(workers.values(), until)
+    shutdown.finish(dispatcher=dispatcher, updater=updater, until=until)
+
+
+if __name__ == '__main__':
+    main(logs.setup_logging(
+        log_queue=multiprocessing.Queue(logs.LOG_QUEUE_SIZE)
+    ).queue)
@@ -0,0 +1,71 @@
+import logging
+import signal
+import threading
+import time
+
+import config
+
+SHUTDOWN_SIGNALS = (signal.SIGTERM, signal.SIGINT)
+SHUTDOWN_REQUESTED = 'Получен сигнал {}, бот завершает работу'
+SHUTDOWN_FINISHED = ('Бот остановлен, недоставленных сообщений: {},'
+                     ' они уйдут после перезапуска')
+
+STOP = threading.Event()
+received = []
+
+
+def install(signals=SHUTDOWN_SIGNALS):
+    """Превращает сигналы остановки в запрос на плавное завершение.
+    Работает только в главном потоке процесса.
+    """
+    for signum in signals:
+        signal.signal(signum, request_stop)
+
+
+def request_stop(signum=None, frame=None):
+    """Просит циклы бота завершиться.
+    В обработчике сигнала нельзя писать в лог: запись может
+    прервать другую запись и дождаться её блокировки.
+    """
+    if signum is not None:
+        received.append(signum)
+    STOP.set()
+
+
+def stopping():
+    """Проверяет, запрошена ли остановка."""
+    return STOP.is_set()
+
+
+def wait(timeout):
+    """Ждёт timeout секунд, просыпаясь сразу при запросе остановки.
+    Возвращает True, если пора завершаться.
+    """
+    return STOP.wait(timeout)
+
+
+def deadline(timeout=None):
+    """Возвращает момент time.monotonic, к которому нужно завершиться.
+    По умолчанию - через shutdown_deadline секунд.
+    """
+    return time.monotonic() + config.setting('shutdown_deadline', timeout)
+
+
+def finish(store=None, dispatcher=None, updater=None, until=None):
+    """Завершает работу процесса к моменту until.
+    Прекращает приём команд, записывает курсоры и досылает готовые
+    сообщения. Всё, что не успело уйти, остаётся в очереди SQLite,
+    и новый экземпляр продолжает с того же места.
+    """
+    for signum in received:
+        logging.info(SHUTDOWN_REQUESTED.format(signal.Signals(signum).name))
+    until = until or deadline()
+    if updater is not None:
+        threading.Thread(target=updater.stop, daemon=True).start()
+    if store is not None:
+        store.flush_cursors()
+    if dispatcher is None:
+        return None
+    left = dispatcher.drain(until)
+    logging.info(SHUTDOWN_FINISHED.format(left))
+    return left
@@ -0,0 +1,230 @@
+import hashlib
+import sqlite3
+import time
+
+import config
+
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS statuses ('
+    ' tenant TEXT, homework_id TEXT, status TEXT,'
+    ' PRIMARY KEY (tenant, homework_id))',
+    'CREATE TABLE IF NOT EXISTS errors ('
+    ' tenant TEXT PRIMARY KEY, message TEXT, sent_at REAL)',
+    'CREATE TABLE IF NOT EXISTS cursors ('
+    ' tenant TEXT PRIMARY KEY, from_date INTEGER)',
+    'CREATE TABLE IF NOT EXISTS history ('
+    ' tenant TEXT, homework_id TEXT, homework_name TEXT, status TEXT,'
+    ' changed_at REAL)',
+    'CREATE INDEX IF NOT EXISTS history_tenant ON history (tenant)',
+    'CREATE TABLE IF NOT EXISTS paused (tenant TEXT PRIMARY KEY)',
+    'CREATE TABLE IF NOT EXISTS quarantine ('
+    ' tenant TEXT PRIMARY KEY, reason TEXT, since REAL)',
+)
+
+
+def tenant_key(token):
+    """Возвращает ключ ученика, по которому нельзя восстановить токен."""
+    return hashlib.sha256(token.encode()).hexdigest()[:16]
+
+
+def homework_id(homework):
+    """Возвращает идентификатор домашней работы."""
+    return str(homework.get('id', homework['homework_name']))
+
+
+class StatusStore:
+    """Хранилище статусов, отправленных ошибок и курсоров опроса.
+    Переживает перезапуск бота, поэтому в Telegram уходят
+    только настоящие изменения.
+    Курсоры пишутся на диск пачками: раз в checkpoint_every обновлений
+    или checkpoint_interval секунд одной транзакцией.
+    """
+
+    def __init__(self, path=None, checkpoint_every=None,
+                 checkpoint_interval=None, clock=time.monotonic):
+        """Открывает базу SQLite и создаёт таблицы.
+        Незаданные параметры берутся из настроек.
+        """
+        self.checkpoint_every = config.setting('checkpoint_every',
+                                               checkpoint_every)
+        self.checkpoint_interval = config.setting('checkpoint_interval',
+                                                  checkpoint_interval)
+        self.clock = clock
+        self.pending_cursors = {}
+        self.pending_updates = 0
+        self.checkpointed_at = clock()
+        self.connection = sqlite3.connect(config.setting('store_path', path))
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        with self.connection:
+            for statement in SCHEMA:
+                self.connection.execute(statement)
+
+    def get_status(self, tenant, homework):
+        """Возвращает последний сохранённый статус работы."""
+        row = self.connection.execute(
+            'SELECT status FROM statuses WHERE tenant = ? AND homework_id = ?',
+            (tenant, homework_id(homework))
+        ).fetchone()
+        return row[0] if row else None
+
+    def is_new_status(self, tenant, homework):
+        """Проверяет, отличается ли статус работы от сохранённого."""
+        return self.get_status(tenant, homework) != homework['status']
+
+    def filter_changed(self, tenant, homeworks):
+        """Возвращает работы, статус которых отличается от сохранённого."""
+        if not homeworks:
+            return []
+        ids = [homework_id(homework) for homework in homeworks]
+        known = dict(self.connection.execute(
+            'SELECT homework_id, status FROM statuses WHERE tenant = ?'
+            ' AND homework_id IN ({})'.format(', '.join('?' * len(ids))),
+            (tenant, *ids)
+        ))
+        return [homework for homework_key, homework in zip(ids, homeworks)
+                if known.get(homework_key) != homework['status']]
+
+    def save_status(self, tenant, homework):
+        """Сохраняет статус работы после отправки уведомления."""
+        self.save_statuses(tenant, [homework])
+
+    def save_statuses(self, tenant, homeworks):
+        """Сохраняет статусы работ и их историю одной транзакцией."""
+        now = time.time()
+        with self.connection:
+            self.connection.executemany(
+                'INSERT OR REPLACE INTO statuses VALUES (?, ?, ?)',
+                [(tenant, homework_id(homework), homework['status'])
+                 for homework in homeworks]
+            )
+            self.connection.executemany(
+                'INSERT INTO history VALUES (?, ?, ?, ?, ?)',
+                [(tenant, homework_id(homework), homework['homework_name'],
+                  homework['status'], now) for homework in homeworks]
+            )
+
+    def latest_statuses(self, tenant):
+        """Возвращает пары (имя работы, статус) по последним изменениям."""
+        return [(name, status) for name, status, _ in self.connection.execute(
+            'SELECT homework_name, status, MAX(changed_at) FROM history'
+            ' WHERE tenant = ? GROUP BY homework_id ORDER BY homework_name',
+            (tenant,)
+        )]
+
+    def history(self, tenant, limit):
+        """Возвращает последние изменения статусов, новые первыми."""
+        return self.connection.execute(
+            'SELECT homework_name, status, changed_at FROM history'
+            ' WHERE tenant = ? ORDER BY changed_at DESC, rowid DESC LIMIT ?',
+            (tenant, limit)
+        ).fetchall()
+
+    def set_paused(self, tenant, paused):
+        """Приостанавливает или возобновляет опрос ученика."""
+        with self.connection:
+            self.connection.execute(
+                'INSERT OR IGNORE INTO paused VALUES (?)' if paused
+                else 'DELETE FROM paused WHERE tenant = ?', (tenant,)
+            )
+
+    def is_paused(self, tenant):
+        """Проверяет, приостановлен ли опрос ученика."""
+        return self.connection.execute(
+            'SELECT 1 FROM paused WHERE tenant = ?', (tenant,)
+        ).fetchone() is not None
+
+    def quarantine(self, tenant, reason):
+        """Снимает ученика с опроса до следующей проверки при запуске."""
+        with self.connection:
+            self.connection.execute(
+                'INSERT OR REPLACE INTO quarantine VALUES (?, ?, ?)',
+                (tenant, reason, time.time())
+            )
+
+    def release(self, tenant):
+        """Возвращает ученика в опрос после успешной проверки."""
+        with self.connection:
+            self.connection.execute(
+                'DELETE FROM quarantine WHERE tenant = ?', (tenant,)
+            )
+
+    def quarantined(self):
+        """Возвращает ключи учеников на карантине."""
+        return {tenant for tenant, in self.connection.execute(
+            'SELECT tenant FROM quarantine'
+        )}
+
+    def should_report_error(self, tenant, key, cooldown=None):
+        """Решает, нужно ли сообщать об ошибке.
+        Ошибка с тем же ключом (классом или постоянным текстом)
+        повторно отправляется только после cooldown секунд. Успешный
+        опрос отсчёт не сбрасывает: иначе перемежающийся сбой
+        сообщался бы почти при каждом опросе.
+        """
+        now = time.time()
+        row = self.connection.execute(
+            'SELECT message, sent_at FROM errors WHERE tenant = ?', (tenant,)
+        ).fetchone()
+        cooldown = config.setting('error_cooldown', cooldown)
+        if row and row[0] == key and now - row[1] < cooldown:
+            return False
+        with self.connection:
+            self.connection.execute(
+                'INSERT OR REPLACE INTO errors VALUES (?, ?, ?)',
+                (tenant, key, now)
+            )
+        return True
+
+    def get_cursor(self, tenant, default):
+        """Возвращает сохранённый from_date или default."""
+        if tenant in self.pending_cursors:
+            return self.pending_cursors[tenant]
+        row = self.connection.execute(
+            'SELECT from_date FROM cursors WHERE tenant = ?', (tenant,)
+        ).fetchone()
+        return row[0] if row else default
+
+    def load_cursors(self):
+        """Возвращает курсоры всех учеников одним запросом.
+        Нужен при запуске, чтобы продолжить опрос с места остановки.
+        """
+        cursors = dict(self.connection.execute(
+            'SELECT tenant, from_date FROM cursors'
+        ))
+        cursors.update(self.pending_cursors)
+        return cursors
+
+    def save_cursor(self, tenant, from_date):
+        """Запоминает from_date для следующего запроса.
+        На диск курсор попадает со следующей пачкой. Статусы пишутся
+        сразу, поэтому после сбоя курсор может только отстать,
+        а повторно полученные работы отсечёт filter_changed.
+        """
+        self.pending_cursors[tenant] = from_date
+        self.pending_updates += 1
+        self.checkpoint()
+
+    def checkpoint(self):
+        """Записывает накопленные курсоры, если подошёл срок."""
+        if self.pending_cursors and (
+            self.pending_updates >= self.checkpoint_every
+            or self.clock() - self.checkpointed_at >= self.checkpoint_interval
+        ):
+            self.flush_cursors()
+
+    def flush_cursors(self):
+        """Записывает накопленные курсоры одной транзакцией."""
+        if self.pending_cursors:
+            with self.connection:
+                self.connection.executemany(
+                    'INSERT OR REPLACE INTO cursors VALUES (?, ?)',
+                    self.pending_cursors.items()
+                )
+        self.pending_cursors = {}
+        self.pending_updates = 0
+        self.checkpointed_at = self.clock()
+
+    def close(self):
+        """Записывает накопленные курсоры и закрывает базу."""
+        self.flush_cursors()
+        self.connection.close()
@@ -0,0 +1,165 @@
+import codecs
+import json
+
+CHUNK_SIZE = 64 * 1024
+MAX_PENDING = 1024 * 1024
+HOMEWORKS = 'homeworks'
+WHITESPACE = ' \t\n\r'
+DELIMITERS = frozenset(',]}' + WHITESPACE)
+CONTAINERS = (str, dict, list)
+START, FIRST_KEY, KEY, COLON, VALUE = 'start', 'first_key', 'key', ':', 'value'
+FIRST_ITEM, ITEM, NEXT_ITEM, NEXT_KEY = 'first_item', 'item', 'next_item', ','
+DONE = 'done'
+PUNCTUATION = {
+    (START, '{'): FIRST_KEY,
+    (FIRST_KEY, '}'): DONE,
+    (COLON, ':'): VALUE,
+    (FIRST_ITEM, ']'): NEXT_KEY,
+    (NEXT_ITEM, ']'): NEXT_KEY,
+    (NEXT_ITEM, ','): ITEM,
+    (NEXT_KEY, '}'): DONE,
+    (NEXT_KEY, ','): KEY,
+}
+INVALID_ANSWER = 'Некорректный JSON в ответе API на позиции {}'
+ITEM_TOO_LARGE = 'Элемент ответа API длиннее {} символов'
+MISSING = object()
+
+
+class AnswerParser:
+    """Потоковый разбор ответа API статусов домашних работ.
+    Работы из массива homeworks отдаются по одной по мере прихода данных,
+    остальные ключи верхнего уровня собираются в fields.
+    В памяти держится только недоразобранный хвост ответа.
+    """
+
+    def __init__(self):
+        """Готовит пустой буфер и состояние разбора."""
+        self.decoder = codecs.getincrementaldecoder('utf-8')()
+        self.json = json.JSONDecoder()
+        self.buffer = ''
+        self.position = 0
+        self.consumed = 0
+        self.state = START
+        self.key = None
+        self.eof = False
+        self.fields = {}
+
+    def feed(self, chunk):
+        """Принимает очередную часть ответа и возвращает готовые работы."""
+        self.extend(self.decoder.decode(chunk))
+        homeworks = list(self.parse())
+        if len(self.buffer) - self.position > MAX_PENDING:
+            raise ValueError(ITEM_TOO_LARGE.format(MAX_PENDING))
+        return homeworks
+
+    def close(self):
+        """Дочитывает хвост ответа и возвращает оставшиеся работы."""
+        self.extend(self.decoder.decode(b'', final=True))
+        self.eof = True
+        homeworks = list(self.parse())
+        if self.state != DONE:
+            raise ValueError(INVALID_ANSWER.format(self.offset))
+        return homeworks
+
+    @property
+    def offset(self):
+        """Позиция разбора от начала ответа."""
+        return self.consumed + self.position
+
+    def extend(self, text):
+        """Отбрасывает разобранную часть буфера и дописывает новые данные."""
+        self.consumed += self.position
+        self.buffer = self.buffer[self.position:] + text
+        self.position = 0
+
+    def parse(self):
+        """Продвигает разбор, пока в буфере хватает данных."""
+        while self.skip_whitespace():
+            char = self.buffer[self.position]
+            if (self.state, char) in PUNCTUATION:
+                self.position += 1
+                self.state = PUNCTUATION[self.state, char]
+            elif self.state in (FIRST_KEY, FIRST_ITEM):
+                self.state = KEY if self.state == FIRST_KEY else ITEM
+            elif self.state == VALUE and self.key == HOMEWORKS and char == '[':
+                self.position += 1
+                self.fields[HOMEWORKS] = []
+                self.state = FIRST_ITEM
+            elif self.state in (KEY, VALUE, ITEM):
+                value = self.decode()
+                if value is MISSING:
+                    return
+                if self.state == ITEM:
+                    yield value
+                self.store(value)
+            else:
+                raise ValueError(INVALID_ANSWER.format(self.offset))
+
+    def store(self, value):
+        """Запоминает разобранный ключ или значение и меняет состояние."""
+        if self.state == KEY:
+            if not isinstance(value, str):
+                raise ValueError(INVALID_ANSWER.format(self.offset))
+            self.key, self.state = value, COLON
+        elif self.state == VALUE:
+            self.fields[self.key] = value
+            self.state = NEXT_KEY
+        else:
+            self.state = NEXT_ITEM
+
+    def skip_whitespace(self):
+        """Пропускает пробелы; False, если буфер разобран до конца."""
+        while (self.position < len(self.buffer)
+               and self.buffer[self.position] in WHITESPACE):
+            self.position += 1
+        return self.position < len(self.buffer)
+
+    def decode(self):
+        """Разбирает очередное JSON-значение или возвращает MISSING.
+        Число или литерал принимаются, только если за ними идёт
+        разделитель или конец ответа: иначе из 1.5, разрезанного
+        после 1, разобралось бы 1.
+        """
+        try:
+            value, end = self.json.raw_decode(self.buffer, self.position)
+        except json.JSONDecodeError:
+            if self.eof:
+                raise ValueError(INVALID_ANSWER.format(self.offset))
+            return MISSING
+        if not self.eof and not isinstance(value, CONTAINERS) and (
+            end == len(self.buffer) or self.buffer[end] not in DELIMITERS
+        ):
+            return MISSING
+        self.position = end
+        return value
+
+
+def parse_answer(chunks, compact):
+    """Разбирает ответ API из итератора частей.
+    Каждая работа проходит через compact сразу после разбора,
+    поэтому ни тело ответа, ни полные работы целиком не хранятся.
+    """
+    parser = AnswerParser()
+    homeworks = []
+    for chunk in chunks:
+        homeworks.extend(map(compact, parser.feed(chunk)))
+    homeworks.extend(map(compact, parser.close()))
+    return collect(parser, homeworks)
+
+
+async def parse_answer_async(chunks, compact):
+    """Асинхронный вариант parse_answer для асинхронного итератора частей."""
+    parser = AnswerParser()
+    homeworks = []
+    async for chunk in chunks:
+        homeworks.extend(map(compact, parser.feed(chunk)))
+    homeworks.extend(map(compact, parser.close()))
+    return collect(parser, homeworks)
+
+
+def collect(parser, homeworks):
+    """Собирает ответ из полей верхнего уровня и сжатых работ."""
+    answer = parser.fields
+    if isinstance(answer.get(HOMEWORKS), list):
+        answer[HOMEWORKS] = homeworks
+    return answer
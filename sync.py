@@ -0,0 +1,54 @@
+import logging
+
+import config
+import metrics
+
+BACKFILL_FROM = 0
+CURSOR_MISSING = 'В ответе API нет current_date, курсор {from_date} не сдвинут'
+CURSOR_WENT_BACK = ('current_date {current_date} раньше курсора {from_date},'
+                    ' повторная синхронизация с {resync_from}')
+
+
+def is_backfill(from_date):
+    """Проверяет, что опрос - первая полная синхронизация ученика."""
+    return from_date == BACKFILL_FROM
+
+
+def next_cursor(from_date, response, extra=None):
+    """Возвращает курсор для следующего опроса по ответу API.
+    Без current_date курсор не сдвигается. Если current_date раньше
+    курсора, изменения между ними могли потеряться: следующий опрос
+    повторяет только это окно с запасом resync_overlap секунд,
+    а не всю историю с BACKFILL_FROM.
+    """
+    current_date = response.get('current_date')
+    if (not isinstance(current_date, (int, float))
+            or isinstance(current_date, bool)):
+        metrics.SYNC_GAPS.inc('missing')
+        logging.warning(CURSOR_MISSING.format(from_date=from_date),
+                        extra=extra)
+        return from_date
+    current_date = int(current_date)
+    if current_date < from_date:
+        resync_from = max(
+            BACKFILL_FROM + 1,
+            current_date - config.get_config().resync_overlap
+        )
+        metrics.SYNC_GAPS.inc('backwards')
+        logging.warning(CURSOR_WENT_BACK.format(current_date=current_date,
+                                                from_date=from_date,
+                                                resync_from=resync_from),
+                        extra=extra)
+        return resync_from
+    return current_date
+
+
+def visible(from_date, homeworks):
+    """Возвращает работы для уведомления и число скрытых.
+    После первой синхронизации ученик получает только
+    backfill_notify_limit последних работ, остальные сохраняются молча.
+    """
+    limit = config.get_config().backfill_notify_limit
+    if not is_backfill(from_date) or len(homeworks) <= limit:
+        return homeworks, 0
+    return homeworks[:limit], len(homeworks) - limit
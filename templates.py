@@ -0,0 +1,123 @@
+import html
+import json
+import os
+import re
+from functools import lru_cache
+from string import Formatter
+
+import config
+
+LOCALES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                           'locales')
+DEFAULT_LOCALE = 'ru'
+RENDER_CACHE_SIZE = 4096
+MARKDOWN_SPECIAL = re.compile(r'([_*\[\]()~`>#+\-=|{}.!\\])')
+MARKDOWN_URL_SPECIAL = re.compile(r'([)\\])')
+URL_FIELDS = frozenset({'url'})
+MARKUPS = {
+    'text': (None, str, str),
+    'markdown': ('MarkdownV2',
+                 lambda text: MARKDOWN_SPECIAL.sub(r'\\\1', text),
+                 lambda url: MARKDOWN_URL_SPECIAL.sub(r'\\\1', url)),
+    'html': ('HTML', html.escape, html.escape),
+}
+UNKNOWN_MARKUP = 'Неизвестная разметка сообщений: {}'
+
+
+class Template:
+    """Шаблон сообщения, разобранный на куски один раз при загрузке."""
+
+    def __init__(self, source):
+        """Разбирает строку формата на текст и имена подстановок."""
+        self.parts = tuple((literal, field) for literal, field, _, _
+                           in Formatter().parse(source))
+
+    def render(self, escape=str, escape_url=str, **values):
+        """Подставляет значения, экранируя их для разметки.
+        Поля из URL_FIELDS экранируются как адрес ссылки.
+        """
+        return ''.join(
+            literal if field is None else literal + (
+                escape_url if field in URL_FIELDS else escape
+            )(str(values[field]))
+            for literal, field in self.parts
+        )
+
+
+class Catalog:
+    """Сообщения одной локали, скомпилированные для каждой разметки.
+    Отсутствующие ключи берутся из каталога DEFAULT_LOCALE.
+    """
+
+    def __init__(self, messages, fallback=None):
+        """Компилирует шаблоны каталога и его разметочных вариантов."""
+        self.verdicts = dict(fallback.verdicts if fallback else {},
+                             **messages.get('verdicts', {}))
+        self.templates = {}
+        for markup in MARKUPS:
+            sources = {key: value for key, value in messages.items()
+                       if isinstance(value, str)}
+            sources.update(messages.get(markup, {}))
+            self.templates[markup] = {key: Template(source)
+                                      for key, source in sources.items()}
+            if fallback:
+                for key, template in fallback.templates[markup].items():
+                    self.templates[markup].setdefault(key, template)
+
+    def render(self, key, markup='text', **values):
+        """Возвращает сообщение key в разметке markup."""
+        _, escape, escape_url = MARKUPS[markup]
+        return self.templates[markup][key].render(escape, escape_url,
+                                                  **values)
+
+    def verdict(self, status):
+        """Возвращает вердикт для статуса или сам статус."""
+        return self.verdicts.get(status, status)
+
+
+@lru_cache(maxsize=None)
+def catalog(locale=DEFAULT_LOCALE):
+    """Загружает каталог локали один раз за время работы процесса.
+    Для неизвестной локали возвращает каталог DEFAULT_LOCALE.
+    """
+    path = os.path.join(LOCALES_DIR, f'{locale}.json')
+    if locale != DEFAULT_LOCALE and not os.path.exists(path):
+        return catalog(DEFAULT_LOCALE)
+    with open(path, encoding='utf-8') as file:
+        messages = json.load(file)
+    fallback = None if locale == DEFAULT_LOCALE else catalog(DEFAULT_LOCALE)
+    return Catalog(messages, fallback)
+
+
+def parse_mode(markup):
+    """Возвращает parse_mode Telegram для разметки."""
+    if markup not in MARKUPS:
+        raise ValueError(UNKNOWN_MARKUP.format(markup))
+    return MARKUPS[markup][0]
+
+
+def render(locale, key, markup='text', **values):
+    """Возвращает сообщение key на языке locale."""
+    return catalog(locale).render(key, markup, **values)
+
+
+@lru_cache(maxsize=RENDER_CACHE_SIZE)
+def render_status(locale, status, homework_name, markup='text'):
+    """Возвращает сообщение о смене статуса работы.
+    Результат запоминается, поэтому одинаковые уведомления
+    для тысяч учеников собираются один раз.
+    """
+    messages = catalog(locale)
+    return messages.render('status_changed', markup,
+                           homework_name=homework_name,
+                           verdict=messages.verdict(status),
+                           url=config.get_config().homework_url)
+
+
+def render_statuses(homeworks, locale=DEFAULT_LOCALE, markup='text'):
+    """Собирает сообщения о нескольких работах в одно."""
+    return '\n\n'.join(
+        render_status(locale, homework['status'], homework['homework_name'],
+                      markup)
+        for homework in homeworks
+    )
@@ -0,0 +1,402 @@
+import json
+import logging
+import os
+import sqlite3
+import sys
+import time
+from dataclasses import dataclass, field
+from typing import Optional, Tuple
+
+import breaker
+import cache
+import commands
+import config
+import homework
+import logs
+import metrics
+import outbox
+import scheduler
+import shutdown
+import storage
+import tracing
+import sync
+import templates
+
+
+class TenantRegistryError(Exception):
+    """Кастомная ошибка при некорректном реестре учеников."""
+
+    pass
+
+
+SQLITE_SUFFIXES = ('.db', '.sqlite', '.sqlite3')
+SELECT_TENANTS = 'SELECT * FROM tenants'
+OPTIONAL_COLUMNS = ('locale', 'markup', 'digest', 'chats')
+REGISTRY_NOT_FOUND = 'Реестр учеников не найден: {}'
+REGISTRY_IS_EMPTY = 'В реестре {} нет ни одного ученика'
+INVALID_TENANT = 'Некорректная запись в реестре {path}: {record}'
+TENANTS_LOADED = 'Загружено учеников: {}'
+CURSORS_RESTORED = 'Курсоры опроса восстановлены: {restored} из {total}'
+TENANT_STATUS_IS_NOT_CHANGED = 'Статус работы не изменился, чат {}'
+TENANT_FAILURE = 'Сбой при опросе API для чата {chat_id}: {error}'
+
+
+@dataclass(slots=True)
+class Subscription:
+    """Чат, получающий уведомления учеников.
+    digest - окно сводки чата в секундах, 0 - отправлять сразу.
+    После load_tenants на каждый чат приходится один общий объект,
+    поэтому окно задаётся для чата, а не для пары ученика и чата.
+    """
+
+    chat_id: str
+    digest: int = 0
+
+
+@dataclass(slots=True)
+class Tenant:
+    """Ученик: токен Практикума, чат и состояние опроса.
+    Без __dict__, а ключ в хранилище считается один раз при создании.
+    """
+
+    token: str
+    chat_id: str
+    from_date: int = 0
+    last_status: Optional[homework.Status] = None
+    changed_at: float = 0.0
+    failures: int = 0
+    locale: str = templates.DEFAULT_LOCALE
+    markup: str = 'text'
+    chat: Optional[Subscription] = field(default=None, repr=False,
+                                         compare=False)
+    subscribers: Tuple[Subscription, ...] = ()
+    key: str = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        """Вычисляет ключ ученика и приводит статус к перечислению.
+        Локаль и разметка интернируются: у тысяч учеников они общие.
+        """
+        self.key = storage.tenant_key(self.token)
+        if self.last_status is not None:
+            self.last_status = homework.Status(self.last_status)
+        self.locale = sys.intern(self.locale)
+        self.markup = sys.intern(self.markup)
+
+    @property
+    def parse_mode(self):
+        """Разметка Telegram для сообщений ученику."""
+        return templates.parse_mode(self.markup)
+
+    @property
+    def digest(self):
+        """Окно сводки собственного чата ученика."""
+        return self.chat.digest if self.chat is not None else 0
+
+    @property
+    def subscriptions(self):
+        """Все чаты, получающие уведомления: чат ученика и подписчики."""
+        return (self.chat or Subscription(self.chat_id), *self.subscribers)
+
+    def subscribe(self, subscriptions):
+        """Добавляет подписчиков, пропуская уже подписанные чаты."""
+        known = {subscription.chat_id
+                 for subscription in self.subscriptions}
+        self.subscribers += tuple(subscription
+                                  for subscription in subscriptions
+                                  if subscription.chat_id not in known)
+
+
+@dataclass(frozen=True, slots=True)
+class PollResult:
+    """Итог опроса ученика: изменившиеся работы, курсор и последний статус."""
+
+    changed: Tuple[homework.Homework, ...]
+    current_date: int
+    last_status: Optional[homework.Status]
+
+
+def _read_json(path):
+    """Читает записи реестра из JSON-файла со списком объектов."""
+    with open(path, encoding='utf-8') as file:
+        return json.load(file)
+
+
+def _read_sqlite(path):
+    """Читает записи реестра из таблицы tenants базы SQLite.
+    Кроме token и chat_id читаются необязательные столбцы
+    OPTIONAL_COLUMNS, если они есть в таблице; NULL - значение
+    по умолчанию, а chats хранится как JSON-список.
+    """
+    connection = sqlite3.connect(path)
+    connection.row_factory = sqlite3.Row
+    try:
+        rows = connection.execute(SELECT_TENANTS).fetchall()
+    finally:
+        connection.close()
+    records = []
+    for row in rows:
+        record = {'token': row['token'], 'chat_id': row['chat_id']}
+        for column in OPTIONAL_COLUMNS:
+            if column in row.keys() and row[column] is not None:
+                record[column] = row[column]
+        records.append(record)
+    return records
+
+
+def _parse_subscription(entry):
+    """Разбирает подписку: id чата или объект с chat_id и digest."""
+    if isinstance(entry, dict):
+        return Subscription(str(entry['chat_id']),
+                            int(entry.get('digest', 0)))
+    return Subscription(str(entry))
+
+
+def _parse_chats(chats):
+    """Разбирает подписки записи: список или JSON-список из SQLite."""
+    if isinstance(chats, str):
+        chats = json.loads(chats)
+    return tuple(map(_parse_subscription, chats))
+
+
+def _parse_tenant(record, from_date):
+    """Создаёт ученика из записи реестра."""
+    tenant = Tenant(
+        token=record['token'], chat_id=str(record['chat_id']),
+        from_date=from_date,
+        locale=record.get('locale', templates.DEFAULT_LOCALE),
+        markup=record.get('markup', 'text'),
+        chat=Subscription(str(record['chat_id']),
+                          int(record.get('digest', 0))),
+        subscribers=_parse_chats(record.get('chats', ()))
+    )
+    templates.parse_mode(tenant.markup)
+    return tenant
+
+
+def load_tenants(path=None, from_date=sync.BACKFILL_FROM):
+    """Загружает учеников из JSON-файла или базы SQLite.
+    Отсчёт опроса для всех начинается с from_date: по умолчанию
+    новые ученики сначала получают всю историю работ.
+    Записи с одним токеном сливаются в одного ученика с подписчиками,
+    чтобы API опрашивалось один раз, а подписки на один чат - в общий
+    объект чата с одним окном сводки.
+    """
+    path = config.setting('tenants_path', path)
+    if not os.path.exists(path):
+        raise TenantRegistryError(REGISTRY_NOT_FOUND.format(path))
+    if path.endswith(SQLITE_SUFFIXES):
+        records = _read_sqlite(path)
+    else:
+        records = _read_json(path)
+    parsed = []
+    for record in records:
+        try:
+            parsed.append(_parse_tenant(record, from_date))
+        except (KeyError, TypeError, ValueError):
+            raise TenantRegistryError(
+                INVALID_TENANT.format(path=path, record=record)
+            )
+    share_chats(parsed)
+    by_token = {}
+    for tenant in parsed:
+        if tenant.token in by_token:
+            by_token[tenant.token].subscribe(tenant.subscriptions)
+        else:
+            by_token[tenant.token] = tenant
+    tenants = list(by_token.values())
+    if not tenants:
+        raise TenantRegistryError(REGISTRY_IS_EMPTY.format(path))
+    logging.info(TENANTS_LOADED.format(len(tenants)))
+    return tenants
+
+
+def share_chats(tenants):
+    """Заменяет подписки на один чат общим объектом чата.
+    Окно сводки чата достаточно указать в одной записи реестра;
+    если записи указывают разные окна, берётся наибольшее.
+    """
+    chats = {}
+    for tenant in tenants:
+        for subscription in tenant.subscriptions:
+            chat = chats.setdefault(subscription.chat_id,
+                                    Subscription(subscription.chat_id))
+            chat.digest = max(chat.digest, subscription.digest)
+    for tenant in tenants:
+        tenant.chat = chats[tenant.chat_id]
+        tenant.subscribers = tuple(chats[subscription.chat_id]
+                                   for subscription in tenant.subscribers)
+
+
+def collect_changes(tenant, store, response):
+    """Разбирает ответ API в итог опроса ученика."""
+    homeworks = homework.check_response(response)
+    return PollResult(
+        changed=tuple(map(homework.Homework.from_dict,
+                          store.filter_changed(tenant.key, homeworks))),
+        current_date=sync.next_cursor(tenant.from_date, response,
+                                      logs.tenant_fields(tenant)),
+        last_status=(homework.Status(homeworks[0]['status']) if homeworks
+                     else tenant.last_status)
+    )
+
+
+def commit_poll(tenant, store, result):
+    """Запоминает отправленные статусы и сдвигает курсор ученика."""
+    tenant.last_status = result.last_status
+    if result.changed:
+        store.save_statuses(tenant.key, result.changed)
+        tenant.changed_at = time.time()
+    else:
+        logging.debug(TENANT_STATUS_IS_NOT_CHANGED.format(tenant.chat_id),
+                      extra=logs.tenant_fields(tenant))
+    tenant.from_date = result.current_date
+    store.save_cursor(tenant.key, tenant.from_date)
+    scheduler.record_result(tenant)
+
+
+def poll_tenant(outgoing, tenant, store, responses=None):
+    """Опрашивает API для одного ученика.
+    Все изменившиеся за опрос статусы уходят в очередь одним сообщением.
+    Если задан кэш responses, повторные запросы берутся из него.
+    """
+    if store.is_paused(tenant.key):
+        return
+    try:
+        with tracing.iteration('poll_tenant'):
+            apply_response(outgoing, tenant, store,
+                           fetch_statuses(tenant, responses))
+    except Exception as error:
+        scheduler.record_result(tenant, error)
+        report_failure(outgoing, tenant, store, error)
+
+
+def fetch_statuses(tenant, responses=None):
+    """Запрашивает статусы ученика, через кэш, если он задан."""
+    if responses is None:
+        return homework.fetch_homework_statuses(
+            homework.ENDPOINT, tenant.from_date, tenant.token
+        )
+    return cache.fetch_homework_statuses(
+        responses, homework.ENDPOINT, tenant.from_date, tenant.token
+    )
+
+
+def apply_response(outgoing, tenant, store, response):
+    """Разбирает ответ API, уведомляет ученика и сдвигает его курсор."""
+    result = collect_changes(tenant, store, response)
+    if result.changed:
+        notify(outgoing, tenant, result.changed)
+    commit_poll(tenant, store, result)
+
+
+def notify(outgoing, tenant, homeworks):
+    """Ставит в очередь одно сообщение об изменившихся работах ученика.
+    Сообщение на языке и в разметке ученика уходит во все его чаты;
+    в чаты со сводкой - к концу окна чата, вместе с остальными за окно.
+    """
+    message = homework.announce(tenant.from_date, homeworks, tenant.locale,
+                                tenant.markup)
+    for subscription in tenant.subscriptions:
+        outgoing.put(subscription.chat_id, message, tenant.parse_mode,
+                     outbox.digest_time(subscription.digest))
+
+
+def report_failure(outgoing, tenant, store, error):
+    """Логирует сбой и сообщает о нём ученику не чаще ERROR_COOLDOWN."""
+    logging.error(TENANT_FAILURE.format(chat_id=tenant.chat_id,
+                                        error=error),
+                  exc_info=error, extra=logs.tenant_fields(tenant))
+    message = templates.render(tenant.locale, 'failure', tenant.markup,
+                               error=error)
+    if store.should_report_error(tenant.key, homework.error_key(error)):
+        outgoing.put(tenant.chat_id, message, tenant.parse_mode)
+
+
+def chats_of(tenants):
+    """Сопоставляет чаты с учениками для обработки команд.
+    Каждому чату, включая чаты подписчиков, достаются все его ученики:
+    кортеж пар из ключа ученика в хранилище и его собственного чата.
+    """
+    chats = {}
+    for tenant in tenants:
+        for subscription in tenant.subscriptions:
+            chats.setdefault(subscription.chat_id, []).append(
+                (tenant.key, tenant.chat_id)
+            )
+    return {chat_id: tuple(owners) for chat_id, owners in chats.items()}
+
+
+def locales_of(tenants):
+    """Сопоставляет чаты с языком ответов на команды.
+    В общем чате отвечают на языке первого ученика.
+    """
+    locales = {}
+    for tenant in tenants:
+        for subscription in tenant.subscriptions:
+            locales.setdefault(subscription.chat_id, tenant.locale)
+    return locales
+
+
+def restore_cursors(tenants, store):
+    """Продолжает опрос с сохранённых курсоров, а не с момента запуска."""
+    cursors = store.load_cursors()
+    restored = 0
+    for tenant in tenants:
+        if tenant.key in cursors:
+            tenant.from_date = cursors[tenant.key]
+            restored += 1
+    logging.info(CURSORS_RESTORED.format(restored=restored,
+                                         total=len(tenants)))
+
+
+def poll_forever(outgoing, tenants, store, responses=None,
+                 retry_time=homework.RETRY_TIME, warmed=()):
+    """Опрашивает учеников в порядке очереди планировщика.
+    Опрошенные при прогреве ученики из warmed не опрашиваются
+    повторно сразу, а ждут обычного интервала.
+    Ожидание и обход очереди прерываются запросом остановки.
+    """
+    queue = scheduler.Scheduler(tenants, retry_time, polled=warmed)
+    while not shutdown.wait(queue.delay()):
+        for tenant in queue.pop_allowed():
+            if shutdown.stopping():
+                break
+            poll_tenant(outgoing, tenant, store, responses)
+            queue.reschedule(tenant)
+        store.checkpoint()
+
+
+def main():
+    """Обслуживает всех учеников из реестра в одном процессе.
+    Прогреваются только новые ученики и ученики на карантине,
+    остальные сразу продолжают опрос с сохранённых курсоров.
+    """
+    import warmup
+
+    if config.get_config().telegram_token is None:
+        logging.critical(homework.MISSING_ENV_VAR.format('TELEGRAM_TOKEN'))
+        raise NameError(homework.MISSING_ENV_VAR.format('TELEGRAM_TOKEN'))
+    shutdown.install()
+    homework.configure_session()
+    metrics.start_metrics_server()
+    outgoing = outbox.Outbox()
+    bot = homework.create_bot()
+    dispatcher = outbox.Dispatcher(outgoing, bot).start()
+    store = storage.StatusStore()
+    tenants = load_tenants()
+    restore_cursors(tenants, store)
+    breaker.BREAKER.listen(breaker.operator_alert(outgoing, store))
+    updater = commands.start_commands(chats_of(tenants),
+                                      locales=locales_of(tenants))
+    responses = cache.ResponseCache()
+    try:
+        known, fresh = warmup.partition(tenants, store)
+        warmed = warmup.warm_up(fresh, store, outgoing, bot, responses)
+        poll_forever(outgoing, known, store, responses, warmed=warmed)
+    finally:
+        shutdown.finish(store, dispatcher, updater)
+
+
+if __name__ == '__main__':
+    logs.setup_logging()
+    main()
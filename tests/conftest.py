@@ -1,9 +1,24 @@
 import sys
+from dataclasses import replace
 from os.path import abspath, dirname
 
+import pytest
+
 root_dir = dirname(dirname(abspath(__file__)))
 sys.path.append(root_dir)
 
 pytest_plugins = [
     'tests.fixtures.fixture_data'
 ]
+
+
+@pytest.fixture
+def settings(monkeypatch):
+    """Подменяет настройки бота на время теста."""
+    import config
+
+    def override(**changes):
+        monkeypatch.setattr(config, '_config',
+                            replace(config.get_config(), **changes))
+
+    return override
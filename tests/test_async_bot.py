@@ -0,0 +1,104 @@
+import asyncio
+
+import pytest
+
+import utils
+
+
+class MockAsyncResponse:
+
+    def __init__(self, data, status=200):
+        self.data = data
+        self.status = status
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        return False
+
+    async def json(self, content_type=None):
+        return self.data
+
+
+class MockSession:
+
+    def __init__(self, api_data, api_status=200):
+        self.api_data = api_data
+        self.api_status = api_status
+        self.requests = []
+        self.sent = []
+
+    def get(self, url, headers=None, params=None, **kwargs):
+        self.requests.append((headers['Authorization'], params['from_date']))
+        return MockAsyncResponse(self.api_data, self.api_status)
+
+    def post(self, url, json=None, **kwargs):
+        self.sent.append((json['chat_id'], json['text']))
+        return MockAsyncResponse({'ok': True})
+
+
+class TestAsyncBot:
+
+    def test_poll_tenant(self):
+        import async_bot
+        import storage
+        import tenants
+
+        session = MockSession({
+            'homeworks': [{'homework_name': 'hw', 'status': 'reviewing'}],
+            'current_date': 42,
+        })
+        tenant = tenants.Tenant(token='secret', chat_id='7', from_date=1)
+        store = storage.StatusStore(':memory:')
+        outgoing = utils.MockOutbox()
+
+        async def poll_twice():
+            poller = async_bot.AsyncPoller(session, store, outgoing)
+            for _ in range(2):
+                await poller.poll_tenant(tenant)
+
+        asyncio.run(poll_twice())
+        assert session.requests == [('OAuth secret', 1), ('OAuth secret', 42)]
+        assert len(outgoing.sent) == 1 and outgoing.sent[0][0] == '7', (
+            'Проверьте, что ученику отправляется только новый статус'
+        )
+
+    def test_fetch_unexpected_status(self):
+        import async_bot
+        import homework
+
+        session = MockSession({}, api_status=500)
+        with pytest.raises(homework.EndpointUnexpectedStatusError):
+            asyncio.run(async_bot.fetch_homework_statuses(
+                session, homework.ENDPOINT, 0, 'secret'
+            ))
+
+    def test_telegram_error_mapping(self):
+        import async_bot
+        import telegram
+
+        error = async_bot.telegram_error({
+            'ok': False, 'error_code': 429,
+            'parameters': {'retry_after': 7}
+        })
+        assert isinstance(error, telegram.error.RetryAfter)
+        assert error.retry_after == 7
+        error = async_bot.telegram_error({'ok': False, 'error_code': 400})
+        assert isinstance(error, telegram.error.BadRequest)
+
+    def test_fetch_gateway_html(self):
+        import async_bot
+        import homework
+
+        class GatewayPage(MockAsyncResponse):
+
+            async def json(self, content_type=None):
+                raise ValueError('Expecting value')
+
+        session = MockSession({}, api_status=503)
+        session.get = lambda **kwargs: GatewayPage({}, 503)
+        with pytest.raises(homework.EndpointUnexpectedStatusError):
+            asyncio.run(async_bot.fetch_homework_statuses(
+                session, homework.ENDPOINT, 0, 'secret'
+            ))
@@ -0,0 +1,154 @@
+import pytest
+
+import utils
+
+
+class TestBreaker:
+
+    def test_opens_after_threshold_and_probes(self):
+        import breaker
+        import homework
+
+        clock = utils.FakeClock()
+        circuit = breaker.CircuitBreaker(open_time=60, clock=clock)
+        changes = []
+        circuit.listen(lambda state, error: changes.append(state))
+        for _ in range(2):
+            circuit.record(homework.DenialOfServiceError())
+        circuit.record(ValueError())
+        assert circuit.state == breaker.CLOSED
+        circuit.record()
+        for _ in range(2):
+            circuit.record(homework.DenialOfServiceError())
+        assert circuit.state == breaker.CLOSED, (
+            'Проверьте, что успешный опрос сбрасывает счётчик ошибок'
+        )
+        circuit.record(homework.DenialOfServiceError())
+        assert circuit.state == breaker.OPEN and not circuit.allow(), (
+            'Проверьте, что после порога ошибок опросы приостанавливаются'
+        )
+        clock.now += 60
+        assert circuit.allow() and not circuit.allow(), (
+            'Проверьте, что после паузы проходит ровно один пробный опрос'
+        )
+        circuit.record(ConnectionError())
+        assert circuit.state == breaker.OPEN and circuit.open_time == 120, (
+            'Проверьте, что неудачная проба удваивает паузу'
+        )
+        clock.now += 120
+        assert circuit.allow()
+        circuit.record()
+        assert circuit.state == breaker.CLOSED and circuit.allow()
+        assert changes == [breaker.OPEN, breaker.CLOSED], (
+            'Проверьте, что оператор получает одно сообщение на размыкание'
+        )
+
+    def test_thresholds_per_error_class(self):
+        import breaker
+        import homework
+
+        circuit = breaker.CircuitBreaker(clock=utils.FakeClock())
+        for _ in range(4):
+            circuit.record(homework.EndpointUnexpectedStatusError())
+            circuit.record(ConnectionError())
+        assert circuit.state == breaker.CLOSED
+        circuit.record(homework.EndpointUnexpectedStatusError())
+        assert circuit.state == breaker.OPEN
+
+    def test_operator_alert_once_for_all_workers(self):
+        import breaker
+        import homework
+        import storage
+
+        store = storage.StatusStore(':memory:')
+        outgoing = utils.MockOutbox()
+        first = breaker.operator_alert(outgoing, store, chat_id='1')
+        second = breaker.operator_alert(outgoing, store, chat_id='1')
+        first(breaker.OPEN, homework.DenialOfServiceError())
+        second(breaker.OPEN, homework.DenialOfServiceError())
+        first(breaker.CLOSED, None)
+        assert [text for _, text in outgoing.sent] == [
+            breaker.BREAKER_OPENED.format(error='DenialOfServiceError'),
+            breaker.BREAKER_CLOSED,
+        ], 'Проверьте, что воркеры не дублируют сообщение оператору'
+
+    def test_scheduler_postpones_while_open(self):
+        import breaker
+        import homework
+        import scheduler
+        import tenants
+
+        clock = utils.FakeClock()
+        circuit = breaker.CircuitBreaker(open_time=60, clock=clock)
+        items = [tenants.Tenant(token=f't{index}', chat_id=str(index))
+                 for index in range(5)]
+        queue = scheduler.Scheduler(items, retry_time=1, clock=clock)
+        for _ in range(3):
+            circuit.record(homework.DenialOfServiceError())
+        clock.now += 1
+        assert queue.pop_allowed(circuit) == [] and len(queue) == 5, (
+            'Проверьте, что при разомкнутом предохранителе опросы '
+            'откладываются, а не теряются'
+        )
+        assert queue.delay() >= 59
+        clock.now += 60 * (1 + scheduler.JITTER)
+        assert len(queue.pop_allowed(circuit)) == 1, (
+            'Проверьте, что после паузы опрашивается один пробный ученик'
+        )
+
+    def test_gateway_html_counts_as_failure(self, monkeypatch):
+        import requests
+
+        import breaker
+        import homework
+        import scheduler
+
+        class GatewayPage:
+            status_code = 502
+
+            def iter_content(self, size):
+                return iter([b'<html>502 Bad Gateway</html>'])
+
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *args):
+                return False
+
+        monkeypatch.setattr(homework, 'http', None)
+        monkeypatch.setattr(requests, 'get',
+                            lambda *args, **kwargs: GatewayPage())
+        with pytest.raises(homework.EndpointUnexpectedStatusError) as error:
+            homework.fetch_homework_statuses(homework.ENDPOINT, 0, 'secret')
+        circuit = breaker.CircuitBreaker(clock=utils.FakeClock())
+        assert circuit.classify(error.value) is not None, (
+            'Проверьте, что HTML-страница шлюза считается сбоем API'
+        )
+        assert isinstance(error.value, scheduler.BACKOFF_ERRORS)
+
+    def test_state_is_shared_between_processes(self, tmp_path):
+        import breaker
+        import homework
+
+        path = str(tmp_path / 'store.db')
+        clock = utils.FakeClock()
+        first = breaker.CircuitBreaker(open_time=60)
+        second = breaker.CircuitBreaker(open_time=60)
+        first.share(breaker.SharedState(path), clock=clock)
+        second.share(breaker.SharedState(path), clock=clock)
+        changes = []
+        second.listen(lambda state, error: changes.append(state))
+        for _ in range(3):
+            first.record(homework.DenialOfServiceError())
+        assert not second.allow() and second.state == breaker.OPEN, (
+            'Проверьте, что размыкание в одном воркере останавливает все'
+        )
+        clock.now += 60
+        assert [first.allow(), second.allow()].count(True) == 1, (
+            'Проверьте, что пробный опрос один на все воркеры'
+        )
+        first.record()
+        assert second.allow() and second.state == breaker.CLOSED
+        assert changes == [], (
+            'Проверьте, что о смене состояния сообщает только один воркер'
+        )
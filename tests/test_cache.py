@@ -0,0 +1,106 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+
+class TestResponseCache:
+
+    def test_ttl_and_lru(self):
+        import cache
+
+        now = [0.0]
+        responses = cache.ResponseCache(ttl=10, max_size=2, disk_path=None,
+                                        clock=lambda: now[0])
+        responses.put('a', {'v': 1})
+        responses.put('b', {'v': 2})
+        assert responses.get('a') == {'v': 1}
+        responses.put('c', {'v': 3})
+        assert responses.get('b') is None, (
+            'Проверьте, что вытесняется давно не использованная запись'
+        )
+        assert len(responses) == 2
+        now[0] = 11
+        assert responses.get('a') is None, (
+            'Проверьте, что просроченные записи не возвращаются'
+        )
+
+    def test_disk_tier_survives_restart(self, tmp_path):
+        import cache
+
+        path = str(tmp_path / 'cache.db')
+        cache.ResponseCache(disk_path=path).put('a', {'homeworks': []})
+        assert cache.ResponseCache(disk_path=path).get('a') == {
+            'homeworks': []
+        }, 'Проверьте, что дисковый уровень кэша переживает перезапуск'
+
+    def test_single_flight_threads(self):
+        import cache
+
+        responses = cache.ResponseCache(disk_path=None)
+        calls = []
+        started = threading.Event()
+
+        def fetch():
+            calls.append(1)
+            started.set()
+            time.sleep(0.05)
+            return {'homeworks': []}
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(
+            responses.get_or_fetch('k', fetch)
+        )) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert len(calls) == 1 and len(results) == 5, (
+            'Проверьте, что одинаковые одновременные запросы объединяются'
+        )
+
+    def test_late_follower_reads_cache(self, monkeypatch):
+        import cache
+
+        responses = cache.ResponseCache(disk_path=None)
+        calls = []
+
+        def fetch():
+            calls.append(1)
+            return {'homeworks': []}
+
+        responses.get_or_fetch('k', fetch)
+        monkeypatch.setattr(responses, 'get', lambda key: None)
+        assert responses.get_or_fetch('k', fetch) == {'homeworks': []}
+        assert len(calls) == 1, (
+            'Проверьте, что поток, промахнувшийся до записи лидера, '
+            'не повторяет запрос после его завершения'
+        )
+
+    def test_single_flight_async_error(self):
+        import cache
+
+        responses = cache.ResponseCache(disk_path=None)
+        calls = []
+
+        async def fetch():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            raise ConnectionError('boom')
+
+        async def run():
+            return await asyncio.gather(*(
+                responses.get_or_fetch_async('k', fetch) for _ in range(3)
+            ), return_exceptions=True)
+
+        results = asyncio.run(run())
+        assert len(calls) == 1
+        assert all(isinstance(result, ConnectionError) for result in results)
+        with pytest.raises(ConnectionError):
+            responses.get_or_fetch('k', lambda: (_ for _ in ()).throw(
+                ConnectionError('boom')
+            ))
+        assert responses.get('k') is None, (
+            'Проверьте, что ошибки не попадают в кэш'
+        )
@@ -0,0 +1,123 @@
+class MockMessage:
+
+    def __init__(self):
+        self.replies = []
+
+    def reply_text(self, text, **kwargs):
+        self.replies.append(text)
+
+
+class MockChat:
+
+    def __init__(self, chat_id):
+        self.id = chat_id
+
+
+class MockUpdate:
+
+    def __init__(self, chat_id):
+        self.effective_chat = MockChat(chat_id)
+        self.message = MockMessage()
+
+
+class TestCommands:
+
+    def test_status_and_history_from_store(self):
+        import commands
+        import storage
+        import templates
+
+        store = storage.StatusStore(':memory:')
+        assert commands.status_text(store, 't') == templates.render(
+            templates.DEFAULT_LOCALE, 'no_data'
+        )
+        store.save_statuses('t', [
+            {'id': 1, 'homework_name': 'hw1', 'status': 'reviewing'}
+        ])
+        store.save_statuses('t', [
+            {'id': 1, 'homework_name': 'hw1', 'status': 'approved'}
+        ])
+        assert commands.status_text(store, 't') == (
+            'hw1: Работа проверена: ревьюеру всё понравилось. Ура!'
+        ), 'Проверьте, что /status показывает последний статус работы'
+        history = commands.history_text(store, 't').splitlines()
+        assert len(history) == 2 and 'понравилось' in history[0], (
+            'Проверьте, что /history показывает изменения, новые первыми'
+        )
+
+    def test_pause_and_resume(self):
+        import commands
+        import storage
+
+        store = storage.StatusStore(':memory:')
+        commands.pause_text(store, 't')
+        assert store.is_paused('t')
+        commands.resume_text(store, 't')
+        assert not store.is_paused('t')
+
+    def test_handler_answers_from_store(self, tmp_path):
+        import commands
+        import templates
+
+        path = str(tmp_path / 'store.db')
+        handler = commands.make_handler('pause', {'7': (('t', '7'),)},
+                                        path)
+        update = MockUpdate(7)
+        handler(update, None)
+        assert update.message.replies == [templates.render('ru', 'paused')]
+        update = MockUpdate(8)
+        handler(update, None)
+        assert update.message.replies == [
+            templates.render('ru', 'unknown_chat')
+        ], (
+            'Проверьте ответ на команду из неизвестного чата'
+        )
+
+    def test_shared_chat_covers_every_tenant(self, tmp_path):
+        import commands
+        import storage
+        import tenants
+
+        path = str(tmp_path / 'store.db')
+        first = tenants.Tenant(token='a', chat_id='1')
+        second = tenants.Tenant(token='b', chat_id='1')
+        third = tenants.Tenant(token='c', chat_id='3',
+                               subscribers=(tenants.Subscription('1'),))
+        chats = tenants.chats_of([first, second, third])
+        assert [key for key, _ in chats['1']] == [
+            first.key, second.key, third.key
+        ], 'Проверьте, что общий чат получает всех своих учеников'
+        assert chats['3'] == ((third.key, '3'),)
+        update = MockUpdate(1)
+        commands.make_handler('status', chats, path)(update, None)
+        assert update.message.replies[0].count('\n\n') == 2, (
+            'Проверьте, что /status в общем чате отвечает по всем ученикам'
+        )
+        assert '3' not in update.message.replies[0], (
+            'Проверьте, что ответ в общем чате не раскрывает чаты учеников'
+        )
+        commands.make_handler('pause', chats, path)(update, None)
+        store = storage.StatusStore(path)
+        assert store.is_paused(first.key) and store.is_paused(second.key)
+        assert not store.is_paused(third.key), (
+            'Проверьте, что чат подписчика не приостанавливает опрос ученика'
+        )
+
+    def test_subscriber_chat_cannot_pause(self, tmp_path):
+        import commands
+        import storage
+        import templates
+        import tenants
+
+        path = str(tmp_path / 'store.db')
+        student = tenants.Tenant(token='a', chat_id='1',
+                                 subscribers=(tenants.Subscription('9'),))
+        update = MockUpdate(9)
+        commands.make_handler('pause', tenants.chats_of([student]),
+                              path)(update, None)
+        assert update.message.replies == [
+            templates.render('ru', 'owner_only')
+        ]
+        assert not storage.StatusStore(path).is_paused(student.key), (
+            'Проверьте, что /pause из чата подписчика ничего не меняет'
+        )
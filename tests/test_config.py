@@ -0,0 +1,52 @@
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class TestConfig:
+
+    def test_config_from_env(self):
+        import config
+
+        settings = config.Config.from_env({'PRACTICUM_TOKEN': 'token',
+                                           'CHAT_ID': '42',
+                                           'READ_TIMEOUT': '7.5'})
+        assert settings.practicum_token == 'token'
+        assert settings.chat_id == '42' and settings.telegram_token is None
+        assert settings.read_timeout == 7.5, (
+            'Проверьте, что таймауты читаются из окружения'
+        )
+        assert settings.http_pool_size == 10
+
+    def test_module_settings_come_from_config(self, tmp_path, settings):
+        import config
+        import storage
+
+        environ = {'STORE_PATH': 'custom.db', 'METRICS_PORT': '9100',
+                   'DYNO': 'web.1', 'LATENCY_BUDGET': '2.5'}
+        parsed = config.Config.from_env(environ)
+        assert (parsed.store_path, parsed.metrics_port, parsed.worker_prefix,
+                parsed.latency_budget) == ('custom.db', '9100', 'web.1',
+                                           2.5), (
+            'Проверьте, что все настройки модулей читаются в Config'
+        )
+        path = tmp_path / 'custom.db'
+        settings(store_path=str(path))
+        storage.StatusStore().close()
+        assert path.exists(), (
+            'Проверьте, что модули берут настройки через get_config, '
+            'а не при импорте'
+        )
+
+    def test_import_is_lightweight(self):
+        code = ('import sys, homework, tenants, sharding; '
+                'print(sorted({"telegram", "requests", "dotenv"}'
+                ' & set(sys.modules)))')
+        output = subprocess.run([sys.executable, '-c', code], cwd=ROOT,
+                                capture_output=True, text=True, check=True)
+        assert output.stdout.strip() == '[]', (
+            'Проверьте, что telegram, requests и dotenv не импортируются '
+            'вместе с модулями бота'
+        )
@@ -0,0 +1,91 @@
+import json
+import logging
+import queue
+
+import utils
+
+
+def make_record(message, level=logging.ERROR, line=1, **extra):
+    record = logging.LogRecord('root', level, 'bot.py', line, message,
+                               None, None)
+    record.__dict__.update(extra)
+    return record
+
+
+class TestLogs:
+
+    def test_secrets_are_redacted(self):
+        import homework
+        import logs
+
+        message = homework.NETWORK_FAILURE.format(
+            error='bot123:ABC-def timeout', url='u',
+            headers={'Authorization': 'OAuth y0_secret'}, params={}
+        )
+        assert 'y0_secret' not in message, (
+            'Проверьте, что токен не попадает в текст ошибки'
+        )
+        formatter = logs.JsonFormatter(secrets=('custom-token',))
+        entry = json.loads(formatter.format(make_record(
+            "headers={'Authorization': 'OAuth y0_secret'} custom-token "
+            + message, chat_id='7', tenant='abc'
+        )))
+        assert 'secret' not in entry['message'], (
+            'Проверьте, что заголовок авторизации вырезается из лога'
+        )
+        assert 'ABC-def' not in entry['message']
+        assert 'custom-token' not in entry['message']
+        assert (entry['chat_id'], entry['tenant']) == ('7', 'abc'), (
+            'Проверьте, что в запись попадают поля ученика'
+        )
+
+    def test_repeated_errors_are_sampled(self):
+        import logs
+
+        clock = utils.FakeClock()
+        limiter = logs.RateLimitFilter(window=60, burst=2, sample=10,
+                                       clock=clock)
+        passed = [limiter.filter(make_record('boom')) for _ in range(21)]
+        assert passed.count(True) == 3, (
+            'Проверьте, что после burst проходит каждая sample-я запись'
+        )
+        assert limiter.filter(make_record('info', logging.INFO))
+        assert limiter.filter(make_record('other', line=2))
+        clock.now += 60
+        record = make_record('boom')
+        assert limiter.filter(record) and record.suppressed == 9, (
+            'Проверьте, что число пропущенных записей сохраняется'
+        )
+
+    def test_full_queue_does_not_block(self):
+        import logs
+
+        records = queue.Queue(1)
+        handler = logs.DroppingQueueHandler(records)
+        try:
+            raise ValueError('boom')
+        except ValueError:
+            record = make_record('first')
+            record.exc_info = logging.sys.exc_info()
+        handler.handle(record)
+        handler.handle(make_record('second'))
+        queued = records.get_nowait()
+        assert queued.msg == 'first' and 'ValueError' in queued.exc_text
+        assert records.empty(), (
+            'Проверьте, что при полной очереди запись отбрасывается'
+        )
+
+    def test_setup_writes_json_lines(self, tmp_path):
+        import logs
+
+        root = logging.getLogger()
+        handlers, level = root.handlers[:], root.level
+        path = tmp_path / 'bot.log'
+        listener = logs.setup_logging(str(path))
+        try:
+            logging.info('hello', extra={'chat_id': '1'})
+        finally:
+            listener.stop()
+            root.handlers, root.level = handlers, level
+        entry = json.loads(path.read_text(encoding='utf-8'))
+        assert entry['message'] == 'hello' and entry['chat_id'] == '1'
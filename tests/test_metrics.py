@@ -0,0 +1,55 @@
+from urllib.request import urlopen
+
+import requests
+
+import utils
+
+
+class TestMetrics:
+
+    def test_histogram_and_counter_render(self):
+        import metrics
+
+        histogram = metrics.Histogram('test_seconds', 'Тест', ('kind',),
+                                      buckets=(1, 2))
+        histogram.observe(1, 'a')
+        histogram.observe(5, 'a')
+        counter = metrics.Counter('test_total', 'Тест', ('kind',))
+        counter.inc('a')
+        counter.inc('a', amount=2)
+        text = metrics.render()
+        assert 'test_seconds_bucket{kind="a",le="1"} 1' in text
+        assert 'test_seconds_bucket{kind="a",le="+Inf"} 2' in text
+        assert 'test_seconds_count{kind="a"} 2' in text
+        assert 'test_total{kind="a"} 3' in text
+
+    def test_api_denials_are_counted(self, monkeypatch, current_timestamp,
+                                     api_url):
+        import homework
+        import metrics
+
+        denial = utils.MockResponse({'code': 'UnknownError',
+                                     'error': {'error': 'boom'}})
+        monkeypatch.setattr(requests, 'get', lambda *args, **kwargs: denial)
+        before = metrics.API_DENIALS.values.get((), 0)
+        try:
+            homework.get_api_answer(api_url, current_timestamp)
+        except homework.DenialOfServiceError:
+            pass
+        assert metrics.API_DENIALS.values[()] == before + 1, (
+            'Проверьте, что отказы API учитываются в метриках'
+        )
+        assert metrics.API_RESPONSES.values[(200,)] >= 1
+
+    def test_metrics_endpoint(self):
+        import metrics
+
+        server = metrics.start_metrics_server(port=0)
+        try:
+            port = server.server_address[1]
+            with urlopen(f'http://127.0.0.1:{port}/metrics') as response:
+                body = response.read().decode()
+        finally:
+            server.shutdown()
+        assert '# TYPE homework_api_request_seconds histogram' in body
+        assert metrics.start_metrics_server(port=None) is None
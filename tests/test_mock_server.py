@@ -0,0 +1,48 @@
+import asyncio
+import threading
+
+
+class TestMockServer:
+
+    def test_async_poller_against_mock_server(self, monkeypatch, tmp_path):
+        import async_bot
+        import config
+        import homework
+        import outbox
+        import storage
+        import tenants
+        from benchmarks import mock_server
+
+        state = mock_server.MockState(change_interval=3600)
+        server = mock_server.create_server(state)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        base_url = f'http://127.0.0.1:{server.server_address[1]}'
+        monkeypatch.setattr(homework, 'ENDPOINT',
+                            base_url + mock_server.API_PATH)
+        monkeypatch.setattr(config, '_config', config.get_config())
+        config.override(telegram_token='test')
+        monkeypatch.setattr(async_bot, 'TELEGRAM_API',
+                            base_url + '/bot{token}/sendMessage')
+        path = str(tmp_path / 'store.db')
+        store = storage.StatusStore(path)
+        outgoing = outbox.Outbox(path)
+        tenant = tenants.Tenant(token='hw-1', chat_id='1', from_date=0)
+
+        async def poll_and_deliver():
+            async with async_bot.create_session() as session:
+                poller = async_bot.AsyncPoller(session, store, outgoing)
+                await poller.poll_tenant(tenant)
+                for batch in outgoing.claim():
+                    await poller.deliver(batch)
+
+        try:
+            asyncio.run(poll_and_deliver())
+        finally:
+            server.shutdown()
+        stats = state.stats()
+        assert stats['api_requests'] == 1 and stats['sends'] == 1, (
+            'Проверьте, что воркер опрашивает мок-сервер и отправляет '
+            'уведомление через мок Bot API'
+        )
+        assert 0 <= stats['notify_p50'] <= 3600
+        assert tenant.from_date > 0 and len(outgoing) == 0
@@ -0,0 +1,89 @@
+import telegram
+
+
+class MockBot:
+
+    def __init__(self, errors=()):
+        self.errors = list(errors)
+        self.sent = []
+
+    def send_message(self, chat_id=None, text=None, **kwargs):
+        if self.errors:
+            raise self.errors.pop(0)
+        self.sent.append((chat_id, text))
+
+
+class TestOutbox:
+
+    def test_messages_survive_restart(self, tmp_path):
+        import outbox
+
+        path = str(tmp_path / 'outbox.db')
+        outgoing = outbox.Outbox(path)
+        outgoing.put(1, 'first')
+        outgoing.connection.close()
+        outgoing = outbox.Outbox(path)
+        assert len(outgoing) == 1, (
+            'Проверьте, что очередь сообщений переживает перезапуск'
+        )
+
+    def test_claim_batches_messages_per_chat(self):
+        import outbox
+
+        outgoing = outbox.Outbox(':memory:')
+        outgoing.put(1, 'first')
+        outgoing.put(2, 'other chat')
+        outgoing.put(1, 'second')
+        batches = {batch.chat_id: batch for batch in outgoing.claim()}
+        assert batches['1'].text == 'first\n\nsecond', (
+            'Проверьте, что сообщения одного чата склеиваются в пачку'
+        )
+        assert outgoing.claim() == [], (
+            'Проверьте, что пачки в работе не выдаются повторно'
+        )
+        for batch in batches.values():
+            outgoing.complete(batch)
+        assert len(outgoing) == 0
+
+    def test_rate_limiter(self):
+        import outbox
+
+        now = [0.0]
+        limiter = outbox.RateLimiter(rate=2, chat_interval=1,
+                                     clock=lambda: now[0])
+        assert limiter.acquire('a')
+        assert not limiter.acquire('a'), (
+            'Проверьте ограничение частоты отправки в один чат'
+        )
+        assert limiter.acquire('b')
+        assert not limiter.acquire('c'), (
+            'Проверьте общее ограничение частоты отправки'
+        )
+        now[0] = 1
+        assert limiter.acquire('a') and limiter.acquire('c')
+
+    def test_dispatcher_retries_and_drops(self):
+        import outbox
+
+        outgoing = outbox.Outbox(':memory:', limiter=outbox.RateLimiter(
+            chat_interval=0
+        ))
+        bot = MockBot([telegram.error.RetryAfter(0),
+                       telegram.error.TimedOut()])
+        dispatcher = outbox.Dispatcher(outgoing, bot, workers=1)
+        outgoing.put(1, 'hello')
+        outgoing.put(2, 'bad chat')
+        for _ in range(3):
+            for batch in outgoing.claim():
+                if batch.chat_id == '2':
+                    outgoing.fail(batch, telegram.error.BadRequest('nope'))
+                else:
+                    dispatcher.deliver(batch)
+            outgoing.connection.execute('UPDATE outbox SET not_before = 0')
+        dispatcher.stop()
+        assert bot.sent == [('1', 'hello')], (
+            'Проверьте повторную отправку после RetryAfter и сбоя сети'
+        )
+        assert len(outgoing) == 0, (
+            'Проверьте, что недоставляемые сообщения удаляются из очереди'
+        )
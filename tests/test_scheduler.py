@@ -0,0 +1,100 @@
+class TestScheduler:
+
+    def test_next_interval_depends_on_status(self):
+        import scheduler
+        import tenants
+
+        tenant = tenants.Tenant(token='t', chat_id='1',
+                                last_status='reviewing')
+        reviewing = scheduler.next_interval(tenant, now=10 ** 9)
+        tenant.last_status = 'approved'
+        approved = scheduler.next_interval(tenant, now=10 ** 9)
+        assert reviewing < approved, (
+            'Проверьте, что работа на ревью опрашивается чаще принятой'
+        )
+        tenant.changed_at = 10 ** 9 - 10
+        assert scheduler.next_interval(tenant, now=10 ** 9) <= (
+            scheduler.RECENT_CHANGE_INTERVAL * (1 + scheduler.JITTER)
+        ), 'Проверьте, что после смены статуса опрос учащается'
+
+    def test_backoff_on_api_errors(self):
+        import homework
+        import scheduler
+        import tenants
+
+        tenant = tenants.Tenant(token='t', chat_id='1',
+                                last_status='reviewing')
+        for _ in range(3):
+            scheduler.record_result(tenant, homework.DenialOfServiceError())
+        assert tenant.failures == 3
+        interval = scheduler.next_interval(tenant, now=10 ** 9)
+        assert interval >= scheduler.STATUS_INTERVALS['reviewing'] * 4, (
+            'Проверьте, что при сбоях API интервал растёт'
+        )
+        scheduler.record_result(tenant, ValueError())
+        assert tenant.failures == 3
+        scheduler.record_result(tenant)
+        assert tenant.failures == 0
+
+    def test_scheduler_orders_by_due_time(self):
+        import scheduler
+        import tenants
+
+        now = [0.0]
+        items = [tenants.Tenant(token=str(i), chat_id=str(i))
+                 for i in range(10)]
+        queue = scheduler.Scheduler(items, retry_time=100,
+                                    clock=lambda: now[0])
+        assert len(queue) == 10
+        now[0] = 100
+        assert queue.pop_due() == items, (
+            'Проверьте, что первые опросы распределены по retry_time '
+            'в порядке очереди'
+        )
+        queue.reschedule(items[0])
+        assert queue.delay() > 0
+
+    def test_single_tenant_bot_backs_off(self, monkeypatch, tmp_path,
+                                         settings):
+        import requests
+
+        import breaker
+        import commands
+        import homework
+        import outbox
+        import shutdown
+        import warmup
+
+        settings(practicum_token='secret', telegram_token='bot',
+                 chat_id='1', store_path=str(tmp_path / 'store.db'),
+                 metrics_port=None)
+        for module, name, value in (
+            (homework, 'configure_session', lambda: None),
+            (homework, 'create_bot', lambda: None),
+            (warmup, 'validate_bot', lambda bot: None),
+            (warmup, 'check_chat', lambda bot, chat_id: None),
+            (commands, 'start_commands', lambda *args, **kwargs: None),
+            (outbox.Dispatcher, 'start', lambda self: self),
+            (shutdown, 'install', lambda: None),
+            (shutdown, 'finish', lambda *args: None),
+            (breaker, 'BREAKER', breaker.CircuitBreaker()),
+        ):
+            monkeypatch.setattr(module, name, value)
+
+        def mock_get(*args, **kwargs):
+            raise requests.ConnectionError('down')
+
+        waits = []
+
+        def mock_wait(timeout):
+            waits.append(timeout)
+            return len(waits) == 3
+
+        monkeypatch.setattr(requests, 'get', mock_get)
+        monkeypatch.setattr(shutdown, 'wait', mock_wait)
+        monkeypatch.setattr(shutdown, 'stopping', lambda: len(waits) == 3)
+        homework.main()
+        assert all(wait > homework.RETRY_TIME for wait in waits), (
+            'Проверьте, что бот одного ученика отступает при сбоях API, '
+            'а не ждёт фиксированный RETRY_TIME'
+        )
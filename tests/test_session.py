@@ -0,0 +1,30 @@
+import pytest
+import requests
+
+
+class TestSession:
+
+    def test_create_session_pool(self):
+        import homework
+
+        session = homework.create_session(pool_size=3)
+        adapter = session.get_adapter(homework.ENDPOINT)
+        assert adapter._pool_maxsize == 3, (
+            'Проверьте, что размер пула соединений настраивается'
+        )
+
+    def test_get_api_answer_timeout(self, monkeypatch, current_timestamp,
+                                    api_url):
+        import config
+        import homework
+
+        def mock_get(*args, timeout=None, **kwargs):
+            assert timeout == (config.get_config().connect_timeout,
+                               config.get_config().read_timeout), (
+                'Проверьте, что запрос к API выполняется с таймаутами'
+            )
+            raise requests.ReadTimeout('timeout')
+
+        monkeypatch.setattr(requests, 'get', mock_get)
+        with pytest.raises(ConnectionError):
+            homework.get_api_answer(api_url, current_timestamp)
@@ -0,0 +1,85 @@
+class TestSharding:
+
+    def test_ring_moves_only_share_of_keys(self):
+        import sharding
+
+        keys = [f'tenant-{index}' for index in range(2000)]
+        before = sharding.HashRing(['a', 'b', 'c'])
+        after = sharding.HashRing(['a', 'b', 'c', 'd'])
+        moved = [key for key in keys
+                 if before.node_for(key) != after.node_for(key)]
+        assert all(after.node_for(key) == 'd' for key in moved), (
+            'Проверьте, что при добавлении воркера ученики переезжают '
+            'только к нему'
+        )
+        assert len(moved) < len(keys) / 2
+        assert sharding.HashRing([]).node_for('x') is None
+
+    def test_shards_split_tenants_exclusively(self, tmp_path):
+        import sharding
+        import tenants
+
+        path = str(tmp_path / 'leases.db')
+        items = [tenants.Tenant(token=f'token-{index}', chat_id=str(index))
+                 for index in range(50)]
+        first = sharding.Shard('w1', sharding.LeaseStore(path), items)
+        second = sharding.Shard('w2', sharding.LeaseStore(path), items)
+        first.leases.heartbeat('w1')
+        second.leases.heartbeat('w2')
+        first.refresh()
+        second.refresh()
+        assert not first.owned & second.owned, (
+            'Проверьте, что ученика опрашивает только один воркер'
+        )
+        assert len(first.owned | second.owned) == len(items)
+        assert all(first.owns(item) != second.owns(item) for item in items)
+
+        owned_before = set(first.owned)
+        second.leases.leave('w2')
+        gained = first.refresh()
+        assert len(first.owned) == len(items), (
+            'Проверьте, что ученики ушедшего воркера переходят к живым'
+        )
+        assert gained == first.owned - owned_before
+
+    def test_gained_tenants_are_polled_soon(self, tmp_path):
+        import scheduler
+        import sharding
+        import storage
+        import tenants
+
+        path = str(tmp_path / 'leases.db')
+        items = [tenants.Tenant(token=f'token-{index}', chat_id=str(index))
+                 for index in range(50)]
+        shard = sharding.Shard('w1', sharding.LeaseStore(path), items)
+        shard.leases.heartbeat('w2')
+        store = storage.StatusStore(':memory:')
+        queue = scheduler.Scheduler([], retry_time=600)
+        queued = set()
+        sharding.enqueue_gained(shard, queue, queued, store, 600)
+        assert queued == shard.owned and len(queue) == len(shard.owned), (
+            'Проверьте, что в очереди воркера только его ученики'
+        )
+        owned_before = set(shard.owned)
+        shard.leases.leave('w2')
+        sharding.enqueue_gained(shard, queue, queued, store,
+                                sharding.HEARTBEAT_INTERVAL)
+        deadline = queue.clock() + sharding.HEARTBEAT_INTERVAL
+        gained = [due for due, _, tenant in queue.heap
+                  if tenant.key not in owned_before]
+        assert len(gained) == len(items) - len(owned_before) > 0
+        assert all(due <= deadline for due in gained), (
+            'Проверьте, что доставшиеся воркеру ученики опрашиваются сразу, '
+            'а не по старому расписанию'
+        )
+
+    def test_workers_serve_metrics_on_own_ports(self, settings):
+        import sharding
+
+        settings(metrics_port=None)
+        assert sharding.worker_metrics_port(0) is None
+        settings(metrics_port='9100')
+        assert [sharding.worker_metrics_port(index)
+                for index in range(3)] == [9101, 9102, 9103], (
+            'Проверьте, что каждый воркер отдаёт метрики на своём порту'
+        )
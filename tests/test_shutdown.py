@@ -0,0 +1,87 @@
+import os
+import signal
+import threading
+import time
+
+import pytest
+
+
+class MockBot:
+
+    def __init__(self):
+        self.sent = []
+
+    def send_message(self, chat_id, text, parse_mode=None):
+        self.sent.append((chat_id, text))
+
+
+@pytest.fixture
+def stop_event():
+    import shutdown
+
+    handlers = {signum: signal.getsignal(signum)
+                for signum in shutdown.SHUTDOWN_SIGNALS}
+    shutdown.STOP.clear()
+    yield shutdown.STOP
+    shutdown.STOP.clear()
+    shutdown.received.clear()
+    for signum, handler in handlers.items():
+        signal.signal(signum, handler)
+
+
+class TestShutdown:
+
+    def test_signal_interrupts_wait(self, stop_event):
+        import shutdown
+
+        shutdown.install()
+        timer = threading.Timer(0.05, os.kill,
+                                (os.getpid(), signal.SIGTERM))
+        timer.start()
+        started = time.monotonic()
+        assert shutdown.wait(10), (
+            'Проверьте, что SIGTERM прерывает ожидание следующего опроса'
+        )
+        assert time.monotonic() - started < 5
+        assert shutdown.received == [signal.SIGTERM]
+
+    def test_poll_loop_exits_on_stop(self, stop_event, monkeypatch):
+        import requests
+        import storage
+        import tenants
+
+        calls = []
+        monkeypatch.setattr(requests, 'get',
+                            lambda *args, **kwargs: calls.append(args))
+        stop_event.set()
+        tenants.poll_forever(None, [tenants.Tenant(token='t', chat_id='1')],
+                             storage.StatusStore(':memory:'), retry_time=0)
+        assert calls == [], (
+            'Проверьте, что цикл опроса завершается по запросу остановки'
+        )
+
+    def test_finish_drains_outbox(self, stop_event, tmp_path):
+        import outbox
+        import shutdown
+        import storage
+
+        path = str(tmp_path / 'store.db')
+        store = storage.StatusStore(path, checkpoint_every=100)
+        store.save_cursor('t', 42)
+        outgoing = outbox.Outbox(path)
+        outgoing.put('1', 'now')
+        outgoing.put('2', 'later', not_before=time.time() + 3600)
+        bot = MockBot()
+        dispatcher = outbox.Dispatcher(outgoing, bot).start()
+        left = shutdown.finish(store, dispatcher,
+                               until=shutdown.deadline(5))
+        assert bot.sent == [('1', 'now')] and left == 0, (
+            'Проверьте, что перед выходом готовые сообщения досылаются'
+        )
+        assert len(outgoing) == 1, (
+            'Проверьте, что отложенные сообщения остаются в очереди'
+        )
+        assert storage.StatusStore(path).get_cursor('t', 0) == 42, (
+            'Проверьте, что курсоры записываются при остановке'
+        )
+
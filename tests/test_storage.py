@@ -0,0 +1,86 @@
+import utils
+
+
+class TestStatusStore:
+
+    def test_status_survives_restart(self, tmp_path):
+        import storage
+
+        path = str(tmp_path / 'store.db')
+        work = {'id': 1, 'homework_name': 'hw', 'status': 'reviewing'}
+        store = storage.StatusStore(path)
+        assert store.is_new_status('t', work)
+        store.save_status('t', work)
+        store.save_cursor('t', 123)
+        store.close()
+
+        store = storage.StatusStore(path)
+        assert not store.is_new_status('t', work), (
+            'Проверьте, что сохранённый статус переживает перезапуск'
+        )
+        assert store.get_cursor('t', 0) == 123, (
+            'Проверьте, что from_date восстанавливается после перезапуска'
+        )
+        work['status'] = 'approved'
+        assert store.is_new_status('t', work)
+
+    def test_error_cooldown(self):
+        import storage
+
+        store = storage.StatusStore(':memory:')
+        assert store.should_report_error('t', 'boom', cooldown=60)
+        assert not store.should_report_error('t', 'boom', cooldown=60), (
+            'Проверьте, что одинаковая ошибка не отправляется повторно'
+        )
+        assert store.should_report_error('t', 'other', cooldown=60)
+
+    def test_tenant_key_hides_token(self):
+        import storage
+
+        key = storage.tenant_key('secret-token')
+        assert 'secret' not in key and key == storage.tenant_key(
+            'secret-token'
+        )
+
+    def test_cursors_are_group_committed(self, tmp_path):
+        import storage
+
+        path = str(tmp_path / 'store.db')
+        clock = utils.FakeClock()
+        store = storage.StatusStore(path, checkpoint_every=3,
+                                    checkpoint_interval=10, clock=clock)
+        reader = storage.StatusStore(path)
+        store.save_cursor('a', 1)
+        store.save_cursor('b', 2)
+        assert store.get_cursor('a', 0) == 1
+        assert reader.load_cursors() == {}, (
+            'Проверьте, что курсоры не пишутся на диск при каждом опросе'
+        )
+        store.save_cursor('a', 3)
+        assert reader.load_cursors() == {'a': 3, 'b': 2}, (
+            'Проверьте, что курсоры пишутся пачкой после checkpoint_every'
+        )
+        store.save_cursor('b', 4)
+        store.checkpoint()
+        assert reader.get_cursor('b', 0) == 2
+        clock.now += 10
+        store.checkpoint()
+        assert reader.get_cursor('b', 0) == 4, (
+            'Проверьте, что курсоры пишутся по истечении checkpoint_interval'
+        )
+
+    def test_cursors_recovered_on_boot(self, tmp_path):
+        import storage
+        import tenants
+
+        path = str(tmp_path / 'store.db')
+        first = tenants.Tenant(token='a', chat_id='1', from_date=5)
+        second = tenants.Tenant(token='b', chat_id='2', from_date=5)
+        store = storage.StatusStore(path, checkpoint_every=100)
+        store.save_cursor(first.key, 42)
+        store.close()
+        tenants.restore_cursors([first, second], storage.StatusStore(path))
+        assert (first.from_date, second.from_date) == (42, 5), (
+            'Проверьте, что после перезапуска опрос продолжается '
+            'с сохранённого курсора'
+        )
@@ -0,0 +1,100 @@
+import json
+import threading
+
+import pytest
+
+
+def split(raw, size):
+    return [raw[index:index + size] for index in range(0, len(raw), size)]
+
+
+class TestStreaming:
+
+    def test_parse_answer_matches_json(self):
+        import homework
+        import streaming
+
+        answer = {
+            'homeworks': [{'id': index, 'homework_name': f'работа {index}',
+                           'status': 'approved', 'lesson_name': 'урок',
+                           'reviewer_comment': 'x' * 100,
+                           'date_updated': '2020-02-13T14:40:57Z'}
+                          for index in range(50)],
+            'current_date': 1581604970,
+        }
+        raw = json.dumps(answer, ensure_ascii=False, indent=2).encode()
+        for size in (1, 3, 64, len(raw)):
+            result = streaming.parse_answer(split(raw, size),
+                                            homework.compact_homework)
+            assert result['current_date'] == answer['current_date'], (
+                'Проверьте, что число, разрезанное между частями ответа, '
+                'разбирается целиком'
+            )
+            assert result['homeworks'] == [
+                {key: item[key] for key in homework.HOMEWORK_SCHEMA}
+                for item in answer['homeworks']
+            ], 'Проверьте, что работы сжимаются до полей схемы'
+
+    def test_parse_answer_split_at_every_offset(self):
+        import streaming
+
+        raw = (b'{"current_date": 1.5, "rate": -2.5e-3, "ok": true,'
+               b' "homeworks": [{"id": 10, "status": "approved"}],'
+               b' "total": 12}')
+        for offset in range(len(raw) + 1):
+            result = streaming.parse_answer([raw[:offset], raw[offset:]],
+                                            dict)
+            assert result == json.loads(raw), (
+                'Проверьте, что ответ, разрезанный на позиции '
+                f'{offset}, разбирается так же, как целиком'
+            )
+
+    def test_parse_answer_keeps_denial_fields(self):
+        import streaming
+
+        raw = b'{"code": "UnknownError", "error": {"error": "Wrong"}}'
+        result = streaming.parse_answer(split(raw, 5), dict)
+        assert result == json.loads(raw)
+        assert streaming.parse_answer([b'{}'], dict) == {}
+
+    @pytest.mark.parametrize('raw', [
+        b'', b'[]', b'{"homeworks": [', b'{"homeworks": [1,]}', b'{} {}',
+    ])
+    def test_parse_answer_invalid(self, raw):
+        import streaming
+
+        with pytest.raises(ValueError):
+            streaming.parse_answer(split(raw, 2), lambda item: item)
+
+    def test_compact_homework_schema(self):
+        import homework
+
+        work = {'homework_name': 'hw', 'status': 'approved', 'id': None}
+        assert homework.compact_homework(work) == {'homework_name': 'hw',
+                                                   'status': 'approved'}
+        for invalid in ({'status': 'approved'},
+                        {'homework_name': 'hw', 'status': 'approved',
+                         'id': '1'},
+                        ['hw']):
+            with pytest.raises(homework.InvalidHomeworkError):
+                homework.compact_homework(invalid)
+        with pytest.raises(homework.InvalidHomeworkError):
+            homework.check_response({'homeworks': [{'status': 'approved'}]})
+
+    def test_fetch_streams_real_response(self, monkeypatch):
+        import homework
+        from benchmarks import mock_server
+
+        server = mock_server.create_server(mock_server.MockState())
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        try:
+            result = homework.fetch_homework_statuses(
+                f'http://127.0.0.1:{server.server_address[1]}'
+                + mock_server.API_PATH, 0, 'hw-1'
+            )
+        finally:
+            server.shutdown()
+        assert [work['homework_name'] for work in result['homeworks']] == [
+            'hw-1'
+        ], 'Проверьте, что ответ API разбирается потоково'
+        assert set(result['homeworks'][0]) <= set(homework.HOMEWORK_SCHEMA)
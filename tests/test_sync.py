@@ -0,0 +1,68 @@
+import pytest
+import requests
+
+import utils
+
+
+class MockApi:
+
+    def __init__(self, answers):
+        self.answers = answers
+        self.from_dates = []
+
+    def __call__(self, url, headers=None, params=None, **kwargs):
+        self.from_dates.append(params['from_date'])
+        return utils.MockResponse(self.answers.pop(0))
+
+
+class TestSync:
+
+    def test_backfill_then_incremental(self, monkeypatch, settings):
+        import storage
+        import sync
+        import tenants
+
+        settings(backfill_notify_limit=2)
+        history = [{'id': index, 'homework_name': f'hw{index}',
+                    'status': 'approved'} for index in range(5)]
+        api = MockApi([
+            {'homeworks': history, 'current_date': 100},
+            {'homeworks': [], 'current_date': 200},
+        ])
+        monkeypatch.setattr(requests, 'get', api)
+        outgoing = utils.MockOutbox()
+        store = storage.StatusStore(':memory:')
+        tenant = tenants.Tenant(token='t', chat_id='1')
+        tenants.poll_tenant(outgoing, tenant, store)
+        tenants.poll_tenant(outgoing, tenant, store)
+        assert api.from_dates == [0, 100], (
+            'Проверьте, что новый ученик сначала получает всю историю, '
+            'а дальше опрашивается с курсора'
+        )
+        assert len(outgoing.sent) == 1, (
+            'Проверьте, что при первой синхронизации уходит одно сообщение'
+        )
+        text = outgoing.sent[0][1]
+        assert 'hw1' in text and 'hw2' not in text and '3' in text, (
+            'Проверьте, что после первой синхронизации показываются только '
+            'последние работы и число остальных'
+        )
+        assert store.filter_changed(tenant.key, history) == [], (
+            'Проверьте, что скрытые работы тоже сохраняются'
+        )
+
+    @pytest.mark.parametrize('answer, expected', [
+        ({'homeworks': []}, 1000),
+        ({'homeworks': [], 'current_date': None}, 1000),
+        ({'homeworks': [], 'current_date': 900}, 600),
+        ({'homeworks': [], 'current_date': 100}, 1),
+        ({'homeworks': [], 'current_date': 1500}, 1500),
+    ])
+    def test_gap_resyncs_window(self, settings, answer, expected):
+        import sync
+
+        settings(resync_overlap=300)
+        assert sync.next_cursor(1000, answer) == expected, (
+            'Проверьте, что при пропуске курсора повторяется только '
+            'пропущенное окно, а не вся история'
+        )
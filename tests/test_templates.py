@@ -0,0 +1,64 @@
+class TestTemplates:
+
+    def test_default_locale_keeps_messages(self):
+        import homework
+        import templates
+
+        assert templates.render_status(
+            'ru', homework.Status.APPROVED, 'hw1'
+        ) == ('Изменился статус проверки работы "hw1". '
+              + homework.VERDICTS['approved']), (
+            'Проверьте, что русские сообщения не изменились'
+        )
+        assert templates.render('ru', 'failure', error='boom') == (
+            'Сбой в работе программы: boom'
+        )
+
+    def test_other_locale_and_fallback(self):
+        import templates
+
+        assert templates.render_status('en', 'reviewing', 'hw1') == (
+            'Review status of "hw1" has changed. '
+            'The reviewer has started reviewing the work.'
+        )
+        assert templates.catalog('xx') is templates.catalog('ru'), (
+            'Проверьте, что неизвестная локаль берёт каталог по умолчанию'
+        )
+
+    def test_markup_escapes_values(self):
+        import config
+        import templates
+
+        markdown = templates.render_status('ru', 'approved', 'hw_1.zip',
+                                           'markdown')
+        url = config.get_config().homework_url
+        assert '[hw\\_1\\.zip](' + url + ')' in markdown, (
+            'Проверьте экранирование MarkdownV2 и ссылку на работу'
+        )
+        page = templates.render_status('en', 'approved', '<b>&', 'html')
+        assert '&lt;b&gt;&amp;</a>' in page and '<a href=' in page, (
+            'Проверьте экранирование HTML'
+        )
+        assert templates.parse_mode('html') == 'HTML'
+
+    def test_render_status_is_cached(self):
+        import templates
+
+        templates.render_status.cache_clear()
+        homeworks = [{'homework_name': 'hw', 'status': 'approved'}] * 3
+        for _ in range(100):
+            templates.render_statuses(homeworks)
+        assert templates.render_status.cache_info().misses == 1, (
+            'Проверьте, что одинаковые уведомления собираются один раз'
+        )
+
+    def test_outbox_does_not_mix_markup(self):
+        import outbox
+
+        outgoing = outbox.Outbox(':memory:')
+        outgoing.put('1', 'plain')
+        outgoing.put('1', '*bold*', 'MarkdownV2')
+        first = outgoing.claim()
+        assert [(batch.text, batch.parse_mode) for batch in first] == [
+            ('plain', None)
+        ], 'Проверьте, что сообщения с разной разметкой не склеиваются'
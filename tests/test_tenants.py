@@ -0,0 +1,266 @@
+import json
+import sqlite3
+
+import pytest
+import requests
+
+import utils
+
+
+class TestTenants:
+
+    def test_load_tenants_from_json(self, tmp_path):
+        import tenants
+
+        path = tmp_path / 'tenants.json'
+        path.write_text(json.dumps([
+            {'token': 'a', 'chat_id': 1},
+            {'token': 'b', 'chat_id': '2'},
+        ]))
+        result = tenants.load_tenants(str(path), from_date=5)
+        assert [(t.token, t.chat_id, t.from_date) for t in result] == [
+            ('a', '1', 5), ('b', '2', 5)
+        ], 'Проверьте загрузку учеников из JSON-файла'
+
+    def test_load_tenants_from_sqlite(self, tmp_path):
+        import tenants
+
+        path = str(tmp_path / 'tenants.db')
+        connection = sqlite3.connect(path)
+        connection.execute('CREATE TABLE tenants (token TEXT, chat_id TEXT)')
+        connection.execute("INSERT INTO tenants VALUES ('a', '1')")
+        connection.commit()
+        connection.close()
+        result = tenants.load_tenants(path)
+        assert [(t.token, t.chat_id) for t in result] == [('a', '1')], (
+            'Проверьте загрузку учеников из базы SQLite'
+        )
+
+    def test_load_tenants_sqlite_optional_columns(self, tmp_path):
+        import tenants
+
+        path = str(tmp_path / 'tenants.db')
+        connection = sqlite3.connect(path)
+        connection.execute('CREATE TABLE tenants (token TEXT, chat_id TEXT,'
+                           ' locale TEXT, markup TEXT, digest INTEGER,'
+                           ' chats TEXT)')
+        connection.executemany(
+            'INSERT INTO tenants VALUES (?, ?, ?, ?, ?, ?)', [
+                ('a', '1', 'en', 'html', 600,
+                 json.dumps(['2', {'chat_id': 3, 'digest': 60}])),
+                ('b', '4', None, None, None, None),
+            ]
+        )
+        connection.commit()
+        connection.close()
+        first, second = tenants.load_tenants(path)
+        assert (first.locale, first.markup, first.digest) == ('en', 'html',
+                                                              600), (
+            'Проверьте, что необязательные столбцы реестра SQLite читаются'
+        )
+        assert [(s.chat_id, s.digest) for s in first.subscriptions] == [
+            ('1', 600), ('2', 0), ('3', 60)
+        ]
+        assert (second.locale, second.markup, second.digest,
+                second.subscribers) == ('ru', 'text', 0, ())
+
+    def test_load_tenants_invalid(self, tmp_path):
+        import tenants
+
+        path = tmp_path / 'tenants.json'
+        path.write_text(json.dumps([{'token': 'a'}]))
+        with pytest.raises(tenants.TenantRegistryError):
+            tenants.load_tenants(str(path))
+        with pytest.raises(tenants.TenantRegistryError):
+            tenants.load_tenants(str(tmp_path / 'missing.json'))
+
+    def test_poll_tenant_notifies_only_on_change(self, monkeypatch):
+        import storage
+        import tenants
+
+        calls = []
+
+        def mock_get(url, headers=None, params=None, **kwargs):
+            calls.append((headers['Authorization'], params['from_date']))
+            return utils.MockResponse({
+                'homeworks': [{'homework_name': 'hw', 'status': 'approved'}],
+                'current_date': 100,
+            })
+
+        monkeypatch.setattr(requests, 'get', mock_get)
+        outgoing = utils.MockOutbox()
+        store = storage.StatusStore(':memory:')
+        tenant = tenants.Tenant(token='secret', chat_id='7', from_date=1)
+        tenants.poll_tenant(outgoing, tenant, store)
+        tenants.poll_tenant(outgoing, tenant, store)
+        assert calls == [('OAuth secret', 1), ('OAuth secret', 100)], (
+            'Проверьте, что запрос идёт с токеном ученика и его from_date'
+        )
+        assert len(outgoing.sent) == 1 and outgoing.sent[0][0] == '7', (
+            'Проверьте, что ученику отправляется только новый статус'
+        )
+        assert store.get_cursor(tenant.key, None) == 100, (
+            'Проверьте, что курсор опроса сохраняется в хранилище'
+        )
+
+    def test_outage_is_reported_once(self, monkeypatch):
+        import storage
+        import tenants
+
+        attempts = iter(range(3))
+
+        def mock_get(*args, **kwargs):
+            raise requests.ConnectionError(
+                f'<HTTPSConnection object at 0x{next(attempts):x}>'
+            )
+
+        monkeypatch.setattr(requests, 'get', mock_get)
+        outgoing = utils.MockOutbox()
+        store = storage.StatusStore(':memory:')
+        tenant = tenants.Tenant(token='secret', chat_id='7', from_date=1)
+        for _ in range(3):
+            tenants.poll_tenant(outgoing, tenant, store)
+        assert len(outgoing.sent) == 1, (
+            'Проверьте, что сбой сети с меняющимся текстом ошибки '
+            'сообщается ученику один раз'
+        )
+
+    def test_intermittent_outage_is_reported_once(self, monkeypatch):
+        import storage
+        import tenants
+
+        answers = iter([
+            requests.ConnectionError('down'),
+            utils.MockResponse({'current_date': 2, 'homeworks': []}),
+            requests.ConnectionError('down again'),
+            utils.MockResponse({'current_date': 3, 'homeworks': []}),
+            requests.ConnectionError('down once more'),
+        ])
+
+        def mock_get(*args, **kwargs):
+            answer = next(answers)
+            if isinstance(answer, Exception):
+                raise answer
+            return answer
+
+        monkeypatch.setattr(requests, 'get', mock_get)
+        outgoing = utils.MockOutbox()
+        store = storage.StatusStore(':memory:')
+        tenant = tenants.Tenant(token='secret', chat_id='7', from_date=1)
+        for _ in range(5):
+            tenants.poll_tenant(outgoing, tenant, store)
+        assert len(outgoing.sent) == 1, (
+            'Проверьте, что успешный опрос между сбоями не сбрасывает '
+            'паузу между сообщениями о сбое'
+        )
+
+    def test_poll_tenant_coalesces_all_homeworks(self, monkeypatch):
+        import storage
+        import tenants
+
+        homeworks = [
+            {'id': 1, 'homework_name': 'hw1', 'status': 'approved'},
+            {'id': 2, 'homework_name': 'hw2', 'status': 'reviewing'},
+        ]
+
+        def mock_get(url, headers=None, params=None, **kwargs):
+            return utils.MockResponse({'homeworks': homeworks,
+                                       'current_date': 1})
+
+        monkeypatch.setattr(requests, 'get', mock_get)
+        outgoing = utils.MockOutbox()
+        store = storage.StatusStore(':memory:')
+        tenant = tenants.Tenant(token='secret', chat_id='7')
+        tenants.poll_tenant(outgoing, tenant, store)
+        assert len(outgoing.sent) == 1, (
+            'Проверьте, что изменения за один опрос уходят одним сообщением'
+        )
+        assert 'hw1' in outgoing.sent[0][1] and 'hw2' in outgoing.sent[0][1], (
+            'Проверьте, что в сообщение попадают все изменившиеся работы'
+        )
+        homeworks[1] = dict(homeworks[1], status='rejected')
+        tenants.poll_tenant(outgoing, tenant, store)
+        assert len(outgoing.sent) == 2 and 'hw1' not in outgoing.sent[1][1], (
+            'Проверьте, что повторно отправляются только изменения'
+        )
+
+    def test_tenant_is_compact(self):
+        import tracemalloc
+
+        import homework
+        import tenants
+
+        tenant = tenants.Tenant(token='t', chat_id='1',
+                                last_status='reviewing')
+        assert not hasattr(tenant, '__dict__'), (
+            'Проверьте, что у ученика нет __dict__'
+        )
+        assert tenant.last_status is homework.Status.REVIEWING, (
+            'Проверьте, что статус хранится членом перечисления'
+        )
+        records = [(f'token-{index:040d}', str(index))
+                   for index in range(1000)]
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        items = [tenants.Tenant(token=token, chat_id=chat_id)
+                 for token, chat_id in records]
+        per_tenant = (tracemalloc.get_traced_memory()[0] - before) / 1000
+        tracemalloc.stop()
+        assert len(items) == 1000 and per_tenant < 256, (
+            'Проверьте, что состояние ученика занимает меньше 256 байт'
+        )
+
+    def test_homework_record(self):
+        import homework
+
+        work = homework.Homework.from_dict({
+            'id': 3, 'homework_name': 'hw', 'status': 'approved',
+            'reviewer_comment': 'Всё нравится',
+        })
+        assert work.status is homework.Status.APPROVED
+        assert work.status.verdict == homework.VERDICTS['approved']
+        assert homework.parse_status(work) == homework.parse_status(
+            {'homework_name': 'hw', 'status': 'approved'}
+        ), 'Проверьте, что запись работы годится для parse_status'
+        assert work.get('date_updated', 'нет') == 'нет'
+        with pytest.raises(ValueError):
+            homework.Homework.from_dict({'homework_name': 'hw',
+                                         'status': 'unknown'})
+
+    def test_subscriptions_and_digest(self, tmp_path, monkeypatch):
+        import outbox
+        import tenants
+
+        path = tmp_path / 'tenants.json'
+        path.write_text(json.dumps([
+            {'token': 'a', 'chat_id': 1,
+             'chats': [{'chat_id': 'mentor', 'digest': 60}]},
+            {'token': 'b', 'chat_id': 2, 'chats': ['mentor']},
+            {'token': 'a', 'chat_id': 3, 'chats': ['mentor']},
+        ]))
+        first, second = tenants.load_tenants(str(path))
+        assert [subscription.chat_id
+                for subscription in first.subscriptions] == [
+            '1', 'mentor', '3'
+        ], 'Проверьте, что один токен опрашивается один раз для всех чатов'
+        assert second.subscribers[0] is first.subscribers[0], (
+            'Проверьте, что окно сводки задаётся для чата, а не для записи'
+        )
+        now = 1000.0
+        monkeypatch.setattr(outbox.time, 'time', lambda: now)
+        outgoing = outbox.Outbox(':memory:')
+        work = [{'homework_name': 'hw', 'status': 'approved'}]
+        for tenant in (first, second, first):
+            tenant.from_date = 1
+            tenants.notify(outgoing, tenant, work)
+        assert sorted(batch.chat_id for batch in outgoing.claim()) == [
+            '1', '2', '3'
+        ], 'Проверьте, что в чат со сводкой сообщения сразу не уходят'
+        now = 1019.0
+        assert outgoing.claim() == []
+        now = 1020.0
+        batches = [batch for batch in outgoing.claim()
+                   if batch.chat_id == 'mentor']
+        assert len(batches) == 1 and len(batches[0].ids) == 3, (
+            'Проверьте, что сообщения за окно уходят одной сводкой'
+        )
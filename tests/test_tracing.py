@@ -0,0 +1,129 @@
+import json
+import time
+
+import utils
+
+
+class TestTracing:
+
+    def test_spans_are_collected_per_iteration(self):
+        import tracing
+
+        with tracing.iteration('test', budget=60) as current:
+            with tracing.span('first'):
+                pass
+            with tracing.span('second'):
+                pass
+        with tracing.span('outside'):
+            pass
+        assert [name for name, _ in current.spans] == ['first', 'second'], (
+            'Проверьте, что итерация собирает только свои этапы'
+        )
+
+    def test_traced_keeps_signature(self):
+        import inspect
+
+        import homework
+
+        assert list(inspect.signature(homework.parse_status).parameters) == [
+            'homework'
+        ], 'Проверьте, что декоратор этапа сохраняет сигнатуру функции'
+
+    def test_slow_iteration_is_exported(self, tmp_path, settings):
+        import metrics
+        import tracing
+
+        trace = tmp_path / 'trace.jsonl'
+        settings(trace_file=str(trace))
+        before = metrics.SLOW_ITERATIONS.values.get(('slow',), 0)
+        with tracing.iteration('slow', budget=0):
+            with tracing.span('work'):
+                time.sleep(0.01)
+        assert metrics.SLOW_ITERATIONS.values[('slow',)] == before + 1
+        record = json.loads(trace.read_text(encoding='utf-8'))
+        assert record['iteration'] == 'slow' and 'work' in record['stages'], (
+            'Проверьте, что разбивка медленной итерации пишется в TRACE_FILE'
+        )
+
+    def test_fast_iteration_is_not_reported(self, tmp_path, settings):
+        import tracing
+
+        trace = tmp_path / 'trace.jsonl'
+        settings(trace_file=str(trace))
+        with tracing.iteration('fast', budget=60):
+            pass
+        assert not trace.exists(), (
+            'Проверьте, что итерация в пределах бюджета не записывается'
+        )
+
+    def test_cprofile_snapshot(self, tmp_path, settings):
+        import pstats
+
+        import tracing
+
+        settings(profile_dir=str(tmp_path))
+        with tracing.iteration('profiled', budget=0, profiler='cprofile'):
+            sum(range(1000))
+        [path] = tmp_path.glob('profiled-*.pstats')
+        assert pstats.Stats(str(path)).total_calls > 0, (
+            'Проверьте, что медленная итерация сохраняет профиль cProfile'
+        )
+
+    def test_sampling_snapshot(self, tmp_path, settings):
+        import signal
+
+        import tracing
+
+        settings(profile_dir=str(tmp_path))
+        handler = signal.getsignal(signal.SIGALRM)
+        with tracing.iteration('sampled', budget=0, profiler='sampling'):
+            time.sleep(0.05)
+        [path] = tmp_path.glob('sampled-*.folded')
+        lines = path.read_text(encoding='utf-8').splitlines()
+        assert any('test_sampling_snapshot' in line for line in lines), (
+            'Проверьте, что профиль содержит стеки в свёрнутом формате'
+        )
+        assert signal.getsignal(signal.SIGALRM) is handler, (
+            'Проверьте, что профилировщик возвращает прежний обработчик'
+        )
+
+    def test_profiler_is_off_by_default(self, tmp_path, settings):
+        import tracing
+
+        settings(profile_dir=str(tmp_path))
+        with tracing.iteration('plain', budget=0, profiler=''):
+            pass
+        assert list(tmp_path.iterdir()) == [], (
+            'Проверьте, что без PROFILER профиль не снимается'
+        )
+
+    def test_poll_tenant_records_stages(self, monkeypatch, settings):
+        import requests
+
+        import storage
+        import tenants
+        import tracing
+
+        reports = []
+        monkeypatch.setattr(tracing, 'report_slow',
+                            lambda name, duration, budget, spans,
+                            profiler=None: reports.append(spans))
+        settings(latency_budget=0, profiler='')
+        monkeypatch.setattr(
+            requests, 'get',
+            lambda *args, **kwargs: utils.MockResponse({
+                'current_date': 100,
+                'homeworks': [{'homework_name': 'hw', 'status': 'approved'}]
+            })
+        )
+        tenant = tenants.Tenant(token='t', chat_id='1', from_date=1)
+        tenants.poll_tenant(utils.MockOutbox(), tenant, storage.StatusStore(
+            ':memory:'
+        ))
+        [spans] = reports
+        stages = [name for name, _ in spans]
+        for stage in ('get_api_answer', 'response_json', 'check_response',
+                      'parse_status'):
+            assert stage in stages, (
+                f'Проверьте, что опрос ученика замеряет этап {stage}'
+            )
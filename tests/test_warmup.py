@@ -0,0 +1,135 @@
+import pytest
+import requests
+import telegram
+
+import utils
+
+
+class MockBot:
+
+    def __init__(self, authorized=True, reachable=True):
+        self.authorized = authorized
+        self.reachable = reachable
+
+    def get_me(self):
+        if not self.authorized:
+            raise telegram.error.Unauthorized('Unauthorized')
+        if not self.reachable:
+            raise telegram.error.NetworkError('Bad Gateway')
+
+    def get_chat(self, chat_id):
+        if chat_id.startswith('bad'):
+            raise telegram.error.BadRequest('Chat not found')
+        if chat_id.startswith('slow') or not self.reachable:
+            raise telegram.error.TimedOut()
+
+
+def mock_get(url, headers=None, params=None, **kwargs):
+    if headers['Authorization'] == 'OAuth revoked':
+        return utils.MockResponse(
+            {'code': 'not_authenticated',
+             'message': 'Учетные данные не были предоставлены.'}, 401
+        )
+    return utils.MockResponse({
+        'homeworks': [{'id': 1, 'homework_name': 'hw', 'status': 'approved'}],
+        'current_date': 100,
+    })
+
+
+class TestWarmup:
+
+    def test_quarantines_invalid_tenants(self, monkeypatch):
+        import breaker
+        import storage
+        import tenants
+        import warmup
+
+        monkeypatch.setattr(requests, 'get', mock_get)
+        store = storage.StatusStore(':memory:')
+        outgoing = utils.MockOutbox()
+        good = tenants.Tenant(token='good', chat_id='1', subscribers=(
+            tenants.Subscription('2'), tenants.Subscription('bad-group'),
+        ))
+        revoked = tenants.Tenant(token='revoked', chat_id='3')
+        lost = tenants.Tenant(token='lost', chat_id='bad-chat')
+        healthy = warmup.warm_up([good, revoked, lost], store, outgoing,
+                                 MockBot(), workers=2)
+        assert healthy == [good], (
+            'Проверьте, что ученики с отклонённым токеном или недоступным '
+            'чатом снимаются с опроса'
+        )
+        assert store.quarantined() == {revoked.key, lost.key}
+        assert [s.chat_id for s in good.subscriptions] == ['1', '2'], (
+            'Проверьте, что недоступные чаты подписчиков отбрасываются'
+        )
+        assert good.from_date == 100 and store.get_cursor(good.key, 0) == 100
+        assert sorted(chat for chat, _ in outgoing.sent) == ['1', '2', '3'], (
+            'Проверьте, что прогрев заполняет хранилище первым опросом '
+            'и сообщает ученику об отклонённом токене'
+        )
+        assert breaker.BREAKER.state == breaker.CLOSED, (
+            'Проверьте, что отклонённый токен не размыкает предохранитель'
+        )
+        assert warmup.without_quarantined([good, revoked, lost],
+                                          store) == [good]
+
+    def test_rejected_bot_token_stops_startup(self):
+        import storage
+        import warmup
+
+        with pytest.raises(warmup.InvalidBotTokenError):
+            warmup.warm_up([], storage.StatusStore(':memory:'),
+                           utils.MockOutbox(), MockBot(authorized=False))
+
+    def test_telegram_outage_keeps_subscriptions(self, monkeypatch):
+        import breaker
+        import storage
+        import tenants
+        import warmup
+
+        monkeypatch.setattr(requests, 'get', mock_get)
+        outgoing = utils.MockOutbox()
+        tenant = tenants.Tenant(token='good', chat_id='slow-1', subscribers=(
+            tenants.Subscription('slow-group'), tenants.Subscription('2'),
+        ))
+        healthy = warmup.warm_up([tenant], storage.StatusStore(':memory:'),
+                                 outgoing, MockBot(reachable=False))
+        assert healthy == [tenant] and [
+            s.chat_id for s in tenant.subscriptions
+        ] == ['slow-1', 'slow-group', '2'], (
+            'Проверьте, что сбой Telegram при прогреве не снимает подписки'
+        )
+        assert sorted(chat for chat, _ in outgoing.sent) == [
+            '2', 'slow-1', 'slow-group'
+        ], 'Проверьте, что сбой Telegram не сообщается ученику как сбой API'
+        assert breaker.BREAKER.state == breaker.CLOSED
+
+    def test_restart_skips_known_tenants(self, monkeypatch):
+        import scheduler
+        import storage
+        import tenants
+        import warmup
+
+        monkeypatch.setattr(requests, 'get', mock_get)
+        store = storage.StatusStore(':memory:')
+        known = tenants.Tenant(token='known', chat_id='1')
+        fresh = tenants.Tenant(token='fresh', chat_id='2')
+        held = tenants.Tenant(token='held', chat_id='3')
+        store.save_cursor(known.key, 50)
+        store.save_cursor(held.key, 50)
+        store.quarantine(held.key, 'revoked')
+        ready, pending = warmup.partition([known, fresh, held], store)
+        assert ready == [known] and pending == [fresh, held], (
+            'Проверьте, что при перезапуске прогреваются только новые '
+            'ученики и ученики на карантине'
+        )
+        warmed = warmup.warm_up(pending, store, utils.MockOutbox(),
+                                workers=2)
+        clock = utils.FakeClock()
+        queue = scheduler.Scheduler(ready, retry_time=30, clock=clock,
+                                    polled=warmed)
+        clock.now += 30
+        assert queue.pop_due() == [known], (
+            'Проверьте, что прогретые ученики не опрашиваются повторно '
+            'сразу после прогрева'
+        )
@@ -20,3 +20,34 @@ def check_function(scope: ModuleType, func_name: str, params_qty: int = 0):
         f'Функция `{func_name}` должна принимать '
         'количество аргументов: {params_qty}'
     )
+
+
+class MockResponse:
+    """Ответ requests с готовым JSON."""
+
+    def __init__(self, data, status_code=200):
+        self.data = data
+        self.status_code = status_code
+
+    def json(self):
+        return self.data
+
+
+class MockOutbox:
+    """Очередь сообщений, запоминающая отправленное в sent."""
+
+    def __init__(self):
+        self.sent = []
+
+    def put(self, chat_id, text, parse_mode=None, not_before=0):
+        self.sent.append((chat_id, text))
+
+
+class FakeClock:
+    """Часы, которые двигаются только вручную через now."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
@@ -0,0 +1,207 @@
+import cProfile
+import collections
+import contextvars
+import functools
+import json
+import logging
+import os
+import signal
+import threading
+import time
+
+import config
+import metrics
+
+SAMPLE_INTERVAL = 0.005
+SLOW_ITERATION = ('Итерация {name} заняла {duration:.2f} с'
+                  ' при бюджете {budget:.0f} с: {stages}')
+PROFILE_SAVED = 'Профиль медленной итерации сохранён: {}'
+UNKNOWN_PROFILER = 'Неизвестный профилировщик: {}'
+
+_spans = contextvars.ContextVar('spans', default=None)
+
+
+class Span:
+    """Замер одного этапа опроса.
+    Длительность уходит в гистограмму этапов и в трассу текущей итерации.
+    """
+
+    __slots__ = ('name', 'started')
+
+    def __init__(self, name):
+        """Запоминает имя этапа."""
+        self.name = name
+
+    def __enter__(self):
+        """Засекает начало этапа."""
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        """Записывает длительность этапа, в том числе при ошибке."""
+        duration = time.perf_counter() - self.started
+        metrics.STAGE_LATENCY.observe(duration, self.name)
+        spans = _spans.get()
+        if spans is not None:
+            spans.append((self.name, duration))
+        return False
+
+
+def span(name):
+    """Возвращает контекстный менеджер, замеряющий этап name."""
+    return Span(name)
+
+
+def traced(name):
+    """Декоратор: замеряет каждый вызов функции как этап name."""
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with Span(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class CProfiler:
+    """Детерминированный профилировщик cProfile на время итерации."""
+
+    suffix = '.pstats'
+
+    def __init__(self):
+        """Включает профилирование."""
+        self.profile = cProfile.Profile()
+        self.profile.enable()
+
+    def stop(self):
+        """Выключает профилирование."""
+        self.profile.disable()
+
+    def dump(self, path):
+        """Сохраняет статистику для pstats и snakeviz."""
+        self.profile.dump_stats(path)
+
+
+class SamplingProfiler:
+    """Снимает стек главного потока по таймеру реального времени.
+    Ожидание сети тоже попадает в выборку, а накладные расходы
+    не зависят от числа вызовов функций.
+    """
+
+    suffix = '.folded'
+
+    def __init__(self, interval=SAMPLE_INTERVAL):
+        """Запускает таймер выборки."""
+        self.stacks = collections.Counter()
+        self.previous = signal.signal(signal.SIGALRM, self.sample)
+        signal.setitimer(signal.ITIMER_REAL, interval, interval)
+
+    def sample(self, signum, frame):
+        """Запоминает стек прерванного кода."""
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            stack.append('{} ({}:{})'.format(
+                code.co_name, os.path.basename(code.co_filename),
+                code.co_firstlineno
+            ))
+            frame = frame.f_back
+        self.stacks[';'.join(reversed(stack))] += 1
+
+    def stop(self):
+        """Останавливает таймер и возвращает прежний обработчик."""
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, self.previous)
+
+    def dump(self, path):
+        """Сохраняет стеки в свёрнутом формате для flamegraph.pl."""
+        with open(path, 'w', encoding='utf-8') as file:
+            for stack, count in self.stacks.items():
+                file.write(f'{stack} {count}\n')
+
+
+PROFILERS = {'cprofile': CProfiler, 'sampling': SamplingProfiler}
+
+
+def start_profiler(kind):
+    """Запускает профилировщик kind или возвращает None.
+    Профилировать можно только главный поток.
+    """
+    if not kind or threading.current_thread() is not threading.main_thread():
+        return None
+    if kind not in PROFILERS:
+        raise ValueError(UNKNOWN_PROFILER.format(kind))
+    return PROFILERS[kind]()
+
+
+class Iteration:
+    """Итерация цикла опроса со сбором этапов и профилем по запросу.
+    Если итерация дольше budget, этапы пишутся в лог и TRACE_FILE,
+    а профиль - в PROFILE_DIR. Без PROFILER профилировщик не запускается.
+    По умолчанию бюджет и профилировщик берутся из настроек.
+    """
+
+    def __init__(self, name, budget=None, profiler=None):
+        """Запоминает имя итерации, бюджет и профилировщик."""
+        self.name = name
+        self.budget = config.setting('latency_budget', budget)
+        self.profiler_kind = config.setting('profiler', profiler)
+
+    def __enter__(self):
+        """Начинает сбор этапов и профиля."""
+        self.spans = []
+        self.token = _spans.set(self.spans)
+        self.profiler = start_profiler(self.profiler_kind)
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        """Завершает итерацию и сохраняет данные медленной итерации."""
+        duration = time.perf_counter() - self.started
+        if self.profiler is not None:
+            self.profiler.stop()
+        _spans.reset(self.token)
+        metrics.ITERATION_LATENCY.observe(duration, self.name)
+        if duration > self.budget:
+            metrics.SLOW_ITERATIONS.inc(self.name)
+            report_slow(self.name, duration, self.budget, self.spans,
+                        self.profiler)
+        return False
+
+
+def iteration(name, budget=None, profiler=None):
+    """Возвращает контекстный менеджер итерации цикла опроса."""
+    return Iteration(name, budget, profiler)
+
+
+def stage_totals(spans):
+    """Суммирует длительности этапов по именам."""
+    totals = {}
+    for name, duration in spans:
+        totals[name] = totals.get(name, 0) + duration
+    return totals
+
+
+def report_slow(name, duration, budget, spans, profiler=None):
+    """Пишет разбивку медленной итерации в лог, TRACE_FILE и PROFILE_DIR."""
+    totals = stage_totals(spans)
+    logging.warning(SLOW_ITERATION.format(
+        name=name, duration=duration, budget=budget,
+        stages=', '.join(f'{stage} {seconds:.3f}'
+                         for stage, seconds in totals.items())
+    ))
+    record = {'time': time.time(), 'iteration': name, 'duration': duration,
+              'budget': budget, 'stages': totals, 'spans': spans}
+    settings = config.get_config()
+    if profiler is not None:
+        os.makedirs(settings.profile_dir, exist_ok=True)
+        path = os.path.join(
+            settings.profile_dir, f'{name}-{time.time_ns()}{profiler.suffix}'
+        )
+        profiler.dump(path)
+        record['profile'] = path
+        logging.info(PROFILE_SAVED.format(path))
+    if settings.trace_file:
+        with open(settings.trace_file, 'a', encoding='utf-8') as file:
+            file.write(json.dumps(record, ensure_ascii=False) + '\n')
+    return record
@@ -0,0 +1,182 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import breaker
+import config
+import homework
+import logs
+import metrics
+import scheduler
+import tenants
+
+
+class ChatUnavailableError(Exception):
+    """Кастомная ошибка при чате, в который бот не может писать."""
+
+    pass
+
+
+class InvalidBotTokenError(Exception):
+    """Кастомная ошибка при токене бота, отклонённом Telegram."""
+
+    pass
+
+
+QUARANTINE_ERRORS = (homework.InvalidTokenError, ChatUnavailableError)
+CHAT_UNAVAILABLE = 'Бот не может писать в чат {chat_id}: {error}'
+BOT_TOKEN_REJECTED = 'Telegram отклонил токен бота: {}'
+TENANT_QUARANTINED = 'Ученик из чата {chat_id} на карантине: {reason}'
+SUBSCRIBER_DROPPED = 'Подписка чата {chat_id} пропущена: {error}'
+CHECK_SKIPPED = 'Проверка {target} пропущена из-за сбоя Telegram: {error}'
+WARMUP_FINISHED = ('Прогрев завершён: в опросе {healthy} учеников,'
+                   ' на карантине {quarantined}')
+
+
+def validate_bot(bot):
+    """Проверяет токен бота одним запросом getMe.
+    Сетевой сбой Telegram не останавливает запуск.
+    """
+    from telegram.error import TelegramError, Unauthorized
+
+    try:
+        bot.get_me()
+    except Unauthorized as error:
+        logging.critical(BOT_TOKEN_REJECTED.format(error))
+        raise InvalidBotTokenError(BOT_TOKEN_REJECTED.format(error))
+    except TelegramError as error:
+        logging.warning(CHECK_SKIPPED.format(target='токена бота',
+                                             error=error))
+
+
+def check_chat(bot, chat_id):
+    """Проверяет, что бот может писать в чат.
+    Сетевые сбои не считаются ошибкой чата: их переживёт опрос.
+    """
+    from telegram.error import BadRequest, TelegramError, Unauthorized
+
+    try:
+        bot.get_chat(chat_id)
+    except (BadRequest, Unauthorized) as error:
+        raise ChatUnavailableError(
+            CHAT_UNAVAILABLE.format(chat_id=chat_id, error=error)
+        )
+    except TelegramError as error:
+        logging.warning(CHECK_SKIPPED.format(target=f'чата {chat_id}',
+                                             error=error))
+
+
+def probe(tenant, bot, responses=None):
+    """Проверяет чаты и токен ученика и получает его текущие работы.
+    Выполняется в пуле потоков, поэтому не трогает хранилище.
+    Возвращает ответ API или ошибку и годные подписки; пока
+    предохранитель API разомкнут, API не запрашивается.
+    При любой ошибке подписки остаются прежними.
+    """
+    subscribers = list(tenant.subscribers)
+    try:
+        if bot is not None:
+            check_chat(bot, tenant.chat_id)
+            subscribers = available_subscribers(tenant, bot)
+        if breaker.BREAKER.state != breaker.CLOSED:
+            return None, None, subscribers
+        return tenants.fetch_statuses(tenant, responses), None, subscribers
+    except Exception as error:
+        return None, error, subscribers
+
+
+def available_subscribers(tenant, bot):
+    """Возвращает подписки ученика без недоступных чатов."""
+    subscribers = []
+    for subscription in tenant.subscribers:
+        try:
+            check_chat(bot, subscription.chat_id)
+        except ChatUnavailableError as error:
+            logging.warning(SUBSCRIBER_DROPPED.format(
+                chat_id=subscription.chat_id, error=error
+            ), extra=logs.tenant_fields(tenant))
+            continue
+        subscribers.append(subscription)
+    return subscribers
+
+
+def warm_up(registry, store, outgoing, bot=None, responses=None,
+            workers=None):
+    """Проверяет и прогревает учеников перед циклом опроса.
+    Чаты и токены проверяются в пуле из workers потоков, а первый опрос
+    заполняет хранилище и кэш ответов. Ученики с отклонённым токеном или
+    недоступным чатом уходят на карантин; возвращаются остальные.
+    """
+    if bot is not None:
+        validate_bot(bot)
+    healthy = [tenant for tenant in registry if store.is_paused(tenant.key)]
+    workers = config.setting('warmup_workers', workers)
+    with ThreadPoolExecutor(max(1, min(workers, len(registry)))) as pool:
+        futures = {pool.submit(probe, tenant, bot, responses): tenant
+                   for tenant in registry
+                   if not store.is_paused(tenant.key)}
+        for future in as_completed(futures):
+            tenant = futures[future]
+            response, error, subscribers = future.result()
+            tenant.subscribers = tuple(subscribers)
+            if isinstance(error, QUARANTINE_ERRORS):
+                quarantine(outgoing, tenant, store, error)
+                continue
+            store.release(tenant.key)
+            prime(outgoing, tenant, store, response, error)
+            healthy.append(tenant)
+    store.flush_cursors()
+    logging.info(WARMUP_FINISHED.format(
+        healthy=len(healthy), quarantined=len(registry) - len(healthy)
+    ))
+    return healthy
+
+
+def prime(outgoing, tenant, store, response, error=None):
+    """Записывает итог первого опроса как обычный опрос.
+    Сбой API не снимает ученика с опроса.
+    """
+    if response is None and error is None:
+        return
+    try:
+        if error is not None:
+            raise error
+        tenants.apply_response(outgoing, tenant, store, response)
+    except Exception as failure:
+        scheduler.record_result(tenant, failure)
+        tenants.report_failure(outgoing, tenant, store, failure)
+
+
+def partition(registry, store):
+    """Делит учеников на уже проверенных и требующих прогрева.
+    Ученик с сохранённым курсором не на карантине проверялся в прошлых
+    запусках и сразу идёт в опрос; прогреваются новые ученики
+    и ученики на карантине, поэтому перезапуск не ждёт прогрева всех.
+    """
+    cursors = store.load_cursors()
+    quarantined = store.quarantined()
+    known, fresh = [], []
+    for tenant in registry:
+        if tenant.key in cursors and tenant.key not in quarantined:
+            known.append(tenant)
+        else:
+            fresh.append(tenant)
+    return known, fresh
+
+
+def without_quarantined(registry, store):
+    """Возвращает учеников, не снятых с опроса при прогреве."""
+    quarantined = store.quarantined()
+    return [tenant for tenant in registry if tenant.key not in quarantined]
+
+
+def quarantine(outgoing, tenant, store, error):
+    """Снимает ученика с опроса и сообщает ему причину.
+    Ученику с недоступным чатом писать некуда.
+    """
+    metrics.TENANTS_QUARANTINED.inc(type(error).__name__)
+    logging.warning(TENANT_QUARANTINED.format(chat_id=tenant.chat_id,
+                                              reason=error),
+                    extra=logs.tenant_fields(tenant))
+    store.quarantine(tenant.key, str(error))
+    if isinstance(error, homework.InvalidTokenError):
+        tenants.report_failure(outgoing, tenant, store, error)